@@ -4,7 +4,9 @@ from django.contrib import admin
 # accounts/admin.py
 from django.contrib import admin
 from django.contrib.auth import get_user_model
-from .models import Profile
+from django.utils import timezone
+
+from .models import OutboundMessage, Profile
 
 User = get_user_model()
 
@@ -65,4 +67,20 @@ class ProfileAdmin(admin.ModelAdmin):
         "favorite_rider_name", "favorite_bike_brand",
     )
     list_filter = ("country", "language", "favorite_team")
-    actions = [export_profiles_csv]
\ No newline at end of file
+    actions = [export_profiles_csv]
+
+@admin.action(description="🔁 Remettre en file")
+def requeue_messages(modeladmin, request, queryset):
+    queryset.update(
+        status=OutboundMessage.STATUS_PENDING, attempts=0, available_at=timezone.now(), claim_token="", last_error="",
+    )
+
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ("id", "channel", "user", "to_email", "subject", "status", "attempts", "available_at", "sent_at")
+    list_filter = ("status", "channel")
+    search_fields = ("to_email", "subject", "dedup_key", "user__username")
+    raw_id_fields = ("user",)
+    readonly_fields = ("created_at", "sent_at", "claim_token")
+    actions = [requeue_messages]
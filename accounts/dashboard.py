@@ -0,0 +1,151 @@
+# accounts/dashboard.py
+"""
+Données du tableau de bord : les 3 prochaines unités à venir, les 3 dernières verrouillées
+et les 3 dernières terminées, avec le prono / score du joueur.
+
+Une seule requête SQL : les unités (courses d'un jour + étapes) sont classées par statut
+côté base (terminée = UnitFacts.finished, voir bets/facts.py), chaque statut est limité à 3 lignes, puis on joint le Bet et le BetScore
+du joueur sur ces 9 lignes seulement : seules ces lignes sortent de la base.
+"""
+from __future__ import annotations
+
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from bets.models import Bet, BetScore, UnitFacts
+from races.models import OneDayRace, Stage, Tour
+
+PER_STATUS = 3
+
+STATUSES = ("upcoming", "locked", "finished")
+
+
+def _db_datetime(value):
+    # en SQL brut, SQLite renvoie les dates en texte (Postgres : datetime)
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def _dashboard_sql() -> str:
+    qn = connection.ops.quote_name
+    one_day = qn(OneDayRace._meta.db_table)
+    stage = qn(Stage._meta.db_table)
+    tour = qn(Tour._meta.db_table)
+    facts = qn(UnitFacts._meta.db_table)
+    bet = qn(Bet._meta.db_table)
+    score = qn(BetScore._meta.db_table)
+
+    # Colonnes : status, kind, unit_id, start, name, number, stage_type, tour_id, tour_name, finished
+    pick = """
+        SELECT * FROM (
+            SELECT '{status}' AS status, u.*
+            FROM units u
+            WHERE {where}
+            ORDER BY u.start_dt {order}
+            LIMIT %s
+        ) AS {status}_units
+    """
+    return f"""
+        WITH units AS (
+            SELECT 'one_day' AS kind, r.id AS unit_id, r.start_datetime AS start_dt, r.name AS name,
+                   NULL AS number, NULL AS stage_type, NULL AS tour_id, NULL AS tour_name,
+                   CASE WHEN f.finished THEN 1 ELSE 0 END AS finished
+            FROM {one_day} r
+            LEFT JOIN {facts} f ON f.one_day_race_id = r.id
+            UNION ALL
+            SELECT 'stage', s.id, s.start_datetime, s.name,
+                   s.number, s.stage_type, t.id, t.name,
+                   CASE WHEN f.finished THEN 1 ELSE 0 END
+            FROM {stage} s
+            INNER JOIN {tour} t ON t.id = s.tour_id
+            LEFT JOIN {facts} f ON f.stage_id = s.id
+        ),
+        picked AS (
+            {pick.format(status="upcoming", where="u.finished = 0 AND u.start_dt > %s", order="ASC")}
+            UNION ALL
+            {pick.format(status="locked", where="u.finished = 0 AND u.start_dt <= %s", order="DESC")}
+            UNION ALL
+            {pick.format(status="finished", where="u.finished = 1", order="DESC")}
+        )
+        SELECT p.status, p.kind, p.unit_id, p.start_dt, p.name, p.number, p.stage_type,
+               p.tour_id, p.tour_name, p.finished,
+               b.id, b.submitted_at,
+               b.pick1_id, b.pick2_id, b.pick3_id, b.pick4_id, b.pick5_id,
+               bs.score
+        FROM picked p
+        LEFT JOIN {bet} b
+               ON b.user_id = %s
+              AND ((p.kind = 'one_day' AND b.one_day_race_id = p.unit_id)
+                   OR (p.kind = 'stage' AND b.stage_id = p.unit_id))
+        LEFT JOIN {score} bs ON bs.bet_id = b.id
+    """
+
+
+def _unit_obj(kind, unit_id, start_dt, name, number, stage_type, tour_id, tour_name):
+    """Instances non sauvegardées, juste ce que les templates affichent (pas de requête)."""
+    if kind == "one_day":
+        return OneDayRace(id=unit_id, name=name, start_datetime=start_dt)
+    return Stage(
+        id=unit_id,
+        name=name,
+        number=number,
+        stage_type=stage_type,
+        start_datetime=start_dt,
+        tour=Tour(id=tour_id, name=tour_name),
+    )
+
+
+def dashboard_units(user, now=None, per_status: int = PER_STATUS) -> Dict[str, List[Dict]]:
+    """
+    {"upcoming": [...], "locked": [...], "finished": [...]} — mêmes cartes que
+    accounts/_units_list.html attend. Une requête.
+    """
+    now = now or timezone.now()
+    params = [
+        now, per_status,   # upcoming
+        now, per_status,   # locked
+        per_status,        # finished
+        user.id,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(_dashboard_sql(), params)
+        rows = cursor.fetchall()
+
+    units: Dict[str, List[Dict]] = {status: [] for status in STATUSES}
+    for (status, kind, unit_id, start_dt, name, number, stage_type, tour_id, tour_name, finished,
+         bet_id, submitted_at, *picks, score) in rows:
+        start_dt = _db_datetime(start_dt)
+        obj = _unit_obj(kind, unit_id, start_dt, name, number, stage_type, tour_id, tour_name)
+        route = "one_day" if kind == "one_day" else "stage"
+
+        units[status].append({
+            "kind": kind,
+            "obj": obj,
+            "tour": obj.tour if kind == "stage" else None,
+            "start_dt": start_dt,
+            "locked": now >= start_dt,
+            "results_ok": bool(finished),
+            "has_top5": bet_id is not None and all(picks),
+            "bet_id": bet_id,
+            "score": Decimal(str(score)) if score is not None else None,
+            "submitted_at": _db_datetime(submitted_at),
+            "status": status,
+            "url_detail": (f"{route}_detail", unit_id),
+            "url_bet": (f"bet_{route}", unit_id),
+            "url_lb": (f"lb_{route}", unit_id),
+        })
+
+    # upcoming : le plus proche d'abord ; locked / finished : le plus récent d'abord
+    units["upcoming"].sort(key=lambda u: u["start_dt"])
+    units["locked"].sort(key=lambda u: u["start_dt"], reverse=True)
+    units["finished"].sort(key=lambda u: u["start_dt"], reverse=True)
+    return units
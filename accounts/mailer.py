@@ -0,0 +1,188 @@
+# accounts/mailer.py
+"""
+Envoi d'emails en masse (rappels, résultats).
+
+send_mail() ouvre une connexion SMTP par message : pour 50k rappels, c'est 50k poignées
+de main TLS avec le relais. Ici les messages sont découpés en lots ; chaque lot part sur
+UNE connexion (get_connection), via un pool de threads borné, avec
+- reprise par lot : un lot qui échoue reprend sur une nouvelle connexion à partir du
+  message fautif (les messages déjà acceptés ne sont pas renvoyés), avec backoff ;
+  après MAIL_MAX_RETRIES échecs de suite, seul ce message est abandonné et le lot
+  continue ; un refus définitif (5xx) l'écarte tout de suite, sans reprise ; un relais
+  injoignable (connexion impossible) abandonne le reste du lot
+- limite de débit globale (messages / seconde, tous threads confondus)
+
+Réglages : MAIL_BATCH_SIZE, MAIL_WORKERS, MAIL_RATE_PER_SECOND (0 = sans limite),
+MAIL_MAX_RETRIES, MAIL_RETRY_BACKOFF (settings.py).
+
+Fonctionne avec n'importe quel backend Django : locmem (mail.outbox) pour les tests,
+ou un SMTP local (EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=false).
+"""
+from __future__ import annotations
+
+import logging
+import smtplib
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Hashable, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger(__name__)
+
+# (clé de l'appelant, ex: user_id ; message)
+Outgoing = Tuple[Hashable, EmailMessage]
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+class RateLimiter:
+    """Débit max partagé entre threads : chaque lot réserve sa plage de temps."""
+
+    def __init__(self, per_second: float):
+        self.per_second = per_second
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: int = 1) -> None:
+        if not self.per_second:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + n / self.per_second
+        if start > now:
+            time.sleep(start - now)
+
+
+@dataclass
+class MailReport:
+    sent: List[Hashable] = field(default_factory=list)
+    failed: List[Hashable] = field(default_factory=list)
+    batches: int = 0
+    retries: int = 0
+
+
+@dataclass
+class _BatchResult:
+    sent: List[Hashable]
+    failed: List[Hashable]
+    retries: int
+
+
+def _is_permanent(exc: Exception) -> bool:
+    """Refus définitif du relais (5xx : destinataire inconnu, message rejeté) : pas de reprise."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return bool(exc.recipients) and all(code >= 500 for code, _msg in exc.recipients.values())
+    code = getattr(exc, "smtp_code", None)  # SMTPResponseException (SMTPDataError, SMTPSenderRefused...)
+    return isinstance(code, int) and code >= 500
+
+
+def _send_batch(batch: List[Outgoing], limiter: RateLimiter, max_retries: int, backoff: float) -> _BatchResult:
+    limiter.acquire(len(batch))
+
+    sent: List[Hashable] = []
+    failed: List[Hashable] = []
+    pos = 0
+    attempt = 0       # échecs consécutifs sur le message batch[pos]
+    retries = 0
+    while pos < len(batch):
+        connection = get_connection(fail_silently=False)
+        opened = False
+        try:
+            connection.open()
+            opened = True
+            # un message à la fois sur la connexion ouverte : on sait exactement lequel échoue
+            while pos < len(batch):
+                key, message = batch[pos]
+                connection.send_messages([message])
+                sent.append(key)
+                pos += 1
+                attempt = 0
+        except Exception as exc:
+            key = batch[pos][0]
+            if opened and _is_permanent(exc):
+                # seul ce message est refusé : on passe au suivant, sur une nouvelle connexion
+                logger.warning("Email refusé définitivement (%s), message ignoré", exc)
+                failed.append(key)
+                pos += 1
+                attempt = 0
+                continue
+            attempt += 1
+            if attempt > max_retries:
+                if not opened:
+                    # relais injoignable : inutile d'user les essais message par message
+                    logger.exception("Lot d'emails abandonné après %s essais (%s messages)", attempt, len(batch) - pos)
+                    return _BatchResult(sent, failed + [k for k, _ in batch[pos:]], retries)
+                logger.exception("Email abandonné après %s essais", attempt)
+                failed.append(key)
+                pos += 1
+                attempt = 0
+                continue
+            retries += 1
+            logger.warning("Échec d'envoi (essai %s/%s), nouvelle connexion", attempt, max_retries, exc_info=True)
+            time.sleep(backoff * 2 ** (attempt - 1))
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+    return _BatchResult(sent, failed, retries)
+
+
+def send_bulk(
+    messages: Iterable[Outgoing],
+    *,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    rate_per_second: Optional[float] = None,
+    max_retries: Optional[int] = None,
+    on_sent: Optional[Callable[[List[Hashable]], None]] = None,
+) -> MailReport:
+    """
+    Envoie des (clé, EmailMessage) par lots, une connexion par lot.
+
+    `messages` est consommé au fil de l'eau (au plus 2 lots en attente par thread) :
+    on peut passer un générateur sur un queryset.iterator().
+    `on_sent(clés)` est appelé dans le thread appelant après chaque lot, avec les clés
+    des messages acceptés par le backend (ex: écrire les ReminderLog correspondants).
+    """
+    batch_size = batch_size or _setting("MAIL_BATCH_SIZE", 100)
+    workers = workers or _setting("MAIL_WORKERS", 4)
+    limiter = RateLimiter(_setting("MAIL_RATE_PER_SECOND", 0) if rate_per_second is None else rate_per_second)
+    max_retries = _setting("MAIL_MAX_RETRIES", 3) if max_retries is None else max_retries
+    backoff = _setting("MAIL_RETRY_BACKOFF", 2.0)
+
+    report = MailReport()
+
+    def collect(futures):
+        for future in futures:
+            result = future.result()
+            report.batches += 1
+            report.retries += result.retries
+            report.sent += result.sent
+            report.failed += result.failed
+            if on_sent and result.sent:
+                on_sent(result.sent)
+
+    it = iter(messages)
+    pending = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mailer") as pool:
+        while True:
+            batch = list(islice(it, batch_size))
+            if not batch:
+                break
+            pending.add(pool.submit(_send_batch, batch, limiter, max_retries, backoff))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+        done, _ = wait(pending)
+        collect(done)
+
+    return report
@@ -0,0 +1,155 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from core.profiling import count_queries, isolated_test_db
+from accounts.dashboard import dashboard_units
+from races.models import Season, Tour, Stage, OneDayRace, Rider, Result
+from bets.facts import refresh_unit_facts
+from bets.models import Bet, BetScore
+
+User = get_user_model()
+
+
+def _legacy_units(user, now):
+    """Ancien chemin du dashboard : toutes les unités, tous les comptes de résultats, tous les bets."""
+    one_days = list(OneDayRace.objects.select_related("season").all())
+    stages = list(Stage.objects.select_related("tour", "tour__season").all())
+    bets_one_day = {
+        b.one_day_race_id: b
+        for b in Bet.objects.filter(user=user, one_day_race__isnull=False)
+        .select_related("pick1", "pick2", "pick3", "pick4", "pick5")
+    }
+    bets_stage = {
+        b.stage_id: b
+        for b in Bet.objects.filter(user=user, stage__isnull=False)
+        .select_related("pick1", "pick2", "pick3", "pick4", "pick5")
+    }
+    scores = {s.bet_id: s for s in BetScore.objects.filter(bet__user=user).select_related("bet")}
+    counts_one_day = dict(
+        Result.objects.filter(one_day_race__isnull=False).values_list("one_day_race_id").annotate(c=Count("id"))
+    )
+    counts_stage = dict(
+        Result.objects.filter(stage__isnull=False).values_list("stage_id").annotate(c=Count("id"))
+    )
+
+    units = []
+    for kind, objs, bets, counts in (
+        ("one_day", one_days, bets_one_day, counts_one_day),
+        ("stage", stages, bets_stage, counts_stage),
+    ):
+        for obj in objs:
+            bet = bets.get(obj.id)
+            finished = counts.get(obj.id, 0) >= 3
+            status = "finished" if finished else ("locked" if now >= obj.start_datetime else "upcoming")
+            units.append({"obj": obj, "status": status, "start_dt": obj.start_datetime,
+                          "score": scores.get(bet.id) if bet else None})
+    units.sort(key=lambda u: u["start_dt"])
+    return {status: [u for u in units if u["status"] == status][:3] for status in ("upcoming", "locked", "finished")}
+
+
+class Command(BaseCommand):
+    help = "Benchmark des données du dashboard (base de test jetable) : requêtes et latence."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seasons", type=int, default=10, help="Nombre de saisons. Défaut=10")
+        parser.add_argument("--one-days", type=int, default=30, help="Courses d'un jour par saison. Défaut=30")
+        parser.add_argument("--tours", type=int, default=3, help="Tours par saison (21 étapes). Défaut=3")
+        parser.add_argument("--repeat", type=int, default=20, help="Nombre d'appels mesurés. Défaut=20")
+
+    def handle(self, *args, **opts):
+        repeat = opts["repeat"]
+        with isolated_test_db():
+            user = self._build_fixture(opts["seasons"], opts["one_days"], opts["tours"])
+            now = timezone.now()
+
+            with count_queries() as legacy:
+                for _ in range(repeat):
+                    _legacy_units(user, now)
+
+            with count_queries() as service:
+                for _ in range(repeat):
+                    dashboard_units(user, now=now)
+
+            setup_test_environment()  # ALLOWED_HOSTS "testserver", backend email locmem
+            try:
+                client = Client()
+                client.force_login(user)
+                with count_queries() as view:
+                    for _ in range(repeat):
+                        client.get("/dashboard/")
+            finally:
+                teardown_test_environment()
+
+            n_units = OneDayRace.objects.count() + Stage.objects.count()
+
+        self.stdout.write(f"fixture : {opts['seasons']} saisons, {n_units} unités")
+        self._report("legacy (toutes unités)", legacy, repeat)
+        self._report("dashboard_units", service, repeat)
+        self._report("vue /dashboard/", view, repeat)
+
+    def _report(self, label, stats, repeat):
+        self.stdout.write(
+            f"{label:<24} | requêtes={stats.queries / repeat:>5.1f}/appel"
+            f" | latence={stats.elapsed_ms / repeat:>7.2f} ms/appel"
+        )
+
+    def _build_fixture(self, n_seasons: int, n_one_days: int, n_tours: int):
+        rnd = random.Random(42)
+        now = timezone.now()
+
+        user = User.objects.create_user(username="bench", email="bench@example.com", password="bench")
+        riders = Rider.objects.bulk_create([Rider(first_name="R", last_name=f"Rider {i:03d}") for i in range(30)])
+
+        # la dernière saison est "en cours" : la moitié de ses unités est dans le futur
+        first_year = now.year - n_seasons + 1
+        for year in range(first_year, now.year + 1):
+            season = Season.objects.create(year=year)
+            season_start = now - timedelta(days=180 + 365 * (now.year - year))
+
+            one_days = OneDayRace.objects.bulk_create([
+                OneDayRace(season=season, name=f"Classique {year}-{i}",
+                           start_datetime=season_start + timedelta(days=12 * i))
+                for i in range(n_one_days)
+            ])
+            stages = []
+            for t in range(n_tours):
+                tour = Tour.objects.create(season=season, name=f"Tour {year}-{t}",
+                                           start_datetime=season_start + timedelta(days=100 * t))
+                stages += Stage.objects.bulk_create([
+                    Stage(tour=tour, number=n + 1, name=f"Étape {n + 1}",
+                          start_datetime=tour.start_datetime + timedelta(days=n))
+                    for n in range(21)
+                ])
+
+            results, bets = [], []
+            for unit_field, units in (("one_day_race", one_days), ("stage", stages)):
+                for unit in units:
+                    if unit.start_datetime < now - timedelta(days=1):
+                        for pos, rider in enumerate(rnd.sample(riders, 3), start=1):
+                            results.append(Result(position=pos, rider=rider, **{unit_field: unit}))
+                    if rnd.random() < 0.6:
+                        picks = rnd.sample(riders, 5)
+                        bets.append(Bet(
+                            user=user, submitted_at=unit.start_datetime - timedelta(hours=2),
+                            pick1=picks[0], pick2=picks[1], pick3=picks[2], pick4=picks[3], pick5=picks[4],
+                            **{unit_field: unit},
+                        ))
+            Result.objects.bulk_create(results)
+            Bet.objects.bulk_create(bets)
+            for race in one_days:
+                refresh_unit_facts(one_day_race=race)
+            for stage in stages:
+                refresh_unit_facts(stage=stage)
+
+        BetScore.objects.bulk_create([
+            BetScore(bet=b, score=round(rnd.random() * 5, 4), one_day_race_id=b.one_day_race_id, stage_id=b.stage_id)
+            for b in Bet.objects.filter(user=user)
+        ])
+        return user
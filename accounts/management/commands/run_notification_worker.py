@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.outbox import process_outbox
+
+
+class Command(BaseCommand):
+    help = "Envoie les messages en file (OutboundMessage : email + push), par lots, avec reprise et dead-letter."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Tourne en continu (worker).")
+        parser.add_argument("--interval", type=float, default=5.0, help="Pause quand la file est vide en mode --loop (secondes). Défaut=5")
+        parser.add_argument("--limit", type=int, default=None, help="Messages max par lot. Défaut=OUTBOX_BATCH_SIZE")
+
+    def handle(self, *args, **opts):
+        if not opts["loop"]:
+            report = process_outbox(limit=opts["limit"])
+            self.stdout.write(self.style.SUCCESS(f"✅ run_notification_worker terminé | {self._format(report)}"))
+            return
+
+        self.stdout.write("run_notification_worker: worker démarré (Ctrl+C pour arrêter)")
+        try:
+            while True:
+                report = process_outbox(limit=opts["limit"])
+                if report.claimed:
+                    self.stdout.write(self._format(report))
+                else:
+                    time.sleep(opts["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("run_notification_worker: arrêt")
+
+    def _format(self, report) -> str:
+        return f"lot: {report.claimed} | envoyés: {report.sent} | à réessayer: {report.retried} | abandonnés: {report.dead}"
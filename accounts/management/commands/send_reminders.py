@@ -1,14 +1,11 @@
-from datetime import timedelta
-
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.contrib.auth import get_user_model
-
-from accounts.models import ReminderLog, NotificationPreference
-from accounts.notifications import notify_reminder
 
-from races.models import OneDayRace, Stage
-from bets.models import Bet
+from core.profiling import count_queries
+from accounts.reminders import (
+    CHANNEL_EMAIL, CHANNELS, LOG_BATCH_SIZE,
+    queue_reminders, reminder_candidates, reminder_units, send_unit_reminders,
+)
 
 
 class Command(BaseCommand):
@@ -17,98 +14,46 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("--hours", type=int, default=24, help="Fenêtre (heures) avant départ. Défaut=24")
         parser.add_argument("--dry-run", action="store_true", help="Affiche sans envoyer ni logger")
+        parser.add_argument("--channel", choices=CHANNELS, default=CHANNEL_EMAIL, help="email | push | both. Défaut=email")
+        parser.add_argument("--queue", action="store_true", help="Met les messages en file (run_notification_worker) au lieu de les envoyer")
+        parser.add_argument("--stats", action="store_true", help="Affiche le nombre de requêtes SQL et la durée")
 
     def handle(self, *args, **opts):
         hours = opts["hours"]
         dry = opts["dry_run"]
+        channel = opts["channel"]
 
-        now = timezone.now()
-        limit = now + timedelta(hours=hours)
-
-        User = get_user_model()
+        with count_queries() as stats:
+            candidates, sent = self._run(hours, dry, channel, opts["queue"])
 
-        # Users éligibles (email + confirmés)
-        users = (
-            User.objects
-            .filter(is_active=True)
-            .exclude(email__isnull=True)
-            .exclude(email="")
-            .select_related("notif_prefs")
-        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Rappels: candidats={candidates} | envoyés={sent} | canal={channel} | fenêtre={hours}h | dry_run={dry}"
+        ))
+        if opts["stats"]:
+            self.stdout.write(f"requêtes={stats.queries} | durée={stats.elapsed_ms:.1f} ms")
 
+    def _run(self, hours: int, dry: bool, channel: str, queue: bool = False):
         sent = 0
         candidates = 0
 
-        # ==========================
-        # COURSES D’UN JOUR
-        # ==========================
-        races = OneDayRace.objects.filter(start_datetime__gt=now, start_datetime__lte=limit).order_by("start_datetime")
-
-        for race in races:
-            # users ayant déjà validé un Top5
-            already = set(
-                Bet.objects.filter(one_day_race=race)
-                .exclude(submitted_at__isnull=True)
-                .values_list("user_id", flat=True)
-            )
-
-            for u in users:
-                prefs = getattr(u, "notif_prefs", None)
-                if prefs and not prefs.email_reminders:
-                    continue
-                if u.id in already:
-                    continue
-                if ReminderLog.objects.filter(user=u, unit_kind="one_day", unit_id=race.id).exists():
-                    continue
-
-                candidates += 1
-
-                # nom course (adapte si ton champ partials’appelle autrement)
-                race_name = getattr(race, "name", str(race))
-
-                if dry:
-                    self.stdout.write(f"[DRY] one_day | {race_name} | {u.username}")
-                    continue
-
-                notify_reminder(u, race_name, race.start_datetime, url=None)
-                ReminderLog.objects.create(user=u, unit_kind="one_day", unit_id=race.id)
-                sent += 1
-
-        # ==========================
-        # ÉTAPES
-        # ==========================
-        stages = Stage.objects.filter(start_datetime__gt=now, start_datetime__lte=limit).select_related("tour").order_by("start_datetime")
-
-        for stage in stages:
-            already = set(
-                Bet.objects.filter(stage=stage)
-                .exclude(submitted_at__isnull=True)
-                .values_list("user_id", flat=True)
-            )
-
-            for u in users:
-                prefs = getattr(u, "notif_prefs", None)
-                if prefs and not prefs.email_reminders:
-                    continue
-                if u.id in already:
-                    continue
-                if ReminderLog.objects.filter(user=u, unit_kind="stage", unit_id=stage.id).exists():
-                    continue
-
-                candidates += 1
-
-                tour_name = getattr(stage.tour, "name", "Tour")
-                stage_number = getattr(stage, "number", "")
-                label = f"{tour_name} — Étape {stage_number}".strip()
-
-                if dry:
-                    self.stdout.write(f"[DRY] stage | {label} | {u.username}")
-                    continue
-
-                notify_reminder(u, label, stage.start_datetime, url=None)
-                ReminderLog.objects.create(user=u, unit_kind="stage", unit_id=stage.id)
-                sent += 1
-
-        self.stdout.write(self.style.SUCCESS(
-            f"Rappels: candidats={candidates} | envoyés={sent} | fenêtre={hours}h | dry_run={dry}"
-        ))
\ No newline at end of file
+        for kind, unit, label in reminder_units(timezone.now(), hours):
+            # une requête par unité : joueurs éligibles sans Bet validé ni rappel déjà envoyé
+            if dry:
+                for user in reminder_candidates(kind, unit, channel).iterator(chunk_size=LOG_BATCH_SIZE):
+                    candidates += 1
+                    self.stdout.write(f"[DRY] {kind} | {label} | {user.username}")
+                continue
+
+            if queue:
+                queued = queue_reminders(kind, unit, label, channel=channel)
+                candidates += queued
+                sent += queued
+                continue
+
+            report = send_unit_reminders(kind, unit, label, channel=channel)
+            candidates += report.candidates
+            sent += report.sent
+            if report.failed:
+                self.stderr.write(f"{kind} | {label} : {report.failed} joueur(s) non atteint(s) (relancés au prochain passage)")
+
+        return candidates, sent
@@ -2,6 +2,7 @@
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 from django.templatetags.static import static
 from .choices import COUNTRY_CHOICES, LANGUAGE_CHOICES, TEAM_CHOICES, BIKE_BRAND_CHOICES, FAVORITE_RIDER_CHOICES
 from django.conf import settings
@@ -95,4 +96,46 @@ class ReminderLog(models.Model):
     sent_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ("user", "unit_kind", "unit_id")
\ No newline at end of file
+        unique_together = ("user", "unit_kind", "unit_id")
+
+
+class OutboundMessage(models.Model):
+    """
+    File d'envoi (email / web push), écrite dans la transaction de la requête ou de la commande
+    et vidée par `manage.py run_notification_worker` (voir accounts/outbox.py).
+    """
+    CHANNEL_EMAIL = "email"
+    CHANNEL_PUSH = "push"
+    CHANNEL_CHOICES = [(CHANNEL_EMAIL, "Email"), (CHANNEL_PUSH, "Push")]
+
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_DEAD = "dead"  # abandonné après OUTBOX_MAX_ATTEMPTS essais
+    STATUS_CHOICES = [(STATUS_PENDING, "En attente"), (STATUS_SENT, "Envoyé"), (STATUS_DEAD, "Abandonné")]
+
+    channel = models.CharField(max_length=8, choices=CHANNEL_CHOICES)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE, related_name="+")
+
+    # email
+    to_email = models.EmailField(blank=True)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    # push : {"title", "body", "url"} envoyé à tous les abonnements du joueur
+    payload = models.JSONField(default=dict, blank=True)
+
+    # optionnel : empêche de mettre deux fois le même message en file (ex: "result:stage:12:user:5:email")
+    dedup_key = models.CharField(max_length=128, null=True, blank=True, unique=True)
+
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # prochain essai (backoff) / fin du bail du worker
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "available_at"])]
+
+    def __str__(self):
+        return f"OutboundMessage({self.channel}#{self.id} {self.status})"
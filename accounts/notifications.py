@@ -1,6 +1,8 @@
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.conf import settings
 
+from .mailer import MailReport, send_bulk
+
 
 def _can_email(user, kind: str) -> bool:
     """
@@ -27,31 +29,27 @@ def _can_email(user, kind: str) -> bool:
     return True
 
 
-def notify_result(user, race_name, url=None):
-    if not _can_email(user, "results"):
-        return
-
-    send_mail(
+def result_message(user, race_name, url=None, score=None, rank=None, total=None) -> EmailMessage:
+    return EmailMessage(
         subject=f"Résultat publié — {race_name}",
-        message=(
+        body=(
             f"Bonjour {user.username},\n\n"
             f"Le résultat de {race_name} est disponible.\n"
+            + (f"Ton score : {score} pts" if score is not None else "")
+            + (f" — classement : {rank}/{total}" if score is not None and rank else "")
+            + ("\n" if score is not None else "")
             + (f"Lien : {url}\n\n" if url else "\n")
             + "À bientôt sur Coup de Bordure !"
         ),
         from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        fail_silently=True,
+        to=[user.email],
     )
 
 
-def notify_reminder(user, race_name, start_dt, url=None):
-    if not _can_email(user, "reminders"):
-        return
-
-    send_mail(
+def reminder_message(user, race_name, start_dt, url=None) -> EmailMessage:
+    return EmailMessage(
         subject=f"Rappel pronostic — {race_name}",
-        message=(
+        body=(
             f"Bonjour {user.username},\n\n"
             f"Pense à valider ton Top5 avant le départ "
             f"({start_dt.strftime('%d/%m/%Y %H:%M')}).\n"
@@ -59,6 +57,52 @@ def notify_reminder(user, race_name, start_dt, url=None):
             + "Bonne chance 🚴"
         ),
         from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        fail_silently=True,
-    )
\ No newline at end of file
+        to=[user.email],
+    )
+
+
+def reminder_payload(race_name, start_dt, url=None) -> dict:
+    """Payload web push du rappel (lu par le handler "push" de static/pwa/sw.js)."""
+    return {
+        "title": f"Rappel pronostic — {race_name}",
+        "body": f"Valide ton Top5 avant le départ ({start_dt.strftime('%d/%m/%Y %H:%M')}).",
+        "url": url or "/dashboard/",
+    }
+
+
+def notify_result(user, race_name, url=None):
+    if not _can_email(user, "results"):
+        return
+    result_message(user, race_name, url).send(fail_silently=True)
+
+
+def notify_reminder(user, race_name, start_dt, url=None):
+    if not _can_email(user, "reminders"):
+        return
+    reminder_message(user, race_name, start_dt, url).send(fail_silently=True)
+
+
+# -------------------------
+# Envois en masse (un lot = une connexion, voir accounts/mailer.py)
+# -------------------------
+
+def send_reminders_bulk(users, race_name, start_dt, url=None, on_sent=None) -> MailReport:
+    """
+    Rappels pour un itérable de joueurs (ex: reminder_candidates(...).iterator()).
+    Les clés passées à on_sent / dans le rapport sont les user ids.
+    """
+    messages = (
+        (user.id, reminder_message(user, race_name, start_dt, url))
+        for user in users
+        if _can_email(user, "reminders")
+    )
+    return send_bulk(messages, on_sent=on_sent)
+
+
+def send_results_bulk(users, race_name, url=None, on_sent=None) -> MailReport:
+    messages = (
+        (user.id, result_message(user, race_name, url))
+        for user in users
+        if _can_email(user, "results")
+    )
+    return send_bulk(messages, on_sent=on_sent)
@@ -0,0 +1,192 @@
+# accounts/outbox.py
+"""
+File d'envoi persistante (accounts.OutboundMessage).
+
+Les vues et commandes n'envoient plus rien elles-mêmes : elles écrivent des lignes
+OutboundMessage dans leur transaction (rien ne part si elle est annulée), et
+`manage.py run_notification_worker` les envoie par lots :
+
+1. claim : on réserve un lot de messages dus (select_for_update(skip_locked=True) sur
+   Postgres ; l'UPDATE conditionnel sur available_at suffit sur SQLite), avec un bail
+   (OUTBOX_LEASE_SECONDS) : un worker mort ne bloque pas ses messages indéfiniment
+2. envoi hors transaction : emails via accounts/mailer.py (une connexion par lot), push via pushes/sender.py
+3. bilan : envoyés -> "sent" ; échecs -> nouvel essai avec backoff exponentiel,
+   puis "dead" après OUTBOX_MAX_ATTEMPTS essais (à inspecter dans l'admin)
+
+La latence d'une requête (ex: inscription) ne dépend donc plus du relais SMTP.
+"""
+from __future__ import annotations
+
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .mailer import send_bulk
+from .models import OutboundMessage
+
+ENQUEUE_BATCH_SIZE = 2000
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+# -------------------------
+# Mise en file
+# -------------------------
+
+def email_message(to_email: str, subject: str, body: str, user=None, dedup_key: Optional[str] = None) -> OutboundMessage:
+    """Message email non sauvegardé (pour enqueue_many)."""
+    return OutboundMessage(
+        channel=OutboundMessage.CHANNEL_EMAIL,
+        user_id=getattr(user, "id", user),
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        dedup_key=dedup_key,
+    )
+
+
+def push_message(user, payload: Dict, dedup_key: Optional[str] = None) -> OutboundMessage:
+    """Message push non sauvegardé : payload envoyé à tous les abonnements du joueur."""
+    return OutboundMessage(
+        channel=OutboundMessage.CHANNEL_PUSH,
+        user_id=getattr(user, "id", user),
+        payload=payload,
+        dedup_key=dedup_key,
+    )
+
+
+def enqueue_email(to_email: str, subject: str, body: str, user=None, dedup_key: Optional[str] = None) -> None:
+    enqueue_many([email_message(to_email, subject, body, user=user, dedup_key=dedup_key)])
+
+
+def enqueue_many(messages: Iterable[OutboundMessage]) -> None:
+    """Insertion en lots ; un dedup_key déjà en file est ignoré."""
+    OutboundMessage.objects.bulk_create(list(messages), batch_size=ENQUEUE_BATCH_SIZE, ignore_conflicts=True)
+
+
+# -------------------------
+# Worker
+# -------------------------
+
+@dataclass
+class OutboxReport:
+    claimed: int = 0
+    sent: int = 0
+    retried: int = 0
+    dead: int = 0
+
+
+def claim_batch(limit: int, now=None) -> List[OutboundMessage]:
+    """Réserve jusqu'à `limit` messages dus pour ce worker (une transaction courte)."""
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    lease = now + timedelta(seconds=_setting("OUTBOX_LEASE_SECONDS", 300))
+
+    with transaction.atomic():
+        ids = list(
+            OutboundMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundMessage.STATUS_PENDING, available_at__lte=now)
+            .order_by("available_at", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        # la condition sur available_at protège aussi les bases sans verrou de ligne (SQLite)
+        OutboundMessage.objects.filter(
+            id__in=ids, status=OutboundMessage.STATUS_PENDING, available_at__lte=now,
+        ).update(claim_token=token, available_at=lease)
+
+    return list(OutboundMessage.objects.filter(claim_token=token, status=OutboundMessage.STATUS_PENDING).order_by("id"))
+
+
+def _deliver_emails(messages: List[OutboundMessage]) -> Dict[int, str]:
+    """Retourne {id: erreur} des messages non envoyés."""
+    outgoing = (
+        (m.id, EmailMessage(subject=m.subject, body=m.body, from_email=settings.DEFAULT_FROM_EMAIL, to=[m.to_email]))
+        for m in messages
+    )
+    report = send_bulk(outgoing)
+    return {message_id: "échec SMTP" for message_id in report.failed}
+
+
+def _deliver_pushes(messages: List[OutboundMessage]) -> Dict[int, str]:
+    from pushes.models import PushSubscription
+    from pushes.sender import send_pushes
+
+    by_user = defaultdict(list)
+    for m in messages:
+        by_user[m.user_id].append(m)
+    items = [
+        (m.id, sub, m.payload)
+        for sub in PushSubscription.objects.filter(user_id__in=list(by_user))
+        for m in by_user[sub.user_id]
+    ]
+    # aucun abonnement (ou seulement des expirés, supprimés au passage) : rien à renvoyer
+    report = send_pushes(items)
+    sent = set(report.sent)
+    return {message_id: "push refusé ou injoignable" for message_id in set(report.failed) - sent}
+
+
+def _finish(messages: List[OutboundMessage], errors: Dict[int, str], now) -> OutboxReport:
+    max_attempts = _setting("OUTBOX_MAX_ATTEMPTS", 6)
+    backoff = _setting("OUTBOX_BACKOFF_SECONDS", 60)
+    report = OutboxReport(claimed=len(messages))
+
+    sent_ids = [m.id for m in messages if m.id not in errors]
+    if sent_ids:
+        OutboundMessage.objects.filter(id__in=sent_ids).update(
+            status=OutboundMessage.STATUS_SENT, sent_at=now, attempts=F("attempts") + 1, claim_token="",
+        )
+        report.sent = len(sent_ids)
+
+    # une requête par (nombre d'essais, erreur) : le backoff dépend du nombre d'essais
+    groups = defaultdict(list)
+    for m in messages:
+        if m.id in errors:
+            groups[(m.attempts + 1, errors[m.id])].append(m.id)
+
+    for (attempts, error), ids in groups.items():
+        if attempts >= max_attempts:
+            OutboundMessage.objects.filter(id__in=ids).update(
+                status=OutboundMessage.STATUS_DEAD, attempts=attempts, last_error=error, claim_token="",
+            )
+            report.dead += len(ids)
+        else:
+            OutboundMessage.objects.filter(id__in=ids).update(
+                attempts=attempts,
+                last_error=error,
+                claim_token="",
+                available_at=now + timedelta(seconds=backoff * 2 ** (attempts - 1)),
+            )
+            report.retried += len(ids)
+    return report
+
+
+def process_outbox(limit: Optional[int] = None, now=None) -> OutboxReport:
+    """Un passage du worker : réserve, envoie, enregistre le bilan."""
+    messages = claim_batch(limit or _setting("OUTBOX_BATCH_SIZE", 500), now=now)
+    if not messages:
+        return OutboxReport()
+
+    errors: Dict[int, str] = {}
+    emails = [m for m in messages if m.channel == OutboundMessage.CHANNEL_EMAIL]
+    pushes = [m for m in messages if m.channel == OutboundMessage.CHANNEL_PUSH]
+    for deliver, batch in ((_deliver_emails, emails), (_deliver_pushes, pushes)):
+        if not batch:
+            continue
+        try:
+            errors.update(deliver(batch))
+        except Exception as exc:
+            errors.update({m.id: repr(exc) for m in batch})
+
+    return _finish(messages, errors, timezone.now())
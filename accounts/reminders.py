@@ -0,0 +1,191 @@
+# accounts/reminders.py
+"""
+Sélection des rappels Top5 (manage.py send_reminders).
+
+Pour chaque unité de la fenêtre, les destinataires sortent d'UNE requête (anti-jointure) :
+joueurs actifs avec email, sans préférence "pas de rappel",
+  - sans Bet validé sur l'unité
+  - sans ReminderLog pour l'unité
+Plus de requête par (joueur, unité) : le coût ne dépend plus que du nombre d'unités.
+
+Canaux : "email", "push" (abonnements PushSubscription, préchargés en une requête par lot
+de joueurs et envoyés en parallèle par pushes/sender.py) ou "both". Un joueur n'a
+qu'un ReminderLog par unité, quel que soit le canal qui l'a atteint.
+
+send_unit_reminders() envoie directement ; queue_reminders() passe par la file
+OutboundMessage (accounts/outbox.py), écrite dans la même transaction que les ReminderLog.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import islice
+from typing import Iterable, List, Tuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from bets.models import Bet
+from pushes.models import PushSubscription
+from pushes.sender import send_pushes
+from races.models import OneDayRace, Stage
+from .models import ReminderLog
+from .notifications import _can_email, reminder_message, reminder_payload, send_reminders_bulk
+from .outbox import email_message, enqueue_many, push_message
+
+UNIT_ONE_DAY = "one_day"
+UNIT_STAGE = "stage"
+
+LOG_BATCH_SIZE = 2000
+
+CHANNEL_EMAIL = "email"
+CHANNEL_PUSH = "push"
+CHANNEL_BOTH = "both"
+CHANNELS = (CHANNEL_EMAIL, CHANNEL_PUSH, CHANNEL_BOTH)
+
+# (kind, unité, libellé affiché)
+ReminderUnit = Tuple[str, object, str]
+
+
+def reminder_units(now=None, hours: int = 24) -> List[ReminderUnit]:
+    """Unités qui partent dans les `hours` prochaines heures (courses d'un jour puis étapes)."""
+    now = now or timezone.now()
+    limit = now + timedelta(hours=hours)
+
+    units: List[ReminderUnit] = []
+    for race in OneDayRace.objects.filter(start_datetime__gt=now, start_datetime__lte=limit).order_by("start_datetime"):
+        units.append((UNIT_ONE_DAY, race, getattr(race, "name", str(race))))
+
+    stages = (
+        Stage.objects.filter(start_datetime__gt=now, start_datetime__lte=limit)
+        .select_related("tour")
+        .order_by("start_datetime")
+    )
+    for stage in stages:
+        tour_name = getattr(stage.tour, "name", "Tour")
+        units.append((UNIT_STAGE, stage, f"{tour_name} — Étape {stage.number}".strip()))
+    return units
+
+
+def reminder_candidates(kind: str, unit, channel: str = CHANNEL_EMAIL):
+    """
+    Joueurs à relancer pour cette unité (une requête, évaluée paresseusement).
+    notif_prefs est joint : notify_reminder() ne refait pas de requête par joueur ;
+    pour le push, les abonnements sont préchargés (une requête par lot de l'iterator).
+    """
+    unit_filter = {"one_day_race_id": unit.id} if kind == UNIT_ONE_DAY else {"stage_id": unit.id}
+    submitted = Bet.objects.filter(user_id=OuterRef("pk"), submitted_at__isnull=False, **unit_filter)
+    reminded = ReminderLog.objects.filter(user_id=OuterRef("pk"), unit_kind=kind, unit_id=unit.id)
+    has_email = ~Q(email__isnull=True) & ~Q(email="")
+    has_push = Exists(PushSubscription.objects.filter(user_id=OuterRef("pk")))
+
+    users = (
+        get_user_model().objects
+        .filter(is_active=True)
+        .exclude(notif_prefs__email_reminders=False)
+        .filter(~Exists(submitted), ~Exists(reminded))
+        .select_related("notif_prefs")
+        .only("id", "username", "email", "is_active", "notif_prefs__email_reminders")
+        .order_by("id")
+    )
+    if channel == CHANNEL_EMAIL:
+        return users.filter(has_email)
+
+    users = users.prefetch_related(Prefetch(
+        "push_subscriptions",
+        queryset=PushSubscription.objects.only("id", "user_id", "endpoint", "p256dh", "auth"),
+    ))
+    if channel == CHANNEL_PUSH:
+        return users.filter(has_push)
+    return users.filter(has_email | Q(has_push))
+
+
+def log_reminders(kind: str, unit_id: int, user_ids: Iterable[int]) -> None:
+    """Marque les rappels comme envoyés (un lot d'INSERT, les doublons sont ignorés)."""
+    ReminderLog.objects.bulk_create(
+        [ReminderLog(user_id=user_id, unit_kind=kind, unit_id=unit_id) for user_id in user_ids],
+        batch_size=LOG_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _bet_path(kind: str, unit) -> str:
+    return reverse("bet_one_day" if kind == UNIT_ONE_DAY else "bet_stage", args=[unit.id])
+
+
+def _batches(users, size: int = LOG_BATCH_SIZE):
+    it = iter(users)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+# -------------------------
+# Envoi direct
+# -------------------------
+
+@dataclass
+class ReminderReport:
+    candidates: int = 0
+    sent: int = 0    # joueurs atteints (au moins un canal)
+    failed: int = 0  # joueurs non atteints : relancés au prochain passage (pas de ReminderLog)
+
+
+def send_unit_reminders(kind: str, unit, label: str, channel: str = CHANNEL_EMAIL, url=None) -> ReminderReport:
+    """
+    Envoie les rappels de l'unité par lots de joueurs : emails (une connexion SMTP par lot,
+    accounts/mailer.py) et/ou pushs (envoi concurrent, pushes/sender.py), puis ReminderLog des joueurs atteints.
+    """
+    report = ReminderReport()
+    push_payload = reminder_payload(label, unit.start_datetime, _bet_path(kind, unit))
+
+    for users in _batches(reminder_candidates(kind, unit, channel).iterator(chunk_size=LOG_BATCH_SIZE)):
+        reached = set()
+        if channel in (CHANNEL_EMAIL, CHANNEL_BOTH):
+            reached.update(send_reminders_bulk(users, label, unit.start_datetime, url=url).sent)
+        if channel in (CHANNEL_PUSH, CHANNEL_BOTH):
+            items = [(user.id, sub, push_payload) for user in users for sub in user.push_subscriptions.all()]
+            reached.update(send_pushes(items).sent)
+
+        log_reminders(kind, unit.id, reached)
+        report.candidates += len(users)
+        report.sent += len(reached)
+        report.failed += len(users) - len(reached)
+    return report
+
+
+# -------------------------
+# Mise en file (run_notification_worker)
+# -------------------------
+
+def queue_reminders(kind: str, unit, label: str, url=None, channel: str = CHANNEL_EMAIL) -> int:
+    """Met en file les rappels de l'unité et les marque envoyés (une transaction). Retourne le nombre de joueurs."""
+    queued = 0
+    with transaction.atomic():
+        for users in _batches(reminder_candidates(kind, unit, channel).iterator(chunk_size=LOG_BATCH_SIZE)):
+            queued += _queue_batch(kind, unit, label, url, channel, users)
+    return queued
+
+
+def _queue_batch(kind: str, unit, label: str, url, channel: str, users) -> int:
+    messages = []
+    reached = set()
+    push_payload = reminder_payload(label, unit.start_datetime, _bet_path(kind, unit))
+    for user in users:
+        if channel in (CHANNEL_EMAIL, CHANNEL_BOTH) and _can_email(user, "reminders"):
+            m = reminder_message(user, label, unit.start_datetime, url)
+            messages.append(email_message(
+                user.email, m.subject, m.body, user=user, dedup_key=f"reminder:{kind}:{unit.id}:{user.id}",
+            ))
+            reached.add(user.id)
+        if channel in (CHANNEL_PUSH, CHANNEL_BOTH) and user.push_subscriptions.all():
+            messages.append(push_message(user, push_payload, dedup_key=f"reminder:{kind}:{unit.id}:{user.id}:push"))
+            reached.add(user.id)
+    enqueue_many(messages)
+    log_reminders(kind, unit.id, reached)
+    return len(reached)
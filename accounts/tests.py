@@ -1,3 +1,138 @@
-from django.test import TestCase
+import smtplib
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from bets.leaderboard_cache import _cache
+from bets.models import SeasonStanding
+from races.models import Season
+
+from .mailer import send_bulk
+
+
+class FlakyBackend(BaseEmailBackend):
+    """
+    Backend de test : `plan` = {sujet: [exception, ...]} levées une à une aux envois
+    successifs de ce message ; `unreachable` : l'ouverture de connexion échoue toujours.
+    """
+
+    plan = {}
+    unreachable = False
+    delivered = []
+    connections = 0
+
+    @classmethod
+    def reset(cls, plan=None, unreachable=False):
+        cls.plan = {subject: list(errors) for subject, errors in (plan or {}).items()}
+        cls.unreachable = unreachable
+        cls.delivered = []
+        cls.connections = 0
+
+    def open(self):
+        if FlakyBackend.unreachable:
+            raise ConnectionRefusedError("relais injoignable")
+        FlakyBackend.connections += 1
+        return True
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        for message in messages:
+            errors = FlakyBackend.plan.get(message.subject)
+            if errors:
+                raise errors.pop(0)
+            FlakyBackend.delivered.append(message.subject)
+        return len(messages)
+
+
+@override_settings(EMAIL_BACKEND="accounts.tests.FlakyBackend", MAIL_RETRY_BACKOFF=0)
+class SendBulkTests(SimpleTestCase):
+    def _send(self, n=5, **kwargs):
+        messages = [(i, EmailMessage(f"m{i}", "corps", to=[f"j{i}@example.com"])) for i in range(n)]
+        kwargs.setdefault("workers", 1)
+        kwargs.setdefault("batch_size", n)
+        return send_bulk(messages, **kwargs)
+
+    def test_batch_resumes_from_the_failed_message(self):
+        FlakyBackend.reset({"m2": [smtplib.SMTPServerDisconnected("coupé")]})
+
+        with self.assertLogs("accounts.mailer", "WARNING"):
+            report = self._send()
+
+        self.assertEqual(sorted(report.sent), [0, 1, 2, 3, 4])
+        self.assertEqual(report.failed, [])
+        self.assertEqual(report.retries, 1)
+        # les messages déjà acceptés ne repartent pas sur la nouvelle connexion
+        self.assertEqual(FlakyBackend.delivered, ["m0", "m1", "m2", "m3", "m4"])
+        self.assertEqual(FlakyBackend.connections, 2)
+
+    def test_permanent_refusal_skips_only_that_message(self):
+        refused = smtplib.SMTPRecipientsRefused({"j2@example.com": (550, b"unknown user")})
+        FlakyBackend.reset({"m2": [refused]})
+
+        with self.assertLogs("accounts.mailer", "WARNING"):
+            report = self._send()
+
+        self.assertEqual(report.failed, [2])
+        self.assertEqual(sorted(report.sent), [0, 1, 3, 4])
+        self.assertEqual(report.retries, 0)
+        self.assertEqual(FlakyBackend.delivered, ["m0", "m1", "m3", "m4"])
+
+    def test_message_failing_every_retry_is_dropped_alone(self):
+        FlakyBackend.reset({"m1": [smtplib.SMTPDataError(451, b"try later")] * 3})
+
+        with self.assertLogs("accounts.mailer", "WARNING"):
+            report = self._send(max_retries=2)
+
+        self.assertEqual(report.failed, [1])
+        self.assertEqual(sorted(report.sent), [0, 2, 3, 4])
+        self.assertEqual(report.retries, 2)
+        self.assertEqual(FlakyBackend.delivered, ["m0", "m2", "m3", "m4"])
+
+    def test_unreachable_relay_abandons_the_batch(self):
+        FlakyBackend.reset(unreachable=True)
+
+        with self.assertLogs("accounts.mailer", "WARNING"):
+            report = self._send(max_retries=1)
+
+        self.assertEqual(report.sent, [])
+        self.assertEqual(sorted(report.failed), [0, 1, 2, 3, 4])
+        self.assertEqual(FlakyBackend.delivered, [])
+
+    def test_on_sent_is_called_per_batch(self):
+        FlakyBackend.reset()
+        batches = []
+
+        report = self._send(batch_size=2, on_sent=batches.append)
+
+        self.assertEqual(report.batches, 3)
+        self.assertEqual(sorted(key for batch in batches for key in batch), [0, 1, 2, 3, 4])
+
+
+class DashboardSeasonRankTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        season = Season.objects.create(year=2026)
+        User = get_user_model()
+        cls.users = [User.objects.create_user(username=f"j{i}", email=f"j{i}@example.com", password="pw") for i in range(3)]
+        for rank, user in enumerate(cls.users, 1):
+            SeasonStanding.objects.create(user=user, season=season, total=30 - rank, rank=rank)
+
+    def setUp(self):
+        _cache().clear()
+        self.client.force_login(self.users[1])
+
+    def test_player_count_comes_from_the_cached_ranking(self):
+        self.client.get("/dashboard/", secure=True)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/dashboard/", secure=True)
+
+        self.assertEqual((response.context["season_rank"]["rank"], response.context["season_rank"]["count"]), (2, 3))
+        table = SeasonStanding._meta.db_table
+        self.assertFalse([q["sql"] for q in ctx.captured_queries if "COUNT(" in q["sql"] and table in q["sql"]])
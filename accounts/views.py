@@ -1,11 +1,12 @@
 #accounts/views.py
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.db import transaction
 from django.urls import reverse
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from .forms import SignupForm
+from .outbox import enqueue_email
 from django.db import models
 from django.db.models import Sum
 from badges.models import UserBadge
@@ -23,8 +24,11 @@ from django.utils import timezone
 
 from accounts.models import Profile
 from badges.models import UserBadge
-from races.models import OneDayRace, Stage, Result
-from bets.models import Bet, BetScore
+from races.models import OneDayRace, Season, Stage, Result
+from bets.models import Bet, BetScore, SeasonStanding
+from bets.leaderboard_cache import cached_edges
+from bets.ranking import rank_and_total, season_scope
+from .dashboard import dashboard_units
 
 # ✅ helper "Option A" : CountryField -> code ISO2 str
 def _country_iso2(country_value) -> str:
@@ -51,41 +55,10 @@ def signup_view(request):
     if request.method == "POST":
         form = SignupForm(request.POST, request.FILES)
         if form.is_valid():
-            user = form.save()  # ✅ crée user + profile, user inactive
-
-            # --- Email de bienvenue ---
-            send_mail(
-                subject=_("Bienvenue sur Coup de Bordure !"),
-                message=_(
-                    "Bonjour %(username)s,\n\n"
-                    "Bienvenue sur Coup de Bordure 🎉\n"
-                    "Confirme ton email pour activer ton compte.\n\n"
-                    "À bientôt !"
-                ) % {"username": user.username},
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
-
-            # --- Email de confirmation ---
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            token = email_verification_token.make_token(user)
-            verify_url = request.build_absolute_uri(
-                reverse("verify_email", kwargs={"uidb64": uid, "token": token})
-            )
-
-            send_mail(
-                subject=_("Confirme ton email — Coup de Bordure"),
-                message=_(
-                    "Bonjour %(username)s,\n\n"
-                    "Clique sur ce lien pour confirmer ton email :\n"
-                    f"{verify_url}\n\n"
-                    "Si tu n’es pas à l’origine de cette inscription, ignore ce message."
-                ) % {"username": user.username},
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
+            # ✅ crée user + profile, user inactive ; les emails partent via la file (accounts/outbox.py)
+            with transaction.atomic():
+                user = form.save()
+                _enqueue_signup_emails(request, user)
 
             messages.success(request, _("Compte créé ✅ Confirme ton email (voir console) puis connecte-toi."))
             return redirect("login")
@@ -94,6 +67,43 @@ def signup_view(request):
 
     return render(request, "accounts/signup.html", {"form": form})
 
+
+def _enqueue_signup_emails(request, user):
+    # --- Email de bienvenue ---
+    enqueue_email(
+        user.email,
+        subject=_("Bienvenue sur Coup de Bordure !"),
+        body=_(
+            "Bonjour %(username)s,\n\n"
+            "Bienvenue sur Coup de Bordure 🎉\n"
+            "Confirme ton email pour activer ton compte.\n\n"
+            "À bientôt !"
+        ) % {"username": user.username},
+        user=user,
+        dedup_key=f"signup:welcome:{user.pk}",
+    )
+
+    # --- Email de confirmation ---
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = email_verification_token.make_token(user)
+    verify_url = request.build_absolute_uri(
+        reverse("verify_email", kwargs={"uidb64": uid, "token": token})
+    )
+
+    enqueue_email(
+        user.email,
+        subject=_("Confirme ton email — Coup de Bordure"),
+        body=_(
+            "Bonjour %(username)s,\n\n"
+            "Clique sur ce lien pour confirmer ton email :\n"
+            f"{verify_url}\n\n"
+            "Si tu n’es pas à l’origine de cette inscription, ignore ce message."
+        ) % {"username": user.username},
+        user=user,
+        dedup_key=f"signup:verify:{user.pk}",
+    )
+
+
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.shortcuts import render
@@ -137,118 +147,27 @@ def _badge_icon_url_for_badge(badge) -> str:
 def dashboard_view(request):
     now = timezone.now()
 
-    # --- Récupérer les unités ---
-    one_days = OneDayRace.objects.select_related("season").all()
-    stages = Stage.objects.select_related("tour", "tour__season").all()
-
-    # --- Bets de l'utilisateur (pour statuts top5/score) ---
-    user_bets_one_day = {
-        b.one_day_race_id: b
-        for b in Bet.objects.filter(user=request.user, one_day_race__isnull=False)
-        .select_related("pick1", "pick2", "pick3", "pick4", "pick5")
-    }
-    user_bets_stage = {
-        b.stage_id: b
-        for b in Bet.objects.filter(user=request.user, stage__isnull=False)
-        .select_related("pick1", "pick2", "pick3", "pick4", "pick5")
-    }
-
-    # Scores (optionnel)
-    score_by_bet_id = {
-        s.bet_id: s
-        for s in BetScore.objects.filter(bet__user=request.user)
-        .select_related("bet")
-    }
-
-    # Résultats : on considère "terminé" si >= 3 résultats saisis
-    results_count_one_day = {}
-    for r in (
-        Result.objects.filter(one_day_race__isnull=False)
-        .values("one_day_race_id")
-        .annotate(c=models.Count("id"))
-    ):
-        results_count_one_day[r["one_day_race_id"]] = r["c"]
-
-    results_count_stage = {}
-    for r in (
-        Result.objects.filter(stage__isnull=False)
-        .values("stage_id")
-        .annotate(c=models.Count("id"))
-    ):
-        results_count_stage[r["stage_id"]] = r["c"]
-
-    # Petit helper pour construire une carte "unité"
-    def make_unit(kind, obj, start_dt, url_detail, url_bet, url_lb, tour=None):
-        if kind == "one_day":
-            bet = user_bets_one_day.get(obj.id)
-            results_ok = results_count_one_day.get(obj.id, 0) >= 3
-        else:
-            bet = user_bets_stage.get(obj.id)
-            results_ok = results_count_stage.get(obj.id, 0) >= 3
-
-        locked = now >= start_dt
-        has_top5 = bool(bet and bet.pick1 and bet.pick2 and bet.pick3 and bet.pick4 and bet.pick5)
-        score_obj = score_by_bet_id.get(bet.id) if bet else None
-
-        if results_ok:
-            status = "finished"
-        elif locked:
-            status = "locked"
-        else:
-            status = "upcoming"
-
-        return {
-            "kind": kind,
-            "obj": obj,
-            "tour": tour,
-            "start_dt": start_dt,
-            "locked": locked,
-            "results_ok": results_ok,
-            "has_top5": has_top5,
-            "bet": bet,
-            "score": score_obj.score if score_obj else None,
-            "submitted_at": bet.submitted_at if bet else None,
-            "status": status,
-            "url_detail": url_detail,
-            "url_bet": url_bet,
-            "url_lb": url_lb,
-        }
-
-    units = []
-
-    for r in one_days:
-        units.append(make_unit(
-            kind="one_day",
-            obj=r,
-            start_dt=r.start_datetime,
-            url_detail=("one_day_detail", r.id),
-            url_bet=("bet_one_day", r.id),
-            url_lb=("lb_one_day", r.id),
-        ))
-
-    for s in stages:
-        units.append(make_unit(
-            kind="stage",
-            obj=s,
-            start_dt=s.start_datetime,
-            url_detail=("stage_detail", s.id),
-            url_bet=("bet_stage", s.id),
-            url_lb=("lb_stage", s.id),
-            tour=s.tour,
-        ))
-
-    units.sort(key=lambda u: u["start_dt"])
-
-    upcoming = [u for u in units if u["status"] == "upcoming"][:3]
-    locked = [u for u in units if u["status"] == "locked"][:3]
-    finished = [u for u in units if u["status"] == "finished"][:3]
+    # 3 à venir / 3 verrouillées / 3 terminées, avec prono + score du joueur : une requête
+    units = dashboard_units(request.user, now=now)
 
+    # total toutes saisons = somme des classements de saison matérialisés
     total_score = (
-        BetScore.objects.filter(bet__user=request.user)
-        .aggregate(total=Sum("score"))["total"]
+        SeasonStanding.objects.filter(user=request.user)
+        .aggregate(total=Sum("total"))["total"]
         or 0
     )
 
+    # Position dans la saison en cours (lookup d'index sur le classement matérialisé) ;
+    # nombre de joueurs lu dans l'entrée en cache du classement, pas de COUNT à chaque visite
+    current_season = Season.objects.order_by("-year").first()
+    season_rank = None
+    if current_season is not None:
+        scope = season_scope(current_season)
+        found = rank_and_total(scope, request.user.id)
+        if found is not None:
+            count = cached_edges(scope)["count"]
+            season_rank = {"season": current_season, "rank": found[0], "total": found[1], "count": count}
+
     badges_recent = list(
         UserBadge.objects.filter(user=request.user)
         .select_related("badge")
@@ -269,10 +188,11 @@ def dashboard_view(request):
 
     return render(request, "accounts/dashboard.html", {
         "now": now,
-        "upcoming": upcoming,
-        "locked": locked,
-        "finished": finished,
+        "upcoming": units["upcoming"],
+        "locked": units["locked"],
+        "finished": units["finished"],
         "total_score": total_score,
+        "season_rank": season_rank,
         "badges_recent": badges_recent,
         "me_avatar_url": me_avatar_url,
         "me_flag_url": me_flag_url,
@@ -1,10 +1,9 @@
 from django.core.management.base import BaseCommand
-from django.db.models import Sum
 from django.shortcuts import get_object_or_404
 
 from races.models import Season
-from bets.models import BetScore
-from badges.services import award_badge, user_id_to_user
+from bets.ranking import season_scope, users_at_ranks
+from badges.services import award_badges_bulk
 
 
 class Command(BaseCommand):
@@ -17,28 +16,12 @@ class Command(BaseCommand):
         year = opts["year"]
         season = get_object_or_404(Season, year=year)
 
-        qs1 = (
-            BetScore.objects.filter(bet__one_day_race__season=season)
-            .values("bet__user_id", "bet__user__username")
-            .annotate(total=Sum("score"))
+        # Classement de saison matérialisé : on lit directement les 10 premiers rangs
+        user_ids = users_at_ranks(season_scope(season), 1, 10)
+        created = award_badges_bulk(
+            "TOP10_GLOBAL", [(user_id, {"season": season.year}) for user_id in user_ids], update_context=True,
         )
-        qs2 = (
-            BetScore.objects.filter(bet__stage__tour__season=season)
-            .values("bet__user_id", "bet__user__username")
-            .annotate(total=Sum("score"))
-        )
-
-        totals = {}
-        for row in list(qs1) + list(qs2):
-            key = (row["bet__user_id"], row["bet__user__username"])
-            totals[key] = totals.get(key, 0) + float(row["total"] or 0)
-
-        rows = [{"user_id": k[0], "username": k[1], "total": v} for k, v in totals.items()]
-        rows.sort(key=lambda r: (-r["total"], r["username"]))
-
-        count = 0
-        for r in rows[:10]:
-            award_badge(user_id_to_user(r["user_id"]), "TOP10_GLOBAL", {"season": season.year})
-            count += 1
 
-        self.stdout.write(self.style.SUCCESS(f"✅ TOP10_GLOBAL attribué pour {year} (top {count})"))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ TOP10_GLOBAL attribué pour {year} (top {len(user_ids)}, nouveaux: {len(created)})"
+        ))
\ No newline at end of file
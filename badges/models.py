@@ -44,4 +44,24 @@ class UserBadge(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.user} - {self.badge}"
\ No newline at end of file
+        return f"{self.user} - {self.badge}"
+
+class SeasonParticipation(models.Model):
+    """
+    Participation d'un joueur à une saison, tenue à jour à chaque prono validé
+    (badges/services.py, evaluate_user_badges_for_season) : les badges saison se
+    vérifient en mémoire contre le calendrier en cache (badges/season_catalog.py).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="season_participations")
+    year = models.PositiveIntegerField()
+    one_day_ids = models.JSONField(default=list, blank=True)  # courses d'un jour jouées
+    tour_ids = models.JSONField(default=list, blank=True)     # tours avec au moins une étape jouée
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "year"], name="uniq_season_participation")
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.year}"
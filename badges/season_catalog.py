@@ -0,0 +1,105 @@
+# badges/season_catalog.py
+"""
+Calendrier d'une saison vu par les badges "participation saison", mis en cache.
+
+Le calendrier (courses d'un jour, tours et leurs étapes, monuments, grands tours)
+change quelques fois par an, alors que evaluate_user_badges_for_season est appelé
+à chaque prono : on le lit une fois par saison, et badges/signals.py supprime
+l'entrée quand une OneDayRace, un Tour ou une Stage de la saison est modifié.
+
+Backend : alias "leaderboards" (partagé entre process en file/db, cf. settings) ;
+le TIMEOUT de l'alias borne l'écart si une modification échappe aux signaux
+(ex: .update() en masse).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Set
+
+from django.conf import settings
+from django.core.cache import caches
+
+from races.models import OneDayRace, Stage, Tour
+
+CACHE_ALIAS = "leaderboards"
+
+MONUMENTS = {
+    "Milan-San Remo",
+    "Tour des Flandres",
+    "Paris-Roubaix",
+    "Liège-Bastogne-Liège",
+    "Tour de Lombardie",
+}
+
+GRAND_TOURS = {
+    "Tour de France",
+    "Tour d'Italie",
+    "Tour d'Espagne",
+}
+
+
+def _cache():
+    return caches[CACHE_ALIAS if CACHE_ALIAS in settings.CACHES else "default"]
+
+
+def cache_key(year: int) -> str:
+    return f"season_catalog:{year}"
+
+
+@dataclass(frozen=True)
+class SeasonCatalog:
+    year: int
+    one_day_ids: FrozenSet[int] = frozenset()
+    tour_ids: FrozenSet[int] = frozenset()
+    stage_tours: Dict[int, int] = field(default_factory=dict)  # stage_id -> tour_id
+    monument_ids: FrozenSet[int] = frozenset()
+    grand_tour_ids: FrozenSet[int] = frozenset()
+
+    def earned_badges(self, one_day_ids: Set[int], tour_ids: Set[int]) -> Set[str]:
+        """
+        Codes des badges saison mérités par une participation donnée (en mémoire, sans requête) :
+        one_day_ids = courses d'un jour jouées, tour_ids = tours avec au moins une étape jouée.
+        """
+        year = self.year
+        earned: Set[str] = set()
+        if one_day_ids or tour_ids:
+            earned.add(f"FIRST_UNIT_PLAYED_{year}")
+
+        # Saison complète : toutes les one-day + au moins 1 étape par tour
+        if self.one_day_ids and self.one_day_ids <= one_day_ids and self.tour_ids and self.tour_ids <= tour_ids:
+            earned.add(f"SEASON_FINISHER_{year}")
+
+        if len(self.monument_ids) == len(MONUMENTS) and self.monument_ids <= one_day_ids:
+            earned.add(f"MONUMENT_FINISHER_{year}")
+
+        if len(self.grand_tour_ids) == len(GRAND_TOURS) and self.grand_tour_ids <= tour_ids:
+            earned.add(f"GRANDTOUR_FINISHER_{year}")
+        return earned
+
+
+def _build(year: int) -> SeasonCatalog:
+    one_days = list(OneDayRace.objects.filter(season__year=year).values_list("id", "name"))
+    tours = list(Tour.objects.filter(season__year=year).values_list("id", "name"))
+    stage_tours = dict(Stage.objects.filter(tour__season__year=year).values_list("id", "tour_id"))
+    return SeasonCatalog(
+        year=year,
+        one_day_ids=frozenset(race_id for race_id, _ in one_days),
+        tour_ids=frozenset(tour_id for tour_id, _ in tours),
+        stage_tours=stage_tours,
+        monument_ids=frozenset(race_id for race_id, name in one_days if name in MONUMENTS),
+        grand_tour_ids=frozenset(tour_id for tour_id, name in tours if name in GRAND_TOURS),
+    )
+
+
+def season_catalog(year: int) -> SeasonCatalog:
+    """Calendrier de la saison `year` : 3 requêtes à la construction, aucune ensuite."""
+    cache = _cache()
+    catalog = cache.get(cache_key(year))
+    if catalog is None:
+        catalog = _build(year)
+        cache.set(cache_key(year), catalog)
+    return catalog
+
+
+def invalidate_season_catalog(year: int) -> None:
+    _cache().delete(cache_key(year))
@@ -2,29 +2,22 @@
 
 from __future__ import annotations
 
-from typing import Dict, Set, Tuple
-
-from django.db import transaction
-from django.db.models import Q, Sum
-
-from badges.models import Badge, UserBadge
-from bets.models import BetScore, Bet
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from badges.models import Badge, SeasonParticipation, UserBadge
+from badges.season_catalog import GRAND_TOURS, MONUMENTS, season_catalog  # noqa: F401 (noms historiques)
+from bets.models import BetScore, Bet, UnitFacts
+from bets.ranking import tour_scope, users_at_ranks
 from races.models import OneDayRace, Stage, Tour
-
-
-MONUMENTS = {
-    "Milan-San Remo",
-    "Tour des Flandres",
-    "Paris-Roubaix",
-    "Liège-Bastogne-Liège",
-    "Tour de Lombardie",
-}
-
-GRAND_TOURS = {
-    "Tour de France",
-    "Tour d'Italie",
-    "Tour d'Espagne",
-}
+from stats.services import refresh_played
 
 
 # -------------------------
@@ -37,7 +30,91 @@ def user_id_to_user(user_id):
     return User.objects.get(id=user_id)
 
 
-from django.db import IntegrityError, transaction
+# Catalogue code -> id, propre au process : les badges changent rarement (seed_badges, admin).
+# Vidé par badges/signals.py quand un Badge est enregistré ou supprimé dans ce process ;
+# un code absent n'est pas mémorisé (un badge créé plus tard est trouvé au prochain appel).
+_badge_ids: Dict[str, int] = {}
+
+AWARD_BATCH_SIZE = 500
+
+
+def clear_badge_cache() -> None:
+    _badge_ids.clear()
+
+
+def badge_id(code: str) -> int | None:
+    if code not in _badge_ids:
+        found = Badge.objects.filter(code=code).values_list("id", flat=True).first()
+        if found is None:
+            return None
+        _badge_ids[code] = found
+    return _badge_ids[code]
+
+
+def award_badges_bulk(
+    code: str,
+    awards: Iterable[Tuple[int, dict | None]],
+    update_context: bool = False,
+) -> Set[int]:
+    """
+    Attribue le badge `code` à plusieurs joueurs : [(user_id, context), ...].
+    Un INSERT ... ON CONFLICT par lot de AWARD_BATCH_SIZE (contrainte uniq_user_badge),
+    sans savepoint ni lecture préalable :
+    - par défaut, les badges déjà détenus sont ignorés (DO NOTHING)
+    - update_context=True : leur contexte est remplacé s'il a changé (DO UPDATE ... WHERE),
+      comme le faisait award_badge (ex. WIN_TOUR après une correction de résultats)
+    Retourne les user_id qui viennent de recevoir le badge (pour grouper les notifications).
+    """
+    bid = badge_id(code)
+    if bid is None:
+        return set()
+
+    # un seul contexte par joueur (le premier), sinon l'INSERT porterait deux fois la même clé
+    contexts: Dict[int, dict] = {}
+    for user_id, context in awards:
+        contexts.setdefault(user_id, context or {})
+    if not contexts:
+        return set()
+
+    qn = connection.ops.quote_name
+    opts = UserBadge._meta
+    fields = [opts.get_field(name) for name in ("user", "badge", "awarded_at", "context")]
+    columns = ", ".join(qn(f.column) for f in fields)
+    conflict = ", ".join(qn(opts.get_field(name).column) for name in ("user", "badge"))
+    context_field, awarded_at_field = opts.get_field("context"), opts.get_field("awarded_at")
+    awarded_at = awarded_at_field.get_db_prep_value(timezone.now(), connection)
+
+    table, context_col = qn(opts.db_table), qn(context_field.column)
+    if update_context:
+        # context est NOT NULL : <> suffit (pas besoin de IS DISTINCT FROM)
+        on_conflict = (
+            f"DO UPDATE SET {context_col} = EXCLUDED.{context_col} "
+            f"WHERE {table}.{context_col} <> EXCLUDED.{context_col}"
+        )
+    else:
+        on_conflict = "DO NOTHING"
+
+    items = list(contexts.items())
+    created: Set[int] = set()
+    with connection.cursor() as cursor:
+        for i in range(0, len(items), AWARD_BATCH_SIZE):
+            chunk = items[i:i + AWARD_BATCH_SIZE]
+            params = []
+            for user_id, context in chunk:
+                params += [user_id, bid, awarded_at, context_field.get_db_prep_value(context, connection)]
+            # lignes mises à jour aussi renvoyées : créées = awarded_at de cet appel
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({columns})
+                VALUES {", ".join(["(%s, %s, %s, %s)"] * len(chunk))}
+                ON CONFLICT ({conflict}) {on_conflict}
+                RETURNING {qn(fields[0].column)}, {qn(awarded_at_field.column)} = %s
+                """,
+                params + [awarded_at],
+            )
+            created.update(user_id for user_id, is_new in cursor.fetchall() if is_new)
+    return created
+
 
 def award_badge(user, badge_code: str, context: dict | None = None) -> bool:
     """
@@ -45,15 +122,15 @@ def award_badge(user, badge_code: str, context: dict | None = None) -> bool:
     Ne plante jamais si le badge est déjà attribué (contrainte uniq_user_badge).
     """
     context = context or {}
-    badge = Badge.objects.filter(code=badge_code).first()
-    if not badge:
+    bid = badge_id(badge_code)
+    if bid is None:
         return False
 
     try:
         with transaction.atomic():
             ub, created = UserBadge.objects.get_or_create(
                 user=user,
-                badge=badge,
+                badge_id=bid,
                 defaults={"context": context},
             )
     except IntegrityError:
@@ -72,7 +149,7 @@ def award_badge(user, badge_code: str, context: dict | None = None) -> bool:
 def award_first_bet(user) -> bool:
     """
     Badge "premier prono" : quand l'utilisateur a exactement 1 Bet en base.
-    (appelé juste après la sauvegarde du prono)
+    (les vues de prono passent par award_bet_badges_since_watermark)
     """
     if Bet.objects.filter(user=user).count() == 1:
         return award_badge(user, "FIRST_BET", {"type": "global"})
@@ -115,44 +192,172 @@ def update_tour_badges(tour: Tour):
     Badges tour basés sur le classement (somme des scores des étapes).
     WIN_TOUR pour le 1er + RED_LANTERN_TOUR pour le dernier.
     """
-    rows = list(
-        BetScore.objects
-        .filter(bet__stage__tour=tour)
-        .values("bet__user_id", "bet__user__username")
-        .annotate(total=Sum("score"))
-        .order_by("-total", "bet__user__username")
-    )
-    if not rows:
+    # classement du tour matérialisé (bets.ranking) : 1er et dernier rang
+    scope = tour_scope(tour)
+    n = scope.count()
+    if not n:
         return
-
-    winner_user_id = rows[0]["bet__user_id"]
-    last_user_id = rows[-1]["bet__user_id"]
+    winner_user_id = users_at_ranks(scope, 1)[0]
+    last_user_id = users_at_ranks(scope, n)[0]
 
     context = {"type": "tour", "id": tour.id}
-    award_badge(user_id_to_user(winner_user_id), "WIN_TOUR", context)
-    award_badge(user_id_to_user(last_user_id), "RED_LANTERN_TOUR", context)
+    # contexte = dernier tour gagné / fini dernier
+    award_badges_bulk("WIN_TOUR", [(winner_user_id, context)], update_context=True)
+    award_badges_bulk("RED_LANTERN_TOUR", [(last_user_id, context)], update_context=True)
 
     # Optionnel : tente aussi le badge "saison complète" pour le vainqueur
-    award_season_full(user_id_to_user(winner_user_id), tour.season)
+    award_season_full(winner_user_id, tour.season)
+
+
+# -------------------------
+# Badges de rang par unité (WINNER_UNIT / PODIUM_UNIT / TOP5_UNIT)
+# -------------------------
+
+UNIT_RANK_BADGES = (("WINNER_UNIT", 1), ("PODIUM_UNIT", 3), ("TOP5_UNIT", 5))
+UNIT_BADGE_BATCH_SIZE = 200
+
+# JobState (scheduler) qui porte le curseur (UnitFacts.updated_at, id) du mode incrémental
+UNIT_BADGES_WATERMARK = "award_badges"
+
+
+def unit_rank_badge_ids() -> Dict[str, int]:
+    """{code: id} des badges de rang, résolus une fois par passage. LookupError si l'un manque."""
+    codes = [code for code, _ in UNIT_RANK_BADGES]
+    ids = {code: badge_id(code) for code in codes}
+    missing = [code for code in codes if ids[code] is None]
+    if missing:
+        raise LookupError(missing)
+    return ids
+
+
+def award_unit_rank_badges(units: List[Tuple[str, int]], badge_ids: Dict[str, int], dry_run: bool = False) -> int:
+    """
+    units : [("one_day" | "stage", id), ...] (unités terminées).
+    Top 5 de toutes les unités lus en une requête (index (unité, rang) de BetScore),
+    badges déjà détenus en une requête, puis un seul INSERT (doublons ignorés).
+    Retourne le nombre de badges créés.
+    """
+    one_day_ids = [unit_id for kind, unit_id in units if kind == "one_day"]
+    stage_ids = [unit_id for kind, unit_id in units if kind == "stage"]
+    max_rank = max(rank for _, rank in UNIT_RANK_BADGES)
+
+    top = defaultdict(list)
+    for one_day_race_id, stage_id, user_id in (
+        BetScore.objects.filter(rank__lte=max_rank)
+        .filter(Q(one_day_race_id__in=one_day_ids) | Q(stage_id__in=stage_ids))
+        .order_by("rank")
+        .values_list("one_day_race_id", "stage_id", "bet__user_id")
+    ):
+        top[("one_day", one_day_race_id) if one_day_race_id else ("stage", stage_id)].append(user_id)
+
+    # (user, badge) -> contexte de la première unité qui l'attribue (comme get_or_create unité par unité)
+    candidates: Dict[Tuple[int, int], Dict] = {}
+    for kind, unit_id in units:
+        user_ids = top.get((kind, unit_id), [])
+        for code, rank in UNIT_RANK_BADGES:
+            for user_id in user_ids[:rank]:
+                candidates.setdefault((user_id, badge_ids[code]), {"kind": kind, "unit_id": unit_id})
+    if not candidates:
+        return 0
+
+    existing = set(
+        UserBadge.objects.filter(
+            user_id__in={user_id for user_id, _ in candidates},
+            badge_id__in=list(badge_ids.values()),
+        ).values_list("user_id", "badge_id")
+    )
+    rows = [
+        UserBadge(user_id=user_id, badge_id=badge_id, context=context)
+        for (user_id, badge_id), context in candidates.items()
+        if (user_id, badge_id) not in existing
+    ]
+    if rows and not dry_run:
+        UserBadge.objects.bulk_create(rows, ignore_conflicts=True)
+    return len(rows)
+
+
+def _finished_units(facts_rows) -> List[Tuple[str, int]]:
+    return [("one_day", one_day_race_id) if one_day_race_id else ("stage", stage_id) for one_day_race_id, stage_id in facts_rows]
+
+
+def award_all_finished_unit_badges(dry_run: bool = False, batch_size: int = UNIT_BADGE_BATCH_SIZE) -> Tuple[int, int]:
+    """Toutes les unités terminées, par lots. Retourne (unités, badges créés)."""
+    badge_ids = unit_rank_badge_ids()
+    units = created = 0
+    last_id = 0
+    while True:
+        batch = list(
+            UnitFacts.objects.filter(finished=True, id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "one_day_race_id", "stage_id")[:batch_size]
+        )
+        if not batch:
+            return units, created
+        created += award_unit_rank_badges(_finished_units([row[1:] for row in batch]), badge_ids, dry_run)
+        units += len(batch)
+        last_id = batch[-1][0]
+
+
+def award_unit_badges_since_watermark(dry_run: bool = False, batch_size: int = UNIT_BADGE_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Seulement les unités terminées dont les faits (donc les résultats) ont changé depuis le
+    dernier passage : curseur (UnitFacts.updated_at, id) dans JobState, avancé après chaque lot.
+
+    updated_at est posé au début de la transaction de recalcul (bets/recompute.py), validée
+    bien plus tard : comme pour les pronos, on ne lit que les faits plus vieux que
+    UNIT_BADGES_WATERMARK_LAG_SECONDS, pour que le curseur ne dépasse jamais un recalcul
+    encore en cours.
+    Retourne (unités, badges créés).
+    """
+    from scheduler.models import JobState
+
+    until = timezone.now() - timedelta(seconds=settings.UNIT_BADGES_WATERMARK_LAG_SECONDS)
+
+    badge_ids = unit_rank_badge_ids()
+    state, _ = JobState.objects.get_or_create(name=UNIT_BADGES_WATERMARK)
+    cursor = state.cursor or {}
+    since = parse_datetime(cursor["updated_at"]) if cursor.get("updated_at") else None
+    last_id = cursor.get("id", 0)
+
+    units = created = 0
+    while True:
+        facts = UnitFacts.objects.filter(finished=True, updated_at__lt=until)
+        if since is not None:
+            facts = facts.filter(Q(updated_at__gt=since) | Q(updated_at=since, id__gt=last_id))
+        batch = list(
+            facts.order_by("updated_at", "id")
+            .values_list("id", "updated_at", "one_day_race_id", "stage_id")[:batch_size]
+        )
+        if not batch:
+            return units, created
+
+        created += award_unit_rank_badges(_finished_units([row[2:] for row in batch]), badge_ids, dry_run)
+        units += len(batch)
+        last_id, since = batch[-1][0], batch[-1][1]
+        if not dry_run:
+            state.cursor = {"updated_at": since.isoformat(), "id": last_id}
+            state.save(update_fields=["cursor"])
 
 
 def award_season_full(user, season) -> bool:
     """
     Exemple historique (ancien) : toutes les unités jouées (one_day + toutes étapes).
     Attention: ici "joué" = Bet existant, pas forcément Top5 complet.
+    user : User ou user_id.
     """
+    user_id = getattr(user, "id", user)
     total_units = (
         OneDayRace.objects.filter(season=season).count()
         + Stage.objects.filter(tour__season=season).count()
     )
 
     user_units = (
-        Bet.objects.filter(user=user, one_day_race__season=season).count()
-        + Bet.objects.filter(user=user, stage__tour__season=season).count()
+        Bet.objects.filter(user_id=user_id, one_day_race__season=season).count()
+        + Bet.objects.filter(user_id=user_id, stage__tour__season=season).count()
     )
 
     if total_units > 0 and user_units >= total_units:
-        return award_badge(user, "SEASON_FULL", {"season": season.year})
+        return bool(award_badges_bulk("SEASON_FULL", [(user_id, {"season": season.year})], update_context=True))
     return False
 
 
@@ -196,67 +401,127 @@ def _season_participation_sets(user, year: int) -> Tuple[Set[int], Set[int]]:
     return one_day_ids, stage_ids
 
 
-@transaction.atomic
-def evaluate_user_badges_for_season(user, year: int):
+def _bet_counts(bet: Bet) -> bool:
+    """Même règle que _picks_ok_q, sur le prono en mémoire."""
+    return bet.submitted_at is not None and all(
+        getattr(bet, f"pick{i}_id") is not None for i in range(1, 6)
+    )
+
+
+def evaluate_user_badges_for_season(user, year: int, bet: Bet | None = None) -> Set[str]:
     """
-    À appeler après bet.save().
+    À appeler après bet.save() (bet = le prono qui vient d'être validé).
 
     - FIRST_UNIT_PLAYED_{year} : au moins 1 course/étape jouée sur l'année (Option 1)
     - SEASON_FINISHER_{year}   : toutes les one-day + pour chaque tour au moins 1 étape jouée
     - MONUMENT_FINISHER_{year} : participation aux 5 monuments (one-day)
     - GRANDTOUR_FINISHER_{year}: participation à au moins 1 étape de chacun des 3 grands tours
+
+    Le calendrier vient du cache (badges/season_catalog.py) et la participation de
+    SeasonParticipation, mise à jour avec le prono (écriture seulement si le prono ajoute
+    une course ou un tour). Les badges mérités sont comparés aux UserBadge du joueur, pas
+    à la participation déjà stockée : un badge de l'année pas encore créé (seed_badges)
+    au moment d'un prono est attribué au prono suivant. Sans ligne SeasonParticipation
+    (premier prono depuis la mise en place), la participation est reconstruite depuis
+    les Bet. Deux lectures quand il n'y a rien à faire.
+    Retourne les codes nouvellement attribués.
     """
-    participated_one_days, participated_stages = _season_participation_sets(user, year)
-
-    # Option 1 : au moins une unité jouée
-    if participated_one_days or participated_stages:
-        award_badge(user, f"FIRST_UNIT_PLAYED_{year}", {"year": year})
-
-    # Saison complète : toutes les one-day + au moins 1 étape par tour
-    one_days_all = set(OneDayRace.objects.filter(season__year=year).values_list("id", flat=True))
-    one_day_ok = bool(one_days_all) and one_days_all.issubset(participated_one_days)
-
-    tours = list(Tour.objects.filter(season__year=year).values_list("id", flat=True))
-    tours_ok = True
-    if tours:
-        stages_by_tour: Dict[int, Set[int]] = {}
-        for tour_id, stage_id in Stage.objects.filter(tour_id__in=tours).values_list("tour_id", "id"):
-            stages_by_tour.setdefault(tour_id, set()).add(stage_id)
-
-        for tour_id in tours:
-            stage_ids = stages_by_tour.get(tour_id, set())
-            if not stage_ids:
-                tours_ok = False
-                break
-            if stage_ids.isdisjoint(participated_stages):
-                tours_ok = False
-                break
+    user_id = getattr(user, "id", user)
+    catalog = season_catalog(year)
+
+    row = SeasonParticipation.objects.filter(user_id=user_id, year=year).values_list("one_day_ids", "tour_ids").first()
+    if row is None:
+        played_one_days, played_stages = _season_participation_sets(user_id, year)
+        one_day_ids = played_one_days
+        tour_ids = {catalog.stage_tours[stage_id] for stage_id in played_stages if stage_id in catalog.stage_tours}
     else:
-        tours_ok = False
+        one_day_ids, tour_ids = set(row[0]), set(row[1])
+
+    if bet is not None and _bet_counts(bet):
+        if bet.one_day_race_id in catalog.one_day_ids:
+            one_day_ids.add(bet.one_day_race_id)
+        elif bet.stage_id in catalog.stage_tours:
+            tour_ids.add(catalog.stage_tours[bet.stage_id])
+
+    changed = row is None or (one_day_ids, tour_ids) != (set(row[0]), set(row[1]))
+    earned = catalog.earned_badges(one_day_ids, tour_ids)
+    owned = set(
+        UserBadge.objects.filter(user_id=user_id, badge__code__in=earned).values_list("badge__code", flat=True)
+    ) if earned else set()
+    if not changed and earned <= owned:
+        return set()
+
+    awarded: Set[str] = set()
+    with transaction.atomic():
+        if changed:
+            SeasonParticipation.objects.bulk_create(
+                [SeasonParticipation(user_id=user_id, year=year, one_day_ids=sorted(one_day_ids), tour_ids=sorted(tour_ids))],
+                update_conflicts=True,
+                unique_fields=["user", "year"],
+                update_fields=["one_day_ids", "tour_ids", "updated_at"],
+            )
+        for code in sorted(earned - owned):
+            if award_badges_bulk(code, [(user_id, {"year": year})]):
+                awarded.add(code)
+    return awarded
 
-    if one_day_ok and tours_ok:
-        award_badge(user, f"SEASON_FINISHER_{year}", {"year": year})
 
-    # Monuments
-    monuments_ids = set(
-        OneDayRace.objects.filter(season__year=year, name__in=MONUMENTS).values_list("id", flat=True)
-    )
-    if len(monuments_ids) == 5 and monuments_ids.issubset(participated_one_days):
-        award_badge(user, f"MONUMENT_FINISHER_{year}", {"year": year})
-
-    # Grands Tours
-    gt_ids = list(Tour.objects.filter(season__year=year, name__in=GRAND_TOURS).values_list("id", flat=True))
-    gt_ok = (len(gt_ids) == 3)
-    if gt_ok:
-        stages_by_gt: Dict[int, Set[int]] = {}
-        for tour_id, stage_id in Stage.objects.filter(tour_id__in=gt_ids).values_list("tour_id", "id"):
-            stages_by_gt.setdefault(tour_id, set()).add(stage_id)
-
-        for tour_id in gt_ids:
-            stage_ids = stages_by_gt.get(tour_id, set())
-            if not stage_ids or stage_ids.isdisjoint(participated_stages):
-                gt_ok = False
-                break
-
-    if gt_ok:
-        award_badge(user, f"GRANDTOUR_FINISHER_{year}", {"year": year})
\ No newline at end of file
+# -------------------------
+# Badges des pronos validés (hors requête)
+# -------------------------
+
+BET_BADGE_BATCH_SIZE = 500
+
+# JobState (scheduler) qui porte le curseur (Bet.updated_at, id)
+BET_BADGES_WATERMARK = "bet_badges"
+
+
+def award_bet_badges_since_watermark(batch_size: int = BET_BADGE_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Badges déclenchés par un prono (FIRST_BET, badges saison), pour les pronos validés
+    depuis le dernier passage : la vue de prono n'en calcule plus aucun (bets/submission.py).
+    Curseur (Bet.updated_at, id) dans JobState, avancé après chaque lot.
+
+    updated_at est posé par l'application avant le commit de l'upsert : un prono horodaté
+    juste avant le curseur peut être validé juste après. On ne lit donc que les pronos plus
+    vieux que BET_BADGES_WATERMARK_LAG_SECONDS (bien plus long qu'une requête de prono) :
+    le curseur ne dépasse jamais une transaction encore en cours.
+    Retourne (pronos traités, badges créés).
+    """
+    from scheduler.models import JobState
+
+    until = timezone.now() - timedelta(seconds=settings.BET_BADGES_WATERMARK_LAG_SECONDS)
+
+    state, _ = JobState.objects.get_or_create(name=BET_BADGES_WATERMARK)
+    cursor = state.cursor or {}
+    since = parse_datetime(cursor["updated_at"]) if cursor.get("updated_at") else None
+    last_id = cursor.get("id", 0)
+
+    processed = created = 0
+    while True:
+        bets = Bet.objects.filter(submitted_at__isnull=False, updated_at__lt=until)
+        if since is not None:
+            bets = bets.filter(Q(updated_at__gt=since) | Q(updated_at=since, id__gt=last_id))
+        batch = list(
+            bets.select_related("one_day_race", "stage")
+            .only(
+                "id", "user_id", "updated_at", "submitted_at", "one_day_race_id", "stage_id",
+                "pick1_id", "pick2_id", "pick3_id", "pick4_id", "pick5_id",
+                "one_day_race__start_datetime", "stage__start_datetime",
+            )
+            .order_by("updated_at", "id")[:batch_size]
+        )
+        if not batch:
+            return processed, created
+
+        with transaction.atomic():
+            created += len(award_badges_bulk("FIRST_BET", [(bet.user_id, {"type": "global"}) for bet in batch]))
+            for bet in batch:
+                created += len(evaluate_user_badges_for_season(bet.user_id, year=bet.unit_start().year, bet=bet))
+            # même passage : nb de pronos validés du snapshot /stats/
+            refresh_played(bet.user_id for bet in batch)
+
+            processed += len(batch)
+            last_id, since = batch[-1].id, batch[-1].updated_at
+            state.cursor = {"updated_at": since.isoformat(), "id": last_id}
+            state.save(update_fields=["cursor"])
@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from races.models import OneDayRace, Season, Stage, Tour
+from .models import Badge
+from .season_catalog import invalidate_season_catalog
+from .services import clear_badge_cache
+
+# Catalogue code -> id mis en cache par badges/services.py (badge_id)
+
+@receiver(post_save, sender=Badge)
+@receiver(post_delete, sender=Badge)
+def clear_badge_cache_on_change(sender, instance: Badge, **kwargs):
+    clear_badge_cache()
+
+
+# Calendrier des badges saison (badges/season_catalog.py) : courses, tours, étapes
+
+@receiver(post_save, sender=OneDayRace)
+@receiver(post_delete, sender=OneDayRace)
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+def invalidate_catalog_on_race_change(sender, instance, **kwargs):
+    for year in Season.objects.filter(id=instance.season_id).values_list("year", flat=True):
+        invalidate_season_catalog(year)
+
+
+@receiver(post_save, sender=Stage)
+@receiver(post_delete, sender=Stage)
+def invalidate_catalog_on_stage_change(sender, instance: Stage, **kwargs):
+    for year in Season.objects.filter(tours__id=instance.tour_id).values_list("year", flat=True):
+        invalidate_season_catalog(year)
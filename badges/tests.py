@@ -1,3 +1,73 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from bets.models import Bet, BetScore, UnitFacts
+from races.models import OneDayRace, Season
+
+from .models import Badge, UserBadge
+from .services import award_badges_bulk, award_unit_badges_since_watermark, clear_badge_cache
+
+
+class UnitBadgeWatermarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        season = Season.objects.create(year=now.year)
+        cls.race = OneDayRace.objects.create(season=season, name="Test", start_datetime=now - timedelta(days=1))
+        cls.user = get_user_model().objects.create_user(username="joueur", email="joueur@example.com", password="pw")
+        bet = Bet.objects.create(user=cls.user, one_day_race=cls.race, submitted_at=now - timedelta(days=2))
+        BetScore.objects.create(bet=bet, one_day_race=cls.race, score=10, rank=1)
+        for code in ("WINNER_UNIT", "PODIUM_UNIT", "TOP5_UNIT"):
+            Badge.objects.create(code=code, name=code)
+
+    def setUp(self):
+        clear_badge_cache()
+
+    @override_settings(UNIT_BADGES_WATERMARK_LAG_SECONDS=300)
+    def test_badge_watermark_lags_behind_recent_facts(self):
+        # faits horodatés au début d'un recalcul peut-être encore ouvert : pas encore lus
+        facts = UnitFacts.objects.create(one_day_race=self.race, finished=True)
+        self.assertEqual(award_unit_badges_since_watermark(), (0, 0))
+
+        UnitFacts.objects.filter(id=facts.id).update(updated_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(award_unit_badges_since_watermark(), (1, 3))
+        self.assertEqual(
+            set(UserBadge.objects.filter(user=self.user).values_list("badge__code", flat=True)),
+            {"WINNER_UNIT", "PODIUM_UNIT", "TOP5_UNIT"},
+        )
+
+
+class AwardBadgesBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.first, cls.second = [User.objects.create(username=f"j{i}", email=f"j{i}@example.com") for i in range(2)]
+        Badge.objects.create(code="WIN_TOUR", name="Vainqueur d'un tour")
+
+    def setUp(self):
+        clear_badge_cache()
+
+    def _context(self, user):
+        return UserBadge.objects.get(user=user, badge__code="WIN_TOUR").context
+
+    def test_existing_badge_keeps_its_context_by_default(self):
+        self.assertEqual(award_badges_bulk("WIN_TOUR", [(self.first.id, {"id": 1})]), {self.first.id})
+        self.assertEqual(award_badges_bulk("WIN_TOUR", [(self.first.id, {"id": 2})]), set())
+        self.assertEqual(self._context(self.first), {"id": 1})
+
+    def test_update_context_rewrites_changed_context_only(self):
+        award_badges_bulk("WIN_TOUR", [(self.first.id, {"id": 1})])
+        awarded_at = UserBadge.objects.get(user=self.first).awarded_at
+
+        created = award_badges_bulk(
+            "WIN_TOUR", [(self.first.id, {"id": 2}), (self.second.id, {"id": 2})], update_context=True,
+        )
+
+        # seul le nouveau détenteur est "créé" (notification) ; l'ancien garde sa date
+        self.assertEqual(created, {self.second.id})
+        self.assertEqual(self._context(self.first), {"id": 2})
+        self.assertEqual(UserBadge.objects.get(user=self.first).awarded_at, awarded_at)
+        self.assertEqual(award_badges_bulk("WIN_TOUR", [(self.first.id, {"id": 2})], update_context=True), set())
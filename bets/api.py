@@ -0,0 +1,221 @@
+# bets/api.py
+"""
+API JSON de prono pour la PWA : POST /api/bets/<one-day|stage>/<id>/
+
+Corps : {"picks": [rider_id x 5]} (ou {"pick1": ..., "pick5": ...}), en-tête
+optionnel `Idempotency-Key` (ou champ "idempotency_key") : un envoi rejoué par la PWA
+(réseau coupé, retry) renvoie l'état enregistré sans rien réécrire, même après le départ.
+Champ optionnel "captured_at" (ISO 8601) : heure de saisie d'un prono mis en file hors
+ligne (static/pwa/sw.js, Background Sync), comparée au départ avec une tolérance
+(submission.unit_locked, BET_CAPTURE_TOLERANCE_SECONDS), et au prono enregistré : un
+rejeu plus ancien que lui est ignoré (200, état enregistré).
+
+Mêmes règles que le formulaire HTML (verrou au départ, BetForm.clean, engagés de la
+startlist en cache) et même enregistrement (bets/submission.py, un upsert) :
+4 requêtes au plus (unité, version de la startlist, prono actuel, upsert), pas de
+template, pas de message en session.
+
+Réponses : 201 (créé) / 200 (modifié ou rejoué) avec l'état du prono,
+400 (JSON, picks ou captured_at invalides), 401 (non connecté : JSON, pas de redirection
+vers /login/, la PWA garde le prono en file), 409 (verrouillé).
+
+Préchargement hors ligne par le service worker :
+- GET /api/startlists/upcoming/ : unités qui partent dans les BET_PRECACHE_HOURS heures
+- GET /api/startlists/<one-day|stage>/<id>/ : engagés de l'unité, avec ETag (version de
+  la startlist + heure de départ) ; If-None-Match à jour -> 304 après deux requêtes
+  (unité, version), sans lire ni sérialiser la liste.
+"""
+from __future__ import annotations
+
+import json
+from datetime import timedelta, timezone as dt_timezone
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET, require_POST
+
+from races.models import OneDayRace, Stage
+from .forms import PICK_FIELDS, BetForm
+from .models import Bet
+from .startlist import startlist_version, unit_startlist
+from .submission import PICK_IDS, submit_bet, unit_locked
+
+KIND_ONE_DAY = "one-day"
+KIND_STAGE = "stage"
+
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+
+
+def api_login_required(view):
+    """login_required pour l'API : 401 JSON au lieu d'une redirection vers la page de connexion."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"ok": False, "error": "authentication required"}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _unit_or_404(kind: str, unit_id: int, with_facts: bool = True):
+    """(one_day_race, stage), unité lue avec ses faits (une requête)."""
+    if kind == KIND_ONE_DAY:
+        qs = OneDayRace.objects.select_related("facts") if with_facts else OneDayRace.objects.only("id", "start_datetime")
+        return get_object_or_404(qs, id=unit_id), None
+    if kind == KIND_STAGE:
+        qs = Stage.objects.select_related("facts") if with_facts else Stage.objects.only("id", "start_datetime")
+        return None, get_object_or_404(qs, id=unit_id)
+    raise Http404("Type d'unité inconnu")
+
+
+def _unit_urls(kind: str, unit_id: int) -> dict:
+    form_name = "bet_one_day" if kind == KIND_ONE_DAY else "bet_stage"
+    return {
+        "startlist_url": reverse("api_startlist", args=[kind, unit_id]),
+        "bet_url": reverse("api_bet", args=[kind, unit_id]),
+        "form_url": reverse(form_name, args=[unit_id]),
+    }
+
+
+def _bet_state(kind: str, unit, picks, submitted_at, replayed: bool = False) -> dict:
+    return {
+        "ok": True,
+        "replayed": replayed,
+        "bet": {
+            "kind": kind,
+            "unit_id": unit.id,
+            "picks": list(picks),
+            "submitted_at": submitted_at.isoformat() if submitted_at else None,
+            "locks_at": unit.start_datetime.isoformat(),
+        },
+    }
+
+
+def _form_data(payload: dict) -> dict:
+    picks = payload.get("picks")
+    if isinstance(picks, list):
+        return {name: value for name, value in zip(PICK_FIELDS, picks)}
+    return {name: payload.get(name) for name in PICK_FIELDS}
+
+
+def _captured_at(payload: dict):
+    """Heure de saisie côté client (aware), None si absente ; ValueError si illisible."""
+    value = payload.get("captured_at")
+    if not value:
+        return None
+    captured_at = parse_datetime(str(value))
+    if captured_at is None:
+        raise ValueError(value)
+    if timezone.is_naive(captured_at):
+        captured_at = timezone.make_aware(captured_at, dt_timezone.utc)
+    return captured_at
+
+
+@require_POST
+@api_login_required
+def bet_api(request, kind, unit_id):
+    one_day_race, stage = _unit_or_404(kind, unit_id)
+    unit = one_day_race or stage
+
+    try:
+        payload = json.loads(request.body.decode("utf-8") or "{}")
+    except (UnicodeDecodeError, ValueError):
+        return JsonResponse({"ok": False, "error": "invalid json"}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"ok": False, "error": "invalid json"}, status=400)
+
+    key = str(request.headers.get("Idempotency-Key") or payload.get("idempotency_key") or "")
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        return JsonResponse({"ok": False, "error": "idempotency key too long"}, status=400)
+    try:
+        captured_at = _captured_at(payload)
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "invalid captured_at"}, status=400)
+
+    current = (
+        Bet.objects.filter(user=request.user, one_day_race=one_day_race, stage=stage)
+        .values_list("idempotency_key", "submitted_at", *PICK_IDS)
+        .first()
+    )
+    if key and current and current[0] == key:
+        return JsonResponse(_bet_state(kind, unit, current[2:], current[1], replayed=True))
+
+    if captured_at is not None and current and current[1] and current[1] >= min(captured_at, timezone.now()):
+        # prono en file saisi avant celui enregistré (envoyé entre-temps, ou POST lent qui a
+        # fini par aboutir) : le rejeu n'écrase pas un prono plus récent
+        return JsonResponse(_bet_state(kind, unit, current[2:], current[1], replayed=True))
+
+    if unit_locked(unit, captured_at=captured_at):
+        return JsonResponse({"ok": False, "error": "locked"}, status=409)
+
+    form = BetForm(_form_data(payload), one_day_race=one_day_race, stage=stage)
+    if not form.is_valid():
+        return JsonResponse({"ok": False, "errors": form.errors.get_json_data()}, status=400)
+
+    bet = submit_bet(request.user, form.picks, one_day_race=one_day_race, stage=stage, idempotency_key=key)
+    return JsonResponse(
+        _bet_state(kind, unit, form.picks, bet.submitted_at),
+        status=200 if current else 201,
+    )
+
+
+@require_GET
+@api_login_required
+def startlist_api(request, kind, unit_id):
+    one_day_race, stage = _unit_or_404(kind, unit_id, with_facts=False)
+    unit = one_day_race or stage
+    version = startlist_version(one_day_race, stage)
+    etag = f'"{kind}-{unit.id}-{version}-{int(unit.start_datetime.timestamp())}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        entries = unit_startlist(one_day_race, stage, version=version)
+        response = JsonResponse({
+            "kind": kind,
+            "unit_id": unit.id,
+            "version": version,
+            "locks_at": unit.start_datetime.isoformat(),
+            "entries": [
+                {
+                    "rider_id": e.rider_id,
+                    "name": e.name,
+                    "country": e.country,
+                    "team": e.team,
+                    "odds": str(e.odds),
+                    "flag_url": e.flag_url,
+                }
+                for e in entries
+            ],
+            **_unit_urls(kind, unit.id),
+        })
+    response["ETag"] = etag
+    # connecté uniquement : pas de cache partagé, mais revalidation (If-None-Match) à chaque lecture
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@require_GET
+@api_login_required
+def upcoming_startlists_api(request):
+    """Unités à précharger par le service worker : départ dans les BET_PRECACHE_HOURS heures."""
+    now = timezone.now()
+    window = {"start_datetime__gt": now, "start_datetime__lte": now + timedelta(hours=settings.BET_PRECACHE_HOURS)}
+    units = [
+        (KIND_ONE_DAY, unit_id, start)
+        for unit_id, start in OneDayRace.objects.filter(**window).values_list("id", "start_datetime")
+    ] + [
+        (KIND_STAGE, unit_id, start)
+        for unit_id, start in Stage.objects.filter(**window).values_list("id", "start_datetime")
+    ]
+    units.sort(key=lambda u: u[2])
+    return JsonResponse({
+        "units": [
+            {"kind": kind, "unit_id": unit_id, "locks_at": start.isoformat(), **_unit_urls(kind, unit_id)}
+            for kind, unit_id, start in units
+        ],
+    })
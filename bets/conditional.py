@@ -0,0 +1,115 @@
+# bets/conditional.py
+"""
+GET conditionnels (ETag / Last-Modified) des pages course / étape et des classements.
+
+Les validateurs viennent des versions (bets/versions.py), déjà incrémentées à chaque
+écriture qui change la page : engagés (startlist), résultats et fiche de l'unité
+(unit_page_version_key), scores et classements, profils affichés. Un client à jour
+reçoit un 304 après la seule lecture des versions (une requête, l'objet de la page et
+les éventuels horodatages propres au visiteur compris), sans lire ni rendre la page.
+
+L'ETag porte aussi le visiteur (sa ligne, son prono, la nav) et la langue ;
+PAGE_ETAG_SALT (id de déploiement) invalide tout au changement de templates.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Sequence
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Subquery
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.translation import get_language
+
+from .models import ScopeVersion
+
+
+class PageState(NamedTuple):
+    versions: tuple
+    last_modified: Optional[datetime]
+    values: Dict  # champs / annotations demandés sur l'objet de la page
+
+
+def _latest(dates: Iterable[Optional[datetime]]) -> Optional[datetime]:
+    return max((d for d in dates if d is not None), default=None)
+
+
+def page_state(queryset, keys: Sequence[str], fields: Sequence[str] = (), **annotations) -> Optional[PageState]:
+    """
+    L'objet de la page (queryset filtré sur son id) et, dans la même requête, la version et
+    la date de modification de chaque clé (sous-requêtes sur l'index unique de ScopeVersion).
+    `annotations` : horodatages propres au visiteur (ex. son prono), qui comptent pour
+    Last-Modified. None si l'objet n'existe pas.
+    """
+    subqueries = {}
+    for i, key in enumerate(keys):
+        row = ScopeVersion.objects.filter(key=key)
+        subqueries[f"version_{i}"] = Subquery(row.values("version")[:1])
+        subqueries[f"modified_{i}"] = Subquery(row.values("updated_at")[:1])
+
+    values = queryset.annotate(**subqueries, **annotations).values(*fields, *subqueries, *annotations).first()
+    if values is None:
+        return None
+    return PageState(
+        versions=tuple(values[f"version_{i}"] or 0 for i in range(len(keys))),
+        last_modified=_latest([values[f"modified_{i}"] for i in range(len(keys))] + [values[n] for n in annotations]),
+        values=values,
+    )
+
+
+def scope_state(keys: Sequence[str]) -> PageState:
+    """Versions et dernière modification des clés seules (objet déjà lu). Une requête."""
+    keys = list(keys)
+    found = {
+        key: (version, updated_at)
+        for key, version, updated_at in ScopeVersion.objects.filter(key__in=keys).values_list("key", "version", "updated_at")
+    }
+    return PageState(
+        versions=tuple(found.get(k, (0, None))[0] for k in keys),
+        last_modified=_latest(found.get(k, (0, None))[1] for k in keys),
+        values={},
+    )
+
+
+def _etag(request, state: PageState, extra: Iterable) -> str:
+    parts = [settings.PAGE_ETAG_SALT, request.get_full_path(), request.user.id, get_language(), *state.versions, *extra]
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    # faible : deux rendus d'une même version diffèrent (jeton CSRF masqué)
+    return f'W/"{digest}"'
+
+
+def conditional_page(
+    request,
+    state: PageState,
+    build: Callable[[], HttpResponse],
+    extra: Iterable = (),
+    last_modified: Optional[datetime] = None,
+) -> HttpResponse:
+    """
+    304 si le client a déjà cette version de la page, sinon build() avec ETag / Last-Modified.
+    `extra` : ce qui change la page sans version (ex. unité verrouillée au départ) ;
+    `last_modified` : date correspondante, si plus récente que les versions.
+    """
+    etag = _etag(request, state, extra)
+    modified = _latest([state.last_modified, last_modified])
+    timestamp = int(modified.timestamp()) if modified else None
+
+    # message flash en attente : la page doit être rendue pour l'afficher
+    response = None
+    if not len(messages.get_messages(request)):
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+
+    response["ETag"] = etag
+    if timestamp is not None:
+        response["Last-Modified"] = http_date(timestamp)
+    # connecté uniquement : pas de cache partagé, revalidation à chaque affichage
+    response["Cache-Control"] = "private, no-cache"
+    return response
@@ -0,0 +1,58 @@
+# bets/facts.py
+"""
+Faits par unité (bets.UnitFacts) : vainqueur, top3, favori, nb d'engagés, terminée.
+
+Calculés une fois par unité quand ses résultats ou ses engagés changent
+(recompute_unit, via DirtyUnit), au lieu d'être recalculés par chaque joueur
+à chaque page (stats, dashboard, badges, scoring).
+"""
+from __future__ import annotations
+
+from races.models import Result
+from .models import UnitFacts
+from .startlist import unit_startlist
+from .versions import FACTS_KEY, bump_versions
+
+RESULTS_FINISHED = 3  # "terminée" = top3 complet
+
+
+def refresh_unit_facts(one_day_race=None, stage=None) -> UnitFacts:
+    """Recalcule et enregistre les faits d'une unité (5 requêtes, engagés lus dans la startlist en cache)."""
+    finishers = list(
+        Result.objects.filter(one_day_race=one_day_race, stage=stage)
+        .order_by("position")
+        .values_list("rider_id", flat=True)
+    )
+    entrants = [e.rider_id for e in unit_startlist(one_day_race, stage)]
+    top3 = (finishers + [None, None, None])[:3]
+
+    facts = UnitFacts(
+        one_day_race=one_day_race,
+        stage=stage,
+        winner_id=top3[0],
+        second_id=top3[1],
+        third_id=top3[2],
+        favourite_id=entrants[0] if entrants else None,
+        entry_count=len(entrants),
+        result_count=len(finishers),
+        finished=len(finishers) >= RESULTS_FINISHED,
+    )
+    UnitFacts.objects.bulk_create(
+        [facts],
+        update_conflicts=True,
+        unique_fields=["one_day_race" if one_day_race is not None else "stage"],
+        update_fields=[
+            "winner", "second", "third", "favourite",
+            "entry_count", "result_count", "finished", "updated_at",
+        ],
+    )
+    bump_versions([FACTS_KEY])
+    return facts
+
+
+def get_unit_facts(one_day_race=None, stage=None) -> UnitFacts:
+    """Faits en base, calculés à la volée si l'unité n'en a pas encore."""
+    facts = UnitFacts.objects.filter(one_day_race=one_day_race, stage=stage).first()
+    if facts is None:
+        facts = refresh_unit_facts(one_day_race=one_day_race, stage=stage)
+    return facts
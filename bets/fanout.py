@@ -0,0 +1,105 @@
+# bets/fanout.py
+"""
+Notification "résultat publié", une fois par unité terminée.
+
+Appelée par recompute_unit quand l'unité devient terminée (UnitFacts.finished) :
+- UnitFacts.results_notified_at sert de verrou : un seul passage par unité, même si les
+  résultats sont corrigés ensuite ou si deux workers recalculent la même unité
+- les destinataires (joueurs ayant un prono sur l'unité, joignables par email avec
+  email_results actif, OU par push) sortent d'UNE requête sur les BetScore de l'unité,
+  avec score et rang déjà calculés (bets/scoring.py, bets/standings.py) et les deux
+  indicateurs "email voulu" / "a un abonnement push" : l'email ne conditionne pas le push
+- les messages (email + push) sont mis en file en lots (accounts/outbox.py), dans
+  la transaction du recalcul : rien par joueur, quel que soit le nombre de destinataires
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import NotificationPreference
+from accounts.notifications import result_message
+from accounts.outbox import ENQUEUE_BATCH_SIZE, email_message, enqueue_many, push_message
+from pushes.models import PushSubscription
+from .models import BetScore, UnitFacts
+
+
+def unit_label(one_day_race=None, stage=None) -> str:
+    if one_day_race is not None:
+        return getattr(one_day_race, "name", str(one_day_race))
+    return f"{getattr(stage.tour, 'name', 'Tour')} — Étape {stage.number}".strip()
+
+
+def _claim(one_day_race=None, stage=None) -> bool:
+    """Pose results_notified_at si l'unité est terminée et pas encore notifiée (UPDATE conditionnel)."""
+    return UnitFacts.objects.filter(
+        one_day_race=one_day_race, stage=stage, finished=True, results_notified_at__isnull=True,
+    ).update(results_notified_at=timezone.now()) > 0
+
+
+def result_recipients(one_day_race=None, stage=None):
+    """(user_id, username, email, score, rank, wants_email, has_push) des joueurs à prévenir — une requête."""
+    user = OuterRef("bet__user_id")
+    return (
+        BetScore.objects.filter(one_day_race=one_day_race, stage=stage)
+        .filter(bet__user__is_active=True)
+        .annotate(
+            wants_email=ExpressionWrapper(
+                Q(bet__user__email__isnull=False)
+                & ~Q(bet__user__email="")
+                & ~Exists(NotificationPreference.objects.filter(user_id=user, email_results=False)),
+                output_field=BooleanField(),
+            ),
+            has_push=Exists(PushSubscription.objects.filter(user_id=user)),
+        )
+        .filter(Q(wants_email=True) | Q(has_push=True))
+        .order_by("rank")
+        .values_list(
+            "bet__user_id", "bet__user__username", "bet__user__email", "score", "rank", "wants_email", "has_push",
+        )
+    )
+
+
+def notify_unit_results(one_day_race=None, stage=None) -> int:
+    """Met en file les notifications de résultat de l'unité (une seule fois). Retourne le nb de messages."""
+    if not _claim(one_day_race, stage):
+        return 0
+
+    if one_day_race is not None:
+        kind, unit_id, path = "one_day", one_day_race.id, reverse("one_day_detail", args=[one_day_race.id])
+    else:
+        kind, unit_id, path = "stage", stage.id, reverse("stage_detail", args=[stage.id])
+    label = unit_label(one_day_race, stage)
+    url = f"{settings.SITE_URL}{path}" if getattr(settings, "SITE_URL", "") else None
+    total = BetScore.objects.filter(one_day_race=one_day_race, stage=stage).count()
+
+    User = get_user_model()
+    queued = 0
+    batch = []
+    recipients = result_recipients(one_day_race, stage).iterator(chunk_size=ENQUEUE_BATCH_SIZE)
+    for user_id, username, email, score, rank, wants_email, has_push in recipients:
+        if wants_email:
+            user = User(id=user_id, username=username, email=email)  # non sauvegardé : juste pour le gabarit
+            m = result_message(user, label, url, score=score, rank=rank, total=total)
+            batch.append(email_message(
+                email, m.subject, m.body, user=user_id, dedup_key=f"result:{kind}:{unit_id}:{user_id}:email",
+            ))
+        if has_push:
+            batch.append(push_message(user_id, {
+                "title": f"Résultat — {label}",
+                "body": f"Ton score : {score} pts — {rank}/{total}",
+                "url": path,
+            }, dedup_key=f"result:{kind}:{unit_id}:{user_id}:push"))
+
+        if len(batch) >= ENQUEUE_BATCH_SIZE:
+            enqueue_many(batch)
+            queued += len(batch)
+            batch = []
+
+    if batch:
+        enqueue_many(batch)
+        queued += len(batch)
+    return queued
@@ -1,30 +1,47 @@
 from django import forms
-from races.models import Entry
-from .models import Bet
 
-class BetForm(forms.ModelForm):
-    class Meta:
-        model = Bet
-        fields = ["pick1", "pick2", "pick3", "pick4", "pick5"]
+from .startlist import startlist_choices
 
-    def __init__(self, *args, one_day_race=None, stage=None, **kwargs):
+PICK_FIELDS = ["pick1", "pick2", "pick3", "pick4", "pick5"]
+
+
+class BetForm(forms.Form):
+    """
+    Top 5 d'une unité. Les choix viennent de la liste des engagés en cache
+    (bets/startlist.py) : ni l'affichage ni la validation ne lisent Rider / Entry.
+    Le prono est enregistré par bets/submission.py (submit_bet) à partir de `picks`.
+    """
+    pick1 = forms.TypedChoiceField(coerce=int, empty_value=None, required=False)
+    pick2 = forms.TypedChoiceField(coerce=int, empty_value=None, required=False)
+    pick3 = forms.TypedChoiceField(coerce=int, empty_value=None, required=False)
+    pick4 = forms.TypedChoiceField(coerce=int, empty_value=None, required=False)
+    pick5 = forms.TypedChoiceField(coerce=int, empty_value=None, required=False)
+
+    def __init__(self, *args, instance=None, one_day_race=None, stage=None, **kwargs):
+        if instance is not None and "initial" not in kwargs:
+            kwargs["initial"] = {name: getattr(instance, f"{name}_id") for name in PICK_FIELDS}
         super().__init__(*args, **kwargs)
 
-        # Remplit les choix avec uniquement les engagés + ordre par cote (favoris en haut)
-        entries = Entry.objects.filter(one_day_race=one_day_race, stage=stage).select_related("rider").order_by("-odds", "rider__last_name")
-        riders = [e.rider for e in entries]
+        # Uniquement les engagés, ordre par cote (favoris en haut)
+        choices = [("", "---------")] + startlist_choices(one_day_race, stage)
         for f in self.fields.values():
-            f.queryset = type(riders[0]).objects.filter(id__in=[r.id for r in riders]) if riders else f.queryset.none()
+            f.choices = choices
 
+        self.instance = instance
         self._one_day_race = one_day_race
         self._stage = stage
 
     def clean(self):
         cleaned = super().clean()
-        picks = [cleaned.get("pick1"), cleaned.get("pick2"), cleaned.get("pick3"), cleaned.get("pick4"), cleaned.get("pick5")]
+        picks = [cleaned.get(name) for name in PICK_FIELDS]
         picks = [p for p in picks if p is not None]
         if len(picks) != 5:
             raise forms.ValidationError("Merci de sélectionner 5 coureurs.")
-        if len(set([p.id for p in picks])) != 5:
+        if len(set(picks)) != 5:
             raise forms.ValidationError("Un coureur ne peut être sélectionné qu'une seule fois.")
-        return cleaned
\ No newline at end of file
+        return cleaned
+
+    @property
+    def picks(self):
+        """Ids des 5 coureurs choisis, dans l'ordre (formulaire valide)."""
+        return [self.cleaned_data[name] for name in PICK_FIELDS]
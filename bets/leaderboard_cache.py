@@ -0,0 +1,60 @@
+# bets/leaderboard_cache.py
+"""
+Cache des extrémités des classements, une entrée par scope : nombre de joueurs,
+TOP_ROWS premières lignes et BOTTOM_ROWS dernières (user_id, username, total, rang).
+Jamais le classement entier : l'entrée reste petite quel que soit le nombre de joueurs.
+
+La clé porte les versions du scope (bets/versions.py) : tant qu'aucun résultat
+n'est saisi, toutes les requêtes lisent la même entrée ; après un recalcul la version
+change et la première requête reconstruit l'entrée (un COUNT et deux lectures par rang
+indexé). Le rang du visiteur, les lignes autour de lui ou d'une page plus loin
+et les profils des lignes affichées (avatar, drapeau, badge) sont lus à part,
+voir bets/ranking.py : modifier un profil n'invalide aucun classement.
+
+Backend : alias de cache "leaderboards" (locmem, fichier ou base, cf. settings).
+"""
+from __future__ import annotations
+
+from typing import Dict, List
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .versions import get_versions
+
+CACHE_ALIAS = "leaderboards"
+
+# podium + tableau compact + première page du scroll (PAGE_SIZE_MAX)
+TOP_ROWS = 100
+BOTTOM_ROWS = 10
+
+
+def _cache():
+    return caches[CACHE_ALIAS if CACHE_ALIAS in settings.CACHES else "default"]
+
+
+def cache_key(scope) -> str:
+    versions = get_versions(scope.version_keys)
+    return f"lbe:{scope.key}:" + ".".join(str(v) for v in versions)
+
+
+def _build(scope) -> Dict:
+    count = scope.count()
+    top: List[Dict] = scope.rows_between(1, TOP_ROWS) if count else []
+    bottom_first = max(count - BOTTOM_ROWS + 1, len(top) + 1)
+    bottom: List[Dict] = scope.rows_between(bottom_first, count) if bottom_first <= count else []
+    return {"count": count, "top": top, "bottom": bottom}
+
+
+def cached_edges(scope) -> Dict:
+    """
+    {"count": nombre de joueurs, "top": rangs 1..TOP_ROWS, "bottom": derniers rangs après top}
+    Une requête (versions) si l'entrée est en cache.
+    """
+    cache = _cache()
+    key = cache_key(scope)
+    data = cache.get(key)
+    if data is None:
+        data = _build(scope)
+        cache.set(key, data)
+    return data
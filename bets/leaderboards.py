@@ -1,180 +1,163 @@
 # bets/leaderboards.py
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
-from django.http import Http404
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, render
+from django.views.decorators.http import require_GET
 
 from races.models import Season, OneDayRace, Stage, Tour
-from .models import BetScore
 from badges.services import award_badge, user_id_to_user
 
-from .leaderboards_utils import finalize_rows, enrich_rows_with_profile, build_compact_rows
+from .conditional import conditional_page, page_state, scope_state
+from .ranking import leaderboard_page, leaderboard_window, season_scope, tour_scope, unit_scope
+from .standings import CATEGORY_ALL, CATEGORY_RULES
+from .versions import (
+    PROFILES_KEY,
+    season_version_key,
+    tour_page_version_key,
+    tour_version_key,
+    unit_page_version_key,
+    unit_version_key,
+)
 
 
-@login_required
-def global_leaderboard(request, season_year):
-    season = get_object_or_404(Season, year=season_year)
+def _special_category_or_404(category):
+    if category not in CATEGORY_RULES:
+        raise Http404("Catégorie inconnue")
+    return CATEGORY_RULES[category]
 
-    qs_one_day = (
-        BetScore.objects.filter(bet__one_day_race__season=season)
-        .values("bet__user_id", "bet__user__username")
-        .annotate(total=Sum("score"))
-    )
 
-    qs_stage = (
-        BetScore.objects.filter(bet__stage__tour__season=season)
-        .values("bet__user_id", "bet__user__username")
-        .annotate(total=Sum("score"))
+# GET conditionnels (bets/conditional.py) : versions du classement + profils affichés +
+# fiche de l'unité / du tour (titre), lues avec l'objet en une requête ; 404 si absent.
+
+def _state_or_404(queryset, keys):
+    state = page_state(queryset, keys)
+    if state is None:
+        raise Http404
+    return state
+
+
+def _season_state(season):
+    return scope_state([season_version_key(season.id), PROFILES_KEY])
+
+
+def _unit_state(one_day_race_id=None, stage_id=None):
+    queryset = (
+        OneDayRace.objects.filter(id=one_day_race_id) if one_day_race_id
+        else Stage.objects.filter(id=stage_id)
     )
+    return _state_or_404(queryset, [
+        unit_version_key(one_day_race_id, stage_id),
+        PROFILES_KEY,
+        unit_page_version_key(one_day_race_id, stage_id),
+    ])
+
 
-    totals = {}
-    for row in list(qs_one_day) + list(qs_stage):
-        key = (row["bet__user_id"], row["bet__user__username"])
-        totals[key] = totals.get(key, 0) + float(row["total"] or 0)
+def _tour_state(tour_id, category):
+    return _state_or_404(Tour.objects.filter(id=tour_id), [
+        tour_version_key(tour_id, category),
+        PROFILES_KEY,
+        tour_page_version_key(tour_id),
+    ])
 
-    rows_full = [{"user_id": k[0], "username": k[1], "total": v} for k, v in totals.items()]
-    rows_full.sort(key=lambda r: (-r["total"], r["username"]))
 
-    finalize_rows(rows_full, request.user.id)
-    enrich_rows_with_profile(rows_full)
+@login_required
+def global_leaderboard(request, season_year):
+    season = get_object_or_404(Season, year=season_year)
+    return conditional_page(request, _season_state(season), lambda: _global_leaderboard(request, season))
+
 
-    rows = build_compact_rows(rows_full, request_user_id=request.user.id, top_n=3, bottom_n=3, around_user=1)
+def _global_leaderboard(request, season):
+    podium, rows = leaderboard_window(season_scope(season), request.user.id)
 
     # ⚠️ Anti-spam : ne pas award ici sur chaque refresh (à déplacer dans une tâche/cron ou quand la saison se termine)
     return render(request, "bets/leaderboard_global.html", {
         "season": season,
-        "rows_full": rows_full,   # podium top3
-        "rows": rows,             # tableau compact
+        "podium": podium,   # podium top3
+        "rows": rows,       # tableau compact
     })
 
 
 @login_required
 def unit_leaderboard_one_day(request, race_id):
-    race = get_object_or_404(OneDayRace, id=race_id)
-
-    qs = (
-        BetScore.objects
-        .filter(bet__one_day_race=race)
-        .values("bet__user_id", "bet__user__username")
-        .annotate(total=Sum("score"))
-        .order_by("-total", "bet__user__username")
+    return conditional_page(
+        request, _unit_state(one_day_race_id=race_id), lambda: _unit_leaderboard_one_day(request, race_id)
     )
 
-    rows_full = [
-        {"user_id": r["bet__user_id"], "username": r["bet__user__username"], "total": float(r["total"] or 0)}
-        for r in qs
-    ]
 
-    finalize_rows(rows_full, request.user.id)
-    enrich_rows_with_profile(rows_full)
-    rows = build_compact_rows(rows_full, request_user_id=request.user.id, top_n=3, bottom_n=3, around_user=1)
+def _unit_leaderboard_one_day(request, race_id):
+    race = get_object_or_404(OneDayRace, id=race_id)
+
+    podium, rows = leaderboard_window(unit_scope(one_day_race=race), request.user.id)
 
     return render(request, "bets/leaderboard_unit_compact.html", {
         "title": f"Classement — {race.name}",
-        "rows_full": rows_full,
+        "podium": podium,
         "rows": rows,
     })
 
 
 @login_required
 def unit_leaderboard_stage(request, stage_id):
-    stage = get_object_or_404(Stage.objects.select_related("tour"), id=stage_id)
-
-    qs = (
-        BetScore.objects
-        .filter(bet__stage=stage)
-        .values("bet__user_id", "bet__user__username")
-        .annotate(total=Sum("score"))
-        .order_by("-total", "bet__user__username")
+    return conditional_page(
+        request, _unit_state(stage_id=stage_id), lambda: _unit_leaderboard_stage(request, stage_id)
     )
 
-    rows_full = [
-        {"user_id": r["bet__user_id"], "username": r["bet__user__username"], "total": float(r["total"] or 0)}
-        for r in qs
-    ]
 
-    finalize_rows(rows_full, request.user.id)
-    enrich_rows_with_profile(rows_full)
-    rows = build_compact_rows(rows_full, request_user_id=request.user.id, top_n=3, bottom_n=3, around_user=1)
+def _unit_leaderboard_stage(request, stage_id):
+    stage = get_object_or_404(Stage.objects.select_related("tour"), id=stage_id)
+
+    podium, rows = leaderboard_window(unit_scope(stage=stage), request.user.id)
 
     return render(request, "bets/leaderboard_unit_compact.html", {
         "title": f"Classement — {stage}",
-        "rows_full": rows_full,
+        "podium": podium,
         "rows": rows,
     })
 
 
 @login_required
 def tour_leaderboard(request, tour_id):
-    tour = get_object_or_404(Tour, id=tour_id)
-
-    qs = (
-        BetScore.objects
-        .filter(bet__stage__tour=tour)
-        .values("bet__user_id", "bet__user__username")
-        .annotate(total=Sum("score"))
-        .order_by("-total", "bet__user__username")
+    return conditional_page(
+        request, _tour_state(tour_id, CATEGORY_ALL), lambda: _tour_leaderboard(request, tour_id)
     )
 
-    rows_full = [
-        {"user_id": r["bet__user_id"], "username": r["bet__user__username"], "total": float(r["total"] or 0)}
-        for r in qs
-    ]
 
-    finalize_rows(rows_full, request.user.id)
-    enrich_rows_with_profile(rows_full)
-    rows = build_compact_rows(rows_full, request_user_id=request.user.id, top_n=3, bottom_n=3, around_user=1)
+def _tour_leaderboard(request, tour_id):
+    tour = get_object_or_404(Tour, id=tour_id)
+
+    podium, rows = leaderboard_window(tour_scope(tour, CATEGORY_ALL), request.user.id)
 
     return render(request, "bets/leaderboard_tour_compact.html", {
         "tour": tour,
-        "rows_full": rows_full,
+        "podium": podium,
         "rows": rows,
     })
 
 
-CATEGORY_RULES = {
-    "sprinteur": ("Classement sprinteur", [Stage.StageType.FLAT]),
-    "grimpeur": ("Classement grimpeur", [Stage.StageType.MOUNTAIN]),
-    "baroudeur": ("Classement baroudeur", [Stage.StageType.HILLY]),
-    "rouleur": ("Classement rouleur (CLM)", [Stage.StageType.TT]),
-}
-
-
 @login_required
 def tour_special_leaderboard(request, tour_id, category):
-    tour = get_object_or_404(Tour, id=tour_id)
-
-    if category not in CATEGORY_RULES:
-        raise Http404("Catégorie inconnue")
+    _special_category_or_404(category)
+    return conditional_page(
+        request, _tour_state(tour_id, category), lambda: _tour_special_leaderboard(request, tour_id, category)
+    )
 
-    title, stage_types = CATEGORY_RULES[category]
 
-    qs = (
-        BetScore.objects
-        .filter(bet__stage__tour=tour, bet__stage__stage_type__in=stage_types)
-        .values("bet__user_id", "bet__user__username")
-        .annotate(total=Sum("score"))
-        .order_by("-total", "bet__user__username")
-    )
+def _tour_special_leaderboard(request, tour_id, category):
+    tour = get_object_or_404(Tour, id=tour_id)
 
-    rows_full = [
-        {"user_id": r["bet__user_id"], "username": r["bet__user__username"], "total": float(r["total"] or 0)}
-        for r in qs
-    ]
+    title, stage_types = _special_category_or_404(category)
 
-    finalize_rows(rows_full, request.user.id)
-    enrich_rows_with_profile(rows_full)
-    rows = build_compact_rows(rows_full, request_user_id=request.user.id, top_n=3, bottom_n=3, around_user=1)
+    podium, rows = leaderboard_window(tour_scope(tour, category), request.user.id)
 
     # (Optionnel) award winner ici = risque de spam si refresh → à déplacer plus tard
-    # if rows_full:
-    #     award_badge(user_id_to_user(rows_full[0]["user_id"]), "SPECIALIST_...", {"tour": tour.id})
+    # if podium:
+    #     award_badge(user_id_to_user(podium[0]["user_id"]), "SPECIALIST_...", {"tour": tour.id})
 
     return render(request, "bets/leaderboard_tour_special_compact.html", {
         "tour": tour,
         "title": title,
         "category": category,
-        "rows_full": rows_full,
+        "podium": podium,
         "rows": rows,
         "stage_types": stage_types,
     })
@@ -190,4 +173,71 @@ def leaderboards_hub(request):
         "seasons": seasons,
         "one_days": one_days,
         "tours": tours,
-    })
\ No newline at end of file
+    })
+
+
+# -------------------------
+# API JSON (scroll infini) : ?start=<rang>&limit=<n>
+# -------------------------
+
+def page_response(request, scope) -> JsonResponse:
+    try:
+        start = int(request.GET.get("start", 1))
+        limit = int(request.GET.get("limit", 50))
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "invalid start/limit"}, status=400)
+
+    return JsonResponse(leaderboard_page(scope, request.user.id, start=start, limit=limit))
+
+
+def conditional_page_response(request, state, get_scope):
+    """page_response en GET conditionnel : get_scope() (lecture de l'objet) seulement si la page a changé."""
+    return conditional_page(request, state, lambda: page_response(request, get_scope()))
+
+
+@require_GET
+@login_required
+def global_leaderboard_api(request, season_year):
+    season = get_object_or_404(Season, year=season_year)
+    return conditional_page_response(request, _season_state(season), lambda: season_scope(season))
+
+
+@require_GET
+@login_required
+def unit_leaderboard_one_day_api(request, race_id):
+    return conditional_page_response(
+        request,
+        _unit_state(one_day_race_id=race_id),
+        lambda: unit_scope(one_day_race=get_object_or_404(OneDayRace, id=race_id)),
+    )
+
+
+@require_GET
+@login_required
+def unit_leaderboard_stage_api(request, stage_id):
+    return conditional_page_response(
+        request,
+        _unit_state(stage_id=stage_id),
+        lambda: unit_scope(stage=get_object_or_404(Stage, id=stage_id)),
+    )
+
+
+@require_GET
+@login_required
+def tour_leaderboard_api(request, tour_id):
+    return conditional_page_response(
+        request,
+        _tour_state(tour_id, CATEGORY_ALL),
+        lambda: tour_scope(get_object_or_404(Tour, id=tour_id), CATEGORY_ALL),
+    )
+
+
+@require_GET
+@login_required
+def tour_special_leaderboard_api(request, tour_id, category):
+    _special_category_or_404(category)
+    return conditional_page_response(
+        request,
+        _tour_state(tour_id, category),
+        lambda: tour_scope(get_object_or_404(Tour, id=tour_id), category),
+    )
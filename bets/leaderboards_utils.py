@@ -52,13 +52,7 @@ def _badge_icon_url_from_profile(p: Profile | None) -> str:
     return static("badges/_unknown.svg")
 
 
-def finalize_rows(rows_full: List[Dict], request_user_id: int) -> None:
-    for idx, r in enumerate(rows_full, start=1):
-        r["rank"] = idx
-        r["is_me"] = (r["user_id"] == request_user_id)
-
-
-def enrich_rows_with_profile(rows_full: List[Dict]) -> None:
+def enrich_rows_with_profile(rows: List[Dict]) -> None:
     """
     Ajoute à chaque ligne :
       - avatar_url
@@ -66,14 +60,14 @@ def enrich_rows_with_profile(rows_full: List[Dict]) -> None:
       - country (ISO2)
       - flag_url (avec fallback)
     """
-    user_ids = [r["user_id"] for r in rows_full]
+    user_ids = [r["user_id"] for r in rows]
 
     profiles = {
         p.user_id: p
         for p in Profile.objects.filter(user_id__in=user_ids).select_related("featured_badge")
     }
 
-    for r in rows_full:
+    for r in rows:
         p = profiles.get(r["user_id"])
 
         r["avatar_url"] = p.avatar_url if p else ""
@@ -84,34 +78,38 @@ def enrich_rows_with_profile(rows_full: List[Dict]) -> None:
         r["badge_icon_url"] = _badge_icon_url_from_profile(p)
 
 
-def build_compact_rows(
-    rows_full: List[Dict],
+def compact_ranks(
+    n: int,
     *,
-    request_user_id: int,
+    user_rank: int | None,
     top_n: int = 5,
     bottom_n: int = 3,
     around_user: int = 1,
-) -> List[Dict]:
-    n = len(rows_full)
+) -> List[int]:
+    """
+    Rangs (1..n) à afficher : top N, bottom N, ±around_user autour du joueur.
+    Permet de ne lire en base que les lignes affichées.
+    """
     if n <= top_n + bottom_n + (2 * around_user + 1):
-        return rows_full
+        return list(range(1, n + 1))
+
+    keep: Set[int] = set(range(1, min(top_n, n) + 1))
+    keep |= set(range(max(n - bottom_n, 0) + 1, n + 1))
 
-    user_idx = next((i for i, r in enumerate(rows_full) if r["user_id"] == request_user_id), None)
+    if user_rank is not None:
+        keep |= set(range(max(user_rank - around_user, 1), min(user_rank + around_user, n) + 1))
 
-    keep: Set[int] = set(range(0, min(top_n, n)))
-    keep |= set(range(max(n - bottom_n, 0), n))
+    return sorted(keep)
 
-    if user_idx is not None:
-        start = max(user_idx - around_user, 0)
-        end = min(user_idx + around_user, n - 1)
-        keep |= set(range(start, end + 1))
 
+def insert_ellipses(rows: List[Dict]) -> List[Dict]:
+    """rows triées par rang : ajoute {"ellipsis": True} entre deux rangs non consécutifs."""
     out: List[Dict] = []
     last = None
-    for i in range(n):
-        if i in keep:
-            if last is not None and i > last + 1:
-                out.append({"ellipsis": True})
-            out.append(rows_full[i])
-            last = i
-    return out
\ No newline at end of file
+    for r in rows:
+        if last is not None and r["rank"] > last + 1:
+            out.append({"ellipsis": True})
+        out.append(r)
+        last = r["rank"]
+    return out
+
@@ -0,0 +1,99 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.profiling import count_queries, isolated_test_db
+from races.models import Season, Tour, Stage, Rider, Entry, Result
+from bets.models import Bet, BetScore
+from bets.scoring import score_unit
+
+
+def _legacy_score(bet) -> float:
+    """Ancien chemin : 1 requête top3 + 1 requête Entry par pick, puis update_or_create."""
+    results = list(Result.objects.filter(one_day_race=bet.one_day_race, stage=bet.stage).order_by("position")[:3])
+    if len(results) < 3:
+        return 0.0
+    pos_by_rider = {r.rider_id: i + 1 for i, r in enumerate(results)}
+    base_exact = [10, 7, 5, 3, 2]
+    base_in_top3 = [4, 3, 2, 1, 1]
+    total = 0.0
+    for idx, rider_id in enumerate([bet.pick1_id, bet.pick2_id, bet.pick3_id, bet.pick4_id, bet.pick5_id]):
+        entry = Entry.objects.filter(one_day_race=bet.one_day_race, stage=bet.stage, rider_id=rider_id).first()
+        if not entry or entry.odds <= 0:
+            continue
+        actual_pos = pos_by_rider.get(rider_id)
+        if actual_pos is None:
+            continue
+        inv_odds = 1.0 / float(entry.odds)
+        total += (base_exact[idx] if actual_pos == idx + 1 else base_in_top3[idx]) * inv_odds
+    return total
+
+
+class Command(BaseCommand):
+    help = "Benchmark du scoring d'une étape (base de test jetable) : requêtes et temps par 1k bets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bets", type=int, default=20000, help="Nombre de bets sur l'étape. Défaut=20000")
+        parser.add_argument("--riders", type=int, default=176, help="Nombre d'engagés. Défaut=176")
+        parser.add_argument("--legacy-sample", type=int, default=1000, help="Bets scorés avec l'ancien chemin. Défaut=1000")
+
+    def handle(self, *args, **opts):
+        with isolated_test_db():
+            stage = self._build_fixture(opts["bets"], opts["riders"])
+
+            sample = list(Bet.objects.filter(stage=stage).order_by("id")[: opts["legacy_sample"]])
+            with count_queries() as legacy:
+                for bet in sample:
+                    BetScore.objects.update_or_create(bet=bet, defaults={"score": _legacy_score(bet)})
+
+            BetScore.objects.all().delete()
+            with count_queries() as batched:
+                written = score_unit(stage=stage)
+
+        self._report("legacy (par bet)", legacy, len(sample))
+        self._report("score_unit (batch)", batched, written)
+
+    def _report(self, label, stats, n):
+        per_k = 1000 / n if n else 0
+        self.stdout.write(
+            f"{label:<20} | bets={n:>6} | requêtes={stats.queries:>7} ({stats.queries * per_k:.1f}/1k)"
+            f" | temps={stats.elapsed_ms:.0f} ms ({stats.elapsed_ms * per_k:.1f} ms/1k)"
+        )
+
+    def _build_fixture(self, n_bets: int, n_riders: int) -> Stage:
+        rnd = random.Random(42)
+        now = timezone.now()
+
+        season = Season.objects.create(year=now.year)
+        tour = Tour.objects.create(season=season, name="Bench Tour", start_datetime=now - timedelta(days=1))
+        stage = Stage.objects.create(tour=tour, number=1, name="Bench", start_datetime=now - timedelta(hours=5))
+
+        riders = Rider.objects.bulk_create(
+            [Rider(first_name="R", last_name=f"Rider {i:03d}") for i in range(n_riders)]
+        )
+        Entry.objects.bulk_create([
+            Entry(stage=stage, rider=r, odds=max(10 - i * 0.5, 1)) for i, r in enumerate(riders)
+        ])
+        Result.objects.bulk_create([
+            Result(stage=stage, position=pos, rider=riders[idx]) for pos, idx in ((1, 0), (2, 3), (3, 1))
+        ])
+
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            [User(username=f"bench{i}", email=f"bench{i}@cdb.local") for i in range(n_bets)],
+            batch_size=2000,
+        )
+
+        favourites = riders[:20]
+        bets = []
+        for u in users:
+            picks = rnd.sample(favourites, 5)
+            bets.append(Bet(
+                user=u, stage=stage, submitted_at=now,
+                pick1=picks[0], pick2=picks[1], pick3=picks[2], pick4=picks[3], pick5=picks[4],
+            ))
+        Bet.objects.bulk_create(bets, batch_size=2000)
+        return stage
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from races.models import Season, Tour
+from bets.standings import rebuild_season_standings, rebuild_tour_standings
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les classements matérialisés (saison + tours) depuis les BetScore (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="Saison à reconstruire (défaut : toutes).")
+        parser.add_argument("--tour", type=int, help="Reconstruit uniquement ce tour (id).")
+
+    def handle(self, *args, **opts):
+        if opts.get("tour"):
+            tour = Tour.objects.filter(id=opts["tour"]).first()
+            if tour is None:
+                raise CommandError(f"Tour id={opts['tour']} introuvable.")
+            n = rebuild_tour_standings(tour)
+            self.stdout.write(self.style.SUCCESS(f"✅ rebuild_standings terminé | {tour} : {n} lignes"))
+            return
+
+        seasons = Season.objects.all().order_by("year")
+        if opts.get("year"):
+            seasons = seasons.filter(year=opts["year"])
+            if not seasons.exists():
+                raise CommandError(f"Saison {opts['year']} introuvable.")
+
+        for season in seasons:
+            n = rebuild_season_standings(season)
+            self.stdout.write(f"Saison {season.year} : {n} joueurs classés")
+
+            for tour in Tour.objects.filter(season=season).select_related("season"):
+                n = rebuild_tour_standings(tour)
+                self.stdout.write(f"  {tour} : {n} lignes (général + classements spéciaux)")
+
+        self.stdout.write(self.style.SUCCESS("✅ rebuild_standings terminé"))
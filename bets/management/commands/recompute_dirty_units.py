@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bets.recompute import recompute_dirty_units
+
+
+class Command(BaseCommand):
+    help = "Recalcule scores + badges des unités dont les résultats ont changé (1 recalcul par unité)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Tourne en continu (worker).")
+        parser.add_argument("--interval", type=float, default=5.0, help="Pause entre deux passages en mode --loop (secondes). Défaut=5")
+        parser.add_argument("--limit", type=int, default=None, help="Nombre max d'unités par passage.")
+
+    def handle(self, *args, **opts):
+        if not opts["loop"]:
+            done = recompute_dirty_units(limit=opts["limit"])
+            self.stdout.write(self.style.SUCCESS(f"✅ recompute_dirty_units terminé | unités: {done}"))
+            return
+
+        self.stdout.write("recompute_dirty_units: worker démarré (Ctrl+C pour arrêter)")
+        try:
+            while True:
+                done = recompute_dirty_units(limit=opts["limit"])
+                if done:
+                    self.stdout.write(f"unités recalculées: {done}")
+                else:
+                    time.sleep(opts["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("recompute_dirty_units: arrêt")
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bets", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DirtyUnit",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("unit_kind", models.CharField(max_length=16)),
+                ("unit_id", models.PositiveIntegerField()),
+                ("marked_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "unique_together": {("unit_kind", "unit_id")},
+            },
+        ),
+    ]
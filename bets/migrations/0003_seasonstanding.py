@@ -0,0 +1,100 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_season_standings(apps, schema_editor):
+    """Classements de saison depuis les BetScore existants (même ordre que bets/standings.py)."""
+    BetScore = apps.get_model("bets", "BetScore")
+    SeasonStanding = apps.get_model("bets", "SeasonStanding")
+
+    totals = {}
+    for season_field in ("bet__one_day_race__season_id", "bet__stage__tour__season_id"):
+        rows = (
+            BetScore.objects.filter(**{f"{season_field}__isnull": False})
+            .values(season_field, "bet__user_id", "bet__user__username")
+            .annotate(total=Sum("score"), played=Count("id"))
+        )
+        for row in rows:
+            key = (row[season_field], row["bet__user_id"])
+            t = totals.setdefault(key, [0, 0, row["bet__user__username"]])
+            t[0] += row["total"] or 0
+            t[1] += row["played"]
+
+    by_season = {}
+    for (season_id, user_id), (total, played, username) in totals.items():
+        by_season.setdefault(season_id, []).append((total, username, user_id, played))
+
+    standings = []
+    for season_id, rows in by_season.items():
+        rows.sort(key=lambda r: (-r[0], r[1]))
+        standings += [
+            SeasonStanding(season_id=season_id, user_id=user_id, total=total, units_played=played, rank=rank)
+            for rank, (total, _username, user_id, played) in enumerate(rows, start=1)
+        ]
+    SeasonStanding.objects.bulk_create(standings, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bets", "0002_dirtyunit"),
+        ("races", "0007_alter_rider_country"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SeasonStanding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=4, default=0, max_digits=12),
+                ),
+                ("rank", models.PositiveIntegerField(default=0)),
+                ("units_played", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "season",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="standings",
+                        to="races.season",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="season_standings",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["season", "rank"], name="bets_season_season__cb93da_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "season"), name="uniq_standing_user_season"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_season_standings, migrations.RunPython.noop),
+    ]
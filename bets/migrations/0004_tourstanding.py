@@ -0,0 +1,109 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+# copie figée de CATEGORY_BY_STAGE_TYPE (bets/standings.py) à cette migration
+CATEGORY_BY_STAGE_TYPE = {"FLAT": "sprinteur", "MOUNTAIN": "grimpeur", "HILLY": "baroudeur", "TT": "rouleur"}
+
+
+def backfill_tour_standings(apps, schema_editor):
+    """Classements de tour (all + spéciaux) depuis les BetScore existants (même ordre que bets/standings.py)."""
+    BetScore = apps.get_model("bets", "BetScore")
+    TourStanding = apps.get_model("bets", "TourStanding")
+
+    totals = {}
+    rows = (
+        BetScore.objects.filter(bet__stage__isnull=False)
+        .values("bet__stage__tour_id", "bet__stage__stage_type", "bet__user_id", "bet__user__username")
+        .annotate(total=Sum("score"), played=Count("id"))
+    )
+    for row in rows:
+        categories = ["all"]
+        if row["bet__stage__stage_type"] in CATEGORY_BY_STAGE_TYPE:
+            categories.append(CATEGORY_BY_STAGE_TYPE[row["bet__stage__stage_type"]])
+        for category in categories:
+            key = (row["bet__stage__tour_id"], category, row["bet__user_id"])
+            t = totals.setdefault(key, [0, 0, row["bet__user__username"]])
+            t[0] += row["total"] or 0
+            t[1] += row["played"]
+
+    by_scope = {}
+    for (tour_id, category, user_id), (total, played, username) in totals.items():
+        by_scope.setdefault((tour_id, category), []).append((total, username, user_id, played))
+
+    standings = []
+    for (tour_id, category), rows in by_scope.items():
+        rows.sort(key=lambda r: (-r[0], r[1]))
+        standings += [
+            TourStanding(tour_id=tour_id, category=category, user_id=user_id, total=total, units_played=played, rank=rank)
+            for rank, (total, _username, user_id, played) in enumerate(rows, start=1)
+        ]
+    TourStanding.objects.bulk_create(standings, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bets", "0003_seasonstanding"),
+        ("races", "0007_alter_rider_country"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TourStanding",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("category", models.CharField(max_length=16)),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=4, default=0, max_digits=12),
+                ),
+                ("rank", models.PositiveIntegerField(default=0)),
+                ("units_played", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "tour",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="standings",
+                        to="races.tour",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tour_standings",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["tour", "category", "rank"],
+                        name="bets_tourst_tour_id_d745f6_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "tour", "category"),
+                        name="uniq_standing_user_tour_cat",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_tour_standings, migrations.RunPython.noop),
+    ]
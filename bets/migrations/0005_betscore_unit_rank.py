@@ -0,0 +1,78 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_unit_ranks(apps, schema_editor):
+    Bet = apps.get_model("bets", "Bet")
+    BetScore = apps.get_model("bets", "BetScore")
+
+    bets = Bet.objects.filter(id=OuterRef("bet_id"))
+    BetScore.objects.update(
+        one_day_race_id=Subquery(bets.values("one_day_race_id")[:1]),
+        stage_id=Subquery(bets.values("stage_id")[:1]),
+    )
+
+    units = BetScore.objects.values_list("one_day_race_id", "stage_id").distinct()
+    for one_day_race_id, stage_id in list(units):
+        rows = list(
+            BetScore.objects.filter(one_day_race_id=one_day_race_id, stage_id=stage_id)
+            .order_by("-score", "bet__user__username")
+            .only("id")
+        )
+        for i, row in enumerate(rows, start=1):
+            row.rank = i
+        BetScore.objects.bulk_update(rows, ["rank"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bets", "0004_tourstanding"),
+        ("races", "0007_alter_rider_country"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="betscore",
+            name="one_day_race",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="races.onedayrace",
+            ),
+        ),
+        migrations.AddField(
+            model_name="betscore",
+            name="rank",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="betscore",
+            name="stage",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="races.stage",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="betscore",
+            index=models.Index(
+                fields=["one_day_race", "rank"], name="bets_betsco_one_day_3f2f8e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="betscore",
+            index=models.Index(
+                fields=["stage", "rank"], name="bets_betsco_stage_i_01cbd3_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_unit_ranks, migrations.RunPython.noop),
+    ]
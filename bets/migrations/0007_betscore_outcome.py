@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bets", "0006_scopeversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="betscore",
+            name="outcome",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
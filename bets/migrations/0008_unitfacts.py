@@ -0,0 +1,124 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_unit_facts(apps, schema_editor):
+    OneDayRace = apps.get_model("races", "OneDayRace")
+    Stage = apps.get_model("races", "Stage")
+    Entry = apps.get_model("races", "Entry")
+    Result = apps.get_model("races", "Result")
+    UnitFacts = apps.get_model("bets", "UnitFacts")
+
+    rows = []
+    for field, model in (("one_day_race_id", OneDayRace), ("stage_id", Stage)):
+        for unit_id in model.objects.values_list("id", flat=True):
+            finishers = list(
+                Result.objects.filter(**{field: unit_id}).order_by("position").values_list("rider_id", flat=True)
+            )
+            entrants = list(
+                Entry.objects.filter(**{field: unit_id}).order_by("-odds").values_list("rider_id", flat=True)
+            )
+            top3 = (finishers + [None, None, None])[:3]
+            rows.append(UnitFacts(
+                winner_id=top3[0],
+                second_id=top3[1],
+                third_id=top3[2],
+                favourite_id=entrants[0] if entrants else None,
+                entry_count=len(entrants),
+                result_count=len(finishers),
+                finished=len(finishers) >= 3,
+                **{field: unit_id},
+            ))
+    UnitFacts.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bets", "0007_betscore_outcome"),
+        ("races", "0007_alter_rider_country"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnitFacts",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("entry_count", models.PositiveIntegerField(default=0)),
+                ("result_count", models.PositiveIntegerField(default=0)),
+                ("finished", models.BooleanField(default=False)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "favourite",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="races.rider",
+                    ),
+                ),
+                (
+                    "one_day_race",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facts",
+                        to="races.onedayrace",
+                    ),
+                ),
+                (
+                    "second",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="races.rider",
+                    ),
+                ),
+                (
+                    "stage",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facts",
+                        to="races.stage",
+                    ),
+                ),
+                (
+                    "third",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="races.rider",
+                    ),
+                ),
+                (
+                    "winner",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="races.rider",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(backfill_unit_facts, migrations.RunPython.noop),
+    ]
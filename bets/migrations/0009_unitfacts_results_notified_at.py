@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:39
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_finished_units_notified(apps, schema_editor):
+    # les unités déjà terminées ne doivent pas déclencher de notification au prochain recalcul
+    UnitFacts = apps.get_model("bets", "UnitFacts")
+    UnitFacts.objects.filter(finished=True).update(results_notified_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bets", "0008_unitfacts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="unitfacts",
+            name="results_notified_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_finished_units_notified, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bets", "0009_unitfacts_results_notified_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bet",
+            index=models.Index(fields=["updated_at", "id"], name="bet_updated_at_idx"),
+        ),
+    ]
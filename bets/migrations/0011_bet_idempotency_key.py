@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bets", "0010_bet_updated_at_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bet",
+            name="idempotency_key",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
@@ -16,6 +16,8 @@ class Bet(models.Model):
     pick5 = models.ForeignKey("races.Rider", on_delete=models.PROTECT, related_name="+", null=True, blank=True)
 
     submitted_at = models.DateTimeField(null=True, blank=True)  # validation horodatée
+    # clé d'idempotence du dernier envoi via l'API JSON (rejeu d'un envoi PWA = même réponse, rien réécrit)
+    idempotency_key = models.CharField(max_length=64, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -24,6 +26,10 @@ class Bet(models.Model):
             models.UniqueConstraint(fields=["user", "one_day_race"], name="uniq_bet_user_one_day"),
             models.UniqueConstraint(fields=["user", "stage"], name="uniq_bet_user_stage"),
         ]
+        indexes = [
+            # curseur des badges de prono (badges/services.py, award_bet_badges_since_watermark)
+            models.Index(fields=["updated_at", "id"], name="bet_updated_at_idx"),
+        ]
 
     def clean(self):
         if (self.one_day_race is None) == (self.stage is None):
@@ -50,50 +56,240 @@ class BetScore(models.Model):
     score = models.DecimalField(max_digits=10, decimal_places=4, default=0)
     computed_at = models.DateTimeField(auto_now=True)
 
+    # Dénormalisé depuis le Bet : classement de l'unité lisible par index (unité, rang)
+    one_day_race = models.ForeignKey(OneDayRace, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    stage = models.ForeignKey(Stage, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    rank = models.PositiveIntegerField(default=0)
+
+    # Bits OUTCOME_* (vainqueur trouvé, pick1 dans le top3...) : alimente stats.UserStatsSnapshot
+    outcome = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["one_day_race", "rank"]),
+            models.Index(fields=["stage", "rank"]),
+        ]
+
     def __str__(self):
         return f"Score({self.bet}={self.score})"
 
 
-def _get_odds_for_unit_rider(one_day_race, stage, rider):
-    entry = Entry.objects.filter(one_day_race=one_day_race, stage=stage, rider=rider).first()
-    if not entry:
-        return None
-    return float(entry.odds)
+class SeasonStanding(models.Model):
+    """
+    Classement global matérialisé (somme des BetScore de la saison).
+    Maintenu par delta à chaque recalcul d'unité (bets/standings.py), rangs recalculés en une passe.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="season_standings")
+    season = models.ForeignKey("races.Season", on_delete=models.CASCADE, related_name="standings")
+    total = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    rank = models.PositiveIntegerField(default=0)
+    units_played = models.PositiveIntegerField(default=0)  # nb de Bets scorés
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "season"], name="uniq_standing_user_season"),
+        ]
+        indexes = [
+            models.Index(fields=["season", "rank"]),
+        ]
 
-def compute_score_for_bet(bet: Bet) -> float:
+    def __str__(self):
+        return f"Standing({self.season} #{self.rank} {self.user}={self.total})"
+
+
+BASE_EXACT = [10, 7, 5, 3, 2]
+BASE_IN_TOP3 = [4, 3, 2, 1, 1]
+
+
+def score_picks(pick_ids, top3_ids, odds_by_rider) -> float:
     """
-    Calcule le score selon tes règles à partir du top3 officiel.
+    Score pur (sans requête) d'un Top5 :
+    - pick_ids : [pick1_id, ..., pick5_id]
+    - top3_ids : [rider_id 1er, 2e, 3e]
+    - odds_by_rider : {rider_id: cote} (au minimum pour les coureurs du top3)
     """
-    # Récupère top3 résultats
-    results = Result.objects.filter(one_day_race=bet.one_day_race, stage=bet.stage).order_by("position")[:3]
-    if results.count() < 3:
+    if len(top3_ids) < 3:
         return 0.0
 
-    top3 = [r.rider_id for r in results]   # ids
-    pos_by_rider = {results[i].rider_id: i + 1 for i in range(len(results))}
-
-    picks = [bet.pick1, bet.pick2, bet.pick3, bet.pick4, bet.pick5]
-    base_exact = [10, 7, 5, 3, 2]
-    base_in_top3 = [4, 3, 2, 1, 1]
+    pos_by_rider = {rider_id: i + 1 for i, rider_id in enumerate(top3_ids)}
 
     total = 0.0
-    for idx, rider in enumerate(picks):
-        odds = _get_odds_for_unit_rider(bet.one_day_race, bet.stage, rider)
+    for idx, rider_id in enumerate(pick_ids):
+        actual_pos = pos_by_rider.get(rider_id)  # 1..3 or None
+        if actual_pos is None:
+            continue
+
+        odds = odds_by_rider.get(rider_id)
         if not odds or odds <= 0:
             continue
         inv_odds = 1.0 / odds
 
         expected_pos = idx + 1
-        actual_pos = pos_by_rider.get(rider.id)  # 1..3 or None
+        if actual_pos == expected_pos:
+            total += BASE_EXACT[idx] * inv_odds
+        else:
+            # dans top3 mais mauvaise place
+            total += BASE_IN_TOP3[idx] * inv_odds
 
-        if actual_pos is None:
-            continue
+    return total
 
-        if actual_pos == expected_pos and expected_pos <= 3:
-            total += base_exact[idx] * inv_odds
-        elif actual_pos <= 3:
-            # dans top3 mais mauvaise place
-            total += base_in_top3[idx] * inv_odds
 
-    return total
\ No newline at end of file
+# Issue d'un prono validé, en bits (BetScore.outcome)
+OUTCOME_SUBMITTED = 1         # prono validé (submitted_at)
+OUTCOME_FINISHED = 2          # unité avec top3 complet
+OUTCOME_EXACT_WINNER = 4      # pick1 = vainqueur
+OUTCOME_WINNER_IN_PICKS = 8   # vainqueur dans le Top5
+OUTCOME_PICK1_IN_TOP3 = 16
+OUTCOME_ANY_PICK_IN_TOP3 = 32
+OUTCOME_HAD_FAVOURITE = 64    # favori (cote max) dans le Top5, unité avec vainqueur
+
+OUTCOME_FLAGS = {
+    "played": OUTCOME_SUBMITTED,
+    "units_with_results": OUTCOME_FINISHED,
+    "win_exact": OUTCOME_EXACT_WINNER,
+    "win_in_top5": OUTCOME_WINNER_IN_PICKS,
+    "pick1_in_top3": OUTCOME_PICK1_IN_TOP3,
+    "any_pick_in_top3": OUTCOME_ANY_PICK_IN_TOP3,
+    "had_favourite": OUTCOME_HAD_FAVOURITE,
+}
+
+
+def bet_outcome(pick_ids, top3_ids, favourite_id, submitted: bool) -> int:
+    """Bits OUTCOME_* d'un Top5 (sans requête). Seuls les pronos validés comptent."""
+    if not submitted:
+        return 0
+
+    outcome = OUTCOME_SUBMITTED
+    picks = [pid for pid in pick_ids if pid]
+
+    if top3_ids and favourite_id and favourite_id in picks:
+        outcome |= OUTCOME_HAD_FAVOURITE
+
+    if len(top3_ids) < 3:
+        return outcome
+
+    outcome |= OUTCOME_FINISHED
+    winner_id = top3_ids[0]
+    if pick_ids[0] and pick_ids[0] == winner_id:
+        outcome |= OUTCOME_EXACT_WINNER
+    if winner_id in picks:
+        outcome |= OUTCOME_WINNER_IN_PICKS
+    if pick_ids[0] and pick_ids[0] in top3_ids:
+        outcome |= OUTCOME_PICK1_IN_TOP3
+    if any(pid in top3_ids for pid in picks):
+        outcome |= OUTCOME_ANY_PICK_IN_TOP3
+    return outcome
+
+
+def unit_top3_ids(one_day_race, stage) -> list:
+    """Top3 officiel (ids coureurs, ordonnés par position)."""
+    return list(
+        Result.objects.filter(one_day_race=one_day_race, stage=stage)
+        .order_by("position")
+        .values_list("rider_id", flat=True)[:3]
+    )
+
+
+def unit_odds_by_rider(one_day_race, stage, rider_ids=None) -> dict:
+    """Cotes de l'unité {rider_id: odds}, éventuellement restreintes à quelques coureurs (startlist en cache)."""
+    from .startlist import startlist_odds  # import local : bets.startlist importe ce module
+    return startlist_odds(one_day_race, stage, rider_ids=rider_ids)
+
+
+def compute_score_for_bet(bet: Bet) -> float:
+    """
+    Calcule le score selon tes règles à partir du top3 officiel.
+    Pour scorer tous les Bets d'une unité, utiliser bets.scoring.score_unit.
+    """
+    top3 = unit_top3_ids(bet.one_day_race, bet.stage)
+    if len(top3) < 3:
+        return 0.0
+
+    odds = unit_odds_by_rider(bet.one_day_race, bet.stage, rider_ids=top3)
+    picks = [bet.pick1_id, bet.pick2_id, bet.pick3_id, bet.pick4_id, bet.pick5_id]
+    return score_picks(picks, top3, odds)
+
+
+class TourStanding(models.Model):
+    """
+    Classement matérialisé d'un tour : category="all" (toutes les étapes)
+    ou un classement spécial (sprinteur, grimpeur, baroudeur, rouleur) selon le type d'étape.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="tour_standings")
+    tour = models.ForeignKey("races.Tour", on_delete=models.CASCADE, related_name="standings")
+    category = models.CharField(max_length=16)  # "all" | "sprinteur" | "grimpeur" | "baroudeur" | "rouleur"
+    total = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    rank = models.PositiveIntegerField(default=0)
+    units_played = models.PositiveIntegerField(default=0)  # nb d'étapes scorées
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "tour", "category"], name="uniq_standing_user_tour_cat"),
+        ]
+        indexes = [
+            models.Index(fields=["tour", "category", "rank"]),
+        ]
+
+    def __str__(self):
+        return f"TourStanding({self.tour_id}/{self.category} #{self.rank} {self.user}={self.total})"
+
+
+class DirtyUnit(models.Model):
+    """
+    Unité (course d'un jour / étape) dont les résultats ont changé et qui attend
+    un recalcul des scores + badges (voir bets/recompute.py).
+    """
+    unit_kind = models.CharField(max_length=16)  # "one_day" | "stage"
+    unit_id = models.PositiveIntegerField()
+    marked_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("unit_kind", "unit_id")
+
+    def __str__(self):
+        return f"DirtyUnit({self.unit_kind}#{self.unit_id})"
+
+
+class ScopeVersion(models.Model):
+    """
+    Numéro de version d'un classement (saison, unité, tour/catégorie, ligue...).
+    Incrémenté par la chaîne résultats -> scores -> classements : les caches
+    sont indexés par cette version, donc jamais servis périmés (voir bets/versions.py).
+    """
+    key = models.CharField(max_length=64, unique=True)  # ex: "season:3", "tour:1:all"
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"ScopeVersion({self.key} v{self.version})"
+
+
+class UnitFacts(models.Model):
+    """
+    Faits d'une unité (course d'un jour OU étape), communs à tous les joueurs :
+    top3 officiel, favori (cote max), nb d'engagés, terminée ou non.
+    Recalculés une fois quand les résultats / engagés changent (bets/facts.py),
+    puis lus par le scoring, les stats, le dashboard et les badges.
+    """
+    one_day_race = models.OneToOneField(OneDayRace, on_delete=models.CASCADE, null=True, blank=True, related_name="facts")
+    stage = models.OneToOneField(Stage, on_delete=models.CASCADE, null=True, blank=True, related_name="facts")
+
+    winner = models.ForeignKey("races.Rider", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    second = models.ForeignKey("races.Rider", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    third = models.ForeignKey("races.Rider", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    favourite = models.ForeignKey("races.Rider", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    entry_count = models.PositiveIntegerField(default=0)
+    result_count = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)  # top3 complet
+    results_notified_at = models.DateTimeField(null=True, blank=True)  # notification "résultat publié" (bets/fanout.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def top3_ids(self) -> list:
+        return [rider_id for rider_id in (self.winner_id, self.second_id, self.third_id) if rider_id]
+
+    def __str__(self):
+        unit = self.one_day_race_id and f"one_day#{self.one_day_race_id}" or f"stage#{self.stage_id}"
+        return f"UnitFacts({unit} finished={self.finished})"
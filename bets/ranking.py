@@ -0,0 +1,276 @@
+# bets/ranking.py
+"""
+Couche de requêtes des classements.
+
+Les pages/API lisent le haut et le bas du classement depuis le cache versionné
+(bets/leaderboard_cache.py) ; le rang du visiteur (lookup indexé), les lignes ±k autour
+de lui ou d'une page plus loin et les profils des seules lignes affichées sont lus à part.
+Les lookups ponctuels (badges, dashboard) lisent directement les rangs matérialisés.
+
+Un "scope" = un classement :
+- StandingScope : SeasonStanding / TourStanding (rang déjà matérialisé)
+- UnitScope     : BetScore d'une course/étape (rang matérialisé sur BetScore.rank)
+- LeagueScope   : SeasonStanding des membres d'une ligue (rang via ROW_NUMBER())
+
+Les rangs matérialisés sont indexés (scope, rank) : "quel est mon rang ?" et
+"qui est n°k ?" sont des lookups d'index, pas un tri du classement
+(`rank_and_total` / `users_at_ranks`).
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .leaderboard_cache import cached_edges
+from .leaderboards_utils import compact_ranks, enrich_rows_with_profile, insert_ellipses
+from .models import BetScore, SeasonStanding, TourStanding
+from .standings import CATEGORY_ALL
+from .versions import (
+    league_version_key,
+    season_version_key,
+    tour_version_key,
+    unit_version_key,
+)
+
+PAGE_SIZE_MAX = 100
+
+
+def _row(user_id, username, total, rank) -> Dict:
+    return {"user_id": user_id, "username": username, "total": float(total or 0), "rank": rank}
+
+
+class StandingScope:
+    """Classement matérialisé : le rang est une colonne indexée."""
+
+    user_field = "user_id"
+    username_field = "user__username"
+    total_field = "total"
+
+    def __init__(self, standings, key: str):
+        self.qs = standings
+        self.key = key
+        self.version_keys = (key,)
+
+    def count(self) -> int:
+        return self.qs.count()
+
+    def rank_of(self, user_id) -> Optional[int]:
+        return self.qs.filter(**{self.user_field: user_id}).values_list("rank", flat=True).first()
+
+    def rank_and_total(self, user_id) -> Optional[Tuple[int, float]]:
+        found = self.qs.filter(**{self.user_field: user_id}).values_list("rank", self.total_field).first()
+        if found is None:
+            return None
+        return found[0], float(found[1] or 0)
+
+    def user_ids_between(self, first: int, last: int) -> List[int]:
+        return list(
+            self.qs.filter(rank__gte=first, rank__lte=last)
+            .order_by("rank")
+            .values_list(self.user_field, flat=True)
+        )
+
+    def rows_for_ranks(self, ranks: Iterable[int]) -> List[Dict]:
+        return self._rows(self.qs.filter(rank__in=list(ranks)))
+
+    def rows_between(self, first: int, last: int) -> List[Dict]:
+        return self._rows(self.qs.filter(rank__gte=first, rank__lte=last))
+
+    def _rows(self, qs) -> List[Dict]:
+        return [
+            _row(*values)
+            for values in qs.order_by("rank").values_list(
+                self.user_field, self.username_field, self.total_field, "rank"
+            )
+        ]
+
+
+class _WindowScope:
+    """Classement calculé à la volée avec ROW_NUMBER() ; seules les lignes demandées sortent de la base."""
+
+    user_field = "user_id"
+    username_field = "user__username"
+    total_field = "total"
+
+    def base(self):
+        raise NotImplementedError
+
+    def order_by(self):
+        raise NotImplementedError
+
+    def _ranked(self):
+        return self.base().annotate(
+            lb_rank=Window(RowNumber(), order_by=self.order_by())
+        ).values_list(self.user_field, self.username_field, self.total_field, "lb_rank")
+
+    def count(self) -> int:
+        return self.base().count()
+
+    def rows_for_ranks(self, ranks: Iterable[int]) -> List[Dict]:
+        return [_row(*values) for values in self._ranked().filter(lb_rank__in=list(ranks)).order_by("lb_rank")]
+
+    def rows_between(self, first: int, last: int) -> List[Dict]:
+        return [
+            _row(*values)
+            for values in self._ranked().filter(lb_rank__gte=first, lb_rank__lte=last).order_by("lb_rank")
+        ]
+
+
+class UnitScope(StandingScope):
+    """Classement d'une course d'un jour OU d'une étape (1 BetScore par joueur)."""
+
+    user_field = "bet__user_id"
+    username_field = "bet__user__username"
+    total_field = "score"
+
+    def __init__(self, one_day_race=None, stage=None):
+        self.one_day_race = one_day_race
+        self.stage = stage
+        super().__init__(
+            BetScore.objects.filter(one_day_race=one_day_race, stage=stage),
+            unit_version_key(one_day_race.id if one_day_race else None, stage.id if stage else None),
+        )
+
+
+class LeagueScope(_WindowScope):
+    """Classement de saison restreint aux membres d'une ligue (même ordre que le classement global)."""
+
+    def __init__(self, league, season):
+        self.league = league
+        self.season = season
+        self.key = f"league:{league.id}:season:{season.id}"
+        self.version_keys = (season_version_key(season.id), league_version_key(league.id))
+
+    def base(self):
+        return SeasonStanding.objects.filter(season=self.season, user__league_memberships__league=self.league)
+
+    def order_by(self):
+        return [F("rank").asc()]
+
+    def rank_of(self, user_id) -> Optional[int]:
+        # ligue = quelques dizaines de membres : on compte ceux qui sont devant au global
+        found = self.rank_and_total(user_id)
+        return found[0] if found else None
+
+    def rank_and_total(self, user_id) -> Optional[Tuple[int, float]]:
+        mine = self.base().filter(user_id=user_id).values_list("rank", "total").first()
+        if mine is None:
+            return None
+        global_rank, total = mine
+        return self.base().filter(rank__lt=global_rank).count() + 1, float(total or 0)
+
+    def user_ids_between(self, first: int, last: int) -> List[int]:
+        return [row["user_id"] for row in self.rows_between(first, last)]
+
+
+# -------------------------
+# Fabriques
+# -------------------------
+
+def season_scope(season) -> StandingScope:
+    return StandingScope(SeasonStanding.objects.filter(season=season), season_version_key(season.id))
+
+
+def tour_scope(tour, category: str = CATEGORY_ALL) -> StandingScope:
+    return StandingScope(TourStanding.objects.filter(tour=tour, category=category), tour_version_key(tour.id, category))
+
+
+def unit_scope(one_day_race=None, stage=None) -> UnitScope:
+    return UnitScope(one_day_race=one_day_race, stage=stage)
+
+
+def league_scope(league, season) -> LeagueScope:
+    return LeagueScope(league, season)
+
+
+# -------------------------
+# Lookups (badges, dashboard, vues)
+# -------------------------
+
+def rank_and_total(scope, user_id) -> Optional[Tuple[int, float]]:
+    """(rang, total) du joueur dans le classement, ou None s'il n'y figure pas."""
+    return scope.rank_and_total(user_id)
+
+
+def users_at_ranks(scope, first: int, last: Optional[int] = None) -> List[int]:
+    """user_ids classés de first à last (inclus), dans l'ordre du classement."""
+    return scope.user_ids_between(first, first if last is None else last)
+
+
+# -------------------------
+# Fenêtres
+# -------------------------
+
+def _rows_at(scope, edges: Dict, ranks: Iterable[int]) -> Dict[int, Dict]:
+    """Lignes de ces rangs : extrémités en cache, le reste (plage contiguë) lu en base."""
+    known = {r["rank"]: r for r in edges["top"]}
+    known.update((r["rank"], r) for r in edges["bottom"])
+    missing = [r for r in ranks if r not in known]
+    if missing:
+        known.update((r["rank"], r) for r in scope.rows_between(min(missing), max(missing)))
+    return known
+
+
+def _overlay(scope, edges: Dict, ranks: Iterable[int], request_user_id) -> List[Dict]:
+    """
+    Copie des lignes de ces rangs + is_me + profil (avatar, drapeau, badge) :
+    une requête sur les seules lignes affichées ; l'entrée en cache n'est jamais modifiée.
+    """
+    ranks = list(ranks)
+    rows = _rows_at(scope, edges, ranks)
+    window = [dict(rows[r], is_me=rows[r]["user_id"] == request_user_id) for r in ranks if r in rows]
+    enrich_rows_with_profile(window)
+    return window
+
+
+def _user_rank(scope, edges: Dict, request_user_id) -> Optional[int]:
+    if not request_user_id:
+        return None
+    for row in edges["top"] + edges["bottom"]:
+        if row["user_id"] == request_user_id:
+            return row["rank"]
+    found = scope.rank_and_total(request_user_id)
+    return found[0] if found else None
+
+
+def leaderboard_window(
+    scope,
+    request_user_id,
+    *,
+    top_n: int = 3,
+    bottom_n: int = 3,
+    around_user: int = 1,
+) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Retourne (podium top3, tableau compact avec ellipses).
+    Haut et bas du classement en cache ; rang du visiteur et ses voisins lus par index.
+    """
+    edges = cached_edges(scope)
+    n = edges["count"]
+    user_rank = _user_rank(scope, edges, request_user_id)
+
+    ranks = compact_ranks(n, user_rank=user_rank, top_n=top_n, bottom_n=bottom_n, around_user=around_user)
+    rows = _overlay(scope, edges, ranks, request_user_id)
+
+    podium = [r for r in rows if r["rank"] <= 3]
+    return podium, insert_ellipses(rows)
+
+
+def leaderboard_page(scope, request_user_id, *, start: int = 1, limit: int = 50) -> Dict:
+    """Une page (rangs start..start+limit-1) pour le scroll infini."""
+    start = max(int(start), 1)
+    limit = min(max(int(limit), 1), PAGE_SIZE_MAX)
+
+    edges = cached_edges(scope)
+    n = edges["count"]
+    rows = _overlay(scope, edges, range(start, min(start + limit - 1, n) + 1), request_user_id)
+
+    next_start = start + limit
+    return {
+        "count": n,
+        "start": start,
+        "rows": rows,
+        "next_start": next_start if next_start <= n else None,
+    }
@@ -0,0 +1,178 @@
+# bets/recompute.py
+"""
+Recalcul des faits / scores / badges quand les résultats (ou les engagés) d'une unité changent,
+puis notification "résultat publié" quand l'unité devient terminée.
+
+Les signaux Result / Entry ne recalculent plus directement : ils marquent l'unité "sale"
+(DirtyUnit) puis
+- mode "on_commit" (défaut) : UN seul recalcul par unité, après le commit de la transaction
+- mode "deferred" : rien dans la requête, c'est `manage.py recompute_dirty_units` qui s'en charge
+
+Saisir un top 10 dans l'admin ne déclenche donc plus 10 recalculs complets.
+"""
+from __future__ import annotations
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from races.models import OneDayRace, Stage
+from badges.services import update_unit_winner_badge, update_tour_badges
+from .facts import refresh_unit_facts
+from .fanout import notify_unit_results
+from .models import DirtyUnit
+from .scoring import score_unit
+
+logger = logging.getLogger(__name__)
+
+UNIT_ONE_DAY = "one_day"
+UNIT_STAGE = "stage"
+
+
+def unit_key(one_day_race_id=None, stage_id=None):
+    """(kind, id) d'une unité, même convention que ReminderLog."""
+    if one_day_race_id:
+        return UNIT_ONE_DAY, one_day_race_id
+    return UNIT_STAGE, stage_id
+
+
+def _recompute_mode() -> str:
+    return getattr(settings, "SCORES_RECOMPUTE_MODE", "on_commit")
+
+
+# -------------------------
+# Recalcul
+# -------------------------
+
+def recompute_unit(one_day_race=None, stage=None):
+    # faits de l'unité (top3, favori, terminée) : une fois ici, relus par tout le reste
+    facts = refresh_unit_facts(one_day_race=one_day_race, stage=stage)
+
+    score_unit(one_day_race=one_day_race, stage=stage, facts=facts)
+
+    # badges : seulement sur une unité terminée (top3 complet)
+    if not facts.finished:
+        return
+
+    # badges : vainqueur unité
+    update_unit_winner_badge(one_day_race=one_day_race, stage=stage)
+
+    # badges tour si étape
+    if stage is not None:
+        update_tour_badges(stage.tour)
+
+    # "résultat publié" : mis en file une seule fois par unité (bets/fanout.py)
+    notify_unit_results(one_day_race=one_day_race, stage=stage)
+
+
+def recompute_unit_by_key(kind: str, unit_id: int) -> bool:
+    """Retourne False si l'unité n'existe plus (supprimée entre-temps)."""
+    if kind == UNIT_ONE_DAY:
+        race = OneDayRace.objects.filter(id=unit_id).first()
+        if race is None:
+            return False
+        recompute_unit(one_day_race=race)
+    else:
+        stage = Stage.objects.select_related("tour", "tour__season").filter(id=unit_id).first()
+        if stage is None:
+            return False
+        recompute_unit(stage=stage)
+    return True
+
+
+def _claim(dirty: DirtyUnit) -> bool:
+    """
+    Retire la marque si elle n'a pas bougé depuis sa lecture.
+    Si un Result est re-saisi pendant le recalcul, la marque (plus récente) reste en place
+    et l'unité sera recalculée au prochain passage. Deux workers ne traitent jamais la même marque.
+    """
+    return DirtyUnit.objects.filter(id=dirty.id, marked_at=dirty.marked_at).delete()[0] > 0
+
+
+def _process(dirty: DirtyUnit) -> bool:
+    if not _claim(dirty):
+        return False
+    try:
+        with transaction.atomic():
+            recompute_unit_by_key(dirty.unit_kind, dirty.unit_id)
+    except Exception:
+        # on remet la marque pour ne pas perdre le recalcul
+        DirtyUnit.objects.update_or_create(unit_kind=dirty.unit_kind, unit_id=dirty.unit_id)
+        raise
+    return True
+
+
+def recompute_dirty_units(limit: int | None = None) -> int:
+    """Traite les unités marquées (plus anciennes d'abord). Retourne le nombre d'unités recalculées."""
+    qs = DirtyUnit.objects.order_by("marked_at")
+    if limit:
+        qs = qs[:limit]
+
+    done = 0
+    for dirty in list(qs):
+        done += int(_process(dirty))
+    return done
+
+
+# -------------------------
+# Marquage (appelé par les signaux)
+# -------------------------
+
+# Unités à recalculer au prochain commit, rangées sur la connexion.
+_PENDING_ATTR = "_cdb_recompute_pending"
+
+
+def _pending(connection) -> set:
+    pending = getattr(connection, _PENDING_ATTR, None)
+    if pending is None:
+        pending = set()
+        setattr(connection, _PENDING_ATTR, pending)
+    return pending
+
+
+def _flush_pending() -> None:
+    """
+    Callback on_commit : recalcule une fois chaque unité marquée sur la connexion.
+    Chaque marque enregistre ce callback : après un rollback (callbacks abandonnés par Django),
+    la marque suivante en réenregistre un, rien n'est perdu ; le premier appel vide l'ensemble,
+    les suivants de la même transaction ne font rien. Une clé laissée par un rollback ne coûte
+    qu'une lecture (sa marque DirtyUnit a été annulée avec elle).
+    Une erreur de recalcul est journalisée, pas propagée : la transaction est déjà validée,
+    la marque reste en place pour `recompute_dirty_units`.
+    """
+    pending = _pending(transaction.get_connection())
+    keys = sorted(pending)
+    pending.clear()
+    for kind, unit_id in keys:
+        dirty = DirtyUnit.objects.filter(unit_kind=kind, unit_id=unit_id).first()
+        if dirty is None:
+            continue
+        try:
+            _process(dirty)
+        except Exception:
+            logger.exception("recompute %s:%s en échec, laissé au worker", kind, unit_id)
+
+
+def _schedule_recompute(kind: str, unit_id: int) -> None:
+    _pending(transaction.get_connection()).add((kind, unit_id))
+    transaction.on_commit(_flush_pending)
+
+
+def mark_unit_dirty(one_day_race_id=None, stage_id=None) -> None:
+    kind, unit_id = unit_key(one_day_race_id, stage_id)
+    if not unit_id:
+        return
+
+    DirtyUnit.objects.bulk_create(
+        [DirtyUnit(unit_kind=kind, unit_id=unit_id, marked_at=timezone.now())],
+        update_conflicts=True,
+        unique_fields=["unit_kind", "unit_id"],
+        update_fields=["marked_at"],
+    )
+
+    if _recompute_mode() != "on_commit":
+        return
+
+    _schedule_recompute(kind, unit_id)
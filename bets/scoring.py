@@ -0,0 +1,97 @@
+# bets/scoring.py
+"""
+Moteur de score par unité (course d'un jour OU étape).
+
+Au lieu de ~6 requêtes par Bet (top3 + une cote par pick), on lit une seule fois
+les faits de l'unité (top3, favori : bets/facts.py) et les cotes utiles, on score tous les Bets en mémoire,
+puis on écrit tous les BetScore modifiés en un seul upsert.
+Les deltas de score sont ensuite répercutés sur les classements matérialisés,
+et les deltas d'issue (BetScore.outcome) sur les stats joueurs (stats/services.py).
+"""
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from stats.services import apply_stat_changes
+from .facts import get_unit_facts
+from .models import Bet, BetScore, bet_outcome, score_picks, unit_odds_by_rider
+from .standings import apply_score_changes, to_score
+
+PICK_FIELDS = ("pick1_id", "pick2_id", "pick3_id", "pick4_id", "pick5_id")
+
+UPSERT_BATCH_SIZE = 2000
+
+
+def _upsert_scores(rows) -> None:
+    BetScore.objects.bulk_create(
+        rows,
+        batch_size=UPSERT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["bet"],
+        update_fields=["score", "outcome", "computed_at", "one_day_race", "stage"],
+    )
+
+
+def score_unit(one_day_race=None, stage=None, bets: Optional[Iterable[Bet]] = None, facts=None) -> int:
+    """
+    (Re)calcule les BetScore d'une unité.
+
+    - bets=None : tous les Bets de l'unité (lus en une requête, sans instancier de modèles)
+    - bets=[...] : seulement ces Bets (ex: le prono qu'on vient d'enregistrer)
+
+    facts : UnitFacts déjà à jour (sinon lus en base).
+
+    Seuls les scores qui changent sont réécrits. Retourne le nombre de BetScore écrits.
+    """
+    if facts is None:
+        facts = get_unit_facts(one_day_race=one_day_race, stage=stage)
+    top3 = facts.top3_ids()
+    favourite_id = facts.favourite_id
+
+    # Seules les cotes des coureurs du top3 peuvent rapporter des points
+    odds = unit_odds_by_rider(one_day_race, stage, rider_ids=top3) if len(top3) == 3 else {}
+
+    if bets is None:
+        bet_rows = list(
+            Bet.objects.filter(one_day_race=one_day_race, stage=stage)
+            .values_list("id", "user_id", "submitted_at", *PICK_FIELDS)
+            .iterator(chunk_size=UPSERT_BATCH_SIZE)
+        )
+        old_scores = {
+            bet_id: (score, outcome)
+            for bet_id, score, outcome in BetScore.objects.filter(bet__one_day_race=one_day_race, bet__stage=stage)
+            .values_list("bet_id", "score", "outcome")
+        }
+    else:
+        bet_rows = [(b.id, b.user_id, b.submitted_at, *(getattr(b, f) for f in PICK_FIELDS)) for b in bets]
+        old_scores = {
+            bet_id: (score, outcome)
+            for bet_id, score, outcome in BetScore.objects.filter(bet_id__in=[row[0] for row in bet_rows])
+            .values_list("bet_id", "score", "outcome")
+        }
+
+    rows = []
+    changes = []
+    stat_changes = []
+    for bet_id, user_id, submitted_at, *picks in bet_rows:
+        new = to_score(score_picks(picks, top3, odds))
+        outcome = bet_outcome(picks, top3, favourite_id, submitted_at is not None)
+        old, old_outcome = old_scores.get(bet_id, (None, 0))
+        if old is not None and old == new and old_outcome == outcome:
+            continue
+        rows.append(BetScore(
+            bet_id=bet_id,
+            score=new,
+            outcome=outcome,
+            one_day_race_id=one_day_race.id if one_day_race is not None else None,
+            stage_id=stage.id if stage is not None else None,
+        ))
+        if old is None or old != new:
+            changes.append((user_id, old, new))
+        stat_changes.append((user_id, old, new, old_outcome, outcome))
+
+    if rows:
+        _upsert_scores(rows)
+        apply_score_changes(one_day_race, stage, changes)
+        apply_stat_changes(stat_changes)
+    return len(rows)
@@ -1,27 +1,145 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from races.models import Result
-from .models import Bet, BetScore, compute_score_for_bet
-from badges.services import update_unit_winner_badge, update_tour_badges
-from races.models import Stage
+from accounts.models import Profile
+from badges.models import Badge
+from leagues.models import League, LeagueMember
+from races.models import Entry, OneDayRace, OneDayRaceTranslation, Result, Rider, Stage, StageTranslation, Tour
+from .recompute import mark_unit_dirty
+from .standings import rebuild_tour_category_standings
+from .startlist import bump_rider_startlists, bump_startlists
+from .versions import (
+    FACTS_KEY,
+    PROFILES_KEY,
+    bump_versions,
+    league_version_key,
+    tour_page_version_key,
+    unit_page_version_key,
+)
 
-def _recompute_for_unit(one_day_race, stage):
-    bets = Bet.objects.filter(one_day_race=one_day_race, stage=stage)
-    for bet in bets:
-        score = compute_score_for_bet(bet)
-        BetScore.objects.update_or_create(bet=bet, defaults={"score": score})
-
-    # badges : vainqueur unité
-    update_unit_winner_badge(one_day_race=one_day_race, stage=stage)
-
-    # badges tour si étape
-    if stage is not None:
-        update_tour_badges(stage.tour)
+# Le recalcul (scores + badges) est coalescé par unité : voir bets/recompute.py
 
 @receiver(post_save, sender=Result)
 def recompute_scores_on_result_save(sender, instance: Result, **kwargs):
-    _recompute_for_unit(instance.one_day_race, instance.stage)
+    bump_versions([unit_page_version_key(instance.one_day_race_id, instance.stage_id)])
+    mark_unit_dirty(one_day_race_id=instance.one_day_race_id, stage_id=instance.stage_id)
 
 @receiver(post_delete, sender=Result)
 def recompute_scores_on_result_delete(sender, instance: Result, **kwargs):
-    _recompute_for_unit(instance.one_day_race, instance.stage)
\ No newline at end of file
+    bump_versions([unit_page_version_key(instance.one_day_race_id, instance.stage_id)])
+    mark_unit_dirty(one_day_race_id=instance.one_day_race_id, stage_id=instance.stage_id)
+
+# Engagés / cotes : favori et nb d'engagés (UnitFacts), et les cotes entrent dans le score
+
+@receiver(post_save, sender=Entry)
+@receiver(post_delete, sender=Entry)
+def recompute_facts_on_entry_change(sender, instance: Entry, **kwargs):
+    # version d'abord : hors transaction, le recalcul (on_commit) part tout de suite et relit la startlist
+    bump_startlists([(instance.one_day_race_id, instance.stage_id)])
+    mark_unit_dirty(one_day_race_id=instance.one_day_race_id, stage_id=instance.stage_id)
+
+
+# Liste des engagés en cache (bets/startlist.py) : nom, pays, équipe du coureur
+# (à la suppression d'un coureur, ses Entry supprimées en cascade passent par le signal ci-dessus)
+
+@receiver(post_save, sender=Rider)
+def bump_startlists_on_rider_change(sender, instance: Rider, **kwargs):
+    bump_rider_startlists(instance)
+
+
+# Versions des classements (cache) : profils affichés dans les lignes, membres des ligues
+
+# Champs du profil affichés dans les classements : une inscription, un changement de
+# langue ou de date de naissance ne touchent pas aux pages de classement.
+PROFILE_DISPLAY_FIELDS = ("avatar_choice", "avatar_upload", "country", "featured_badge")
+
+
+def _profile_display(values) -> tuple:
+    return tuple(str(v or "") for v in values)
+
+
+@receiver(pre_save, sender=Profile)
+def detect_profile_display_change(sender, instance: Profile, update_fields=None, **kwargs):
+    instance._display_changed = False
+    if instance.pk is None:
+        return  # nouveau profil : le joueur n'apparaît dans un classement qu'après un score
+    if update_fields is not None and not set(update_fields) & set(PROFILE_DISPLAY_FIELDS):
+        return
+    attnames = [Profile._meta.get_field(name).attname for name in PROFILE_DISPLAY_FIELDS]
+    stored = Profile.objects.filter(pk=instance.pk).values_list(*attnames).first()
+    current = [getattr(instance, attname) for attname in attnames]
+    instance._display_changed = stored is None or _profile_display(stored) != _profile_display(current)
+
+
+@receiver(post_save, sender=Profile)
+def bump_profiles_version(sender, instance: Profile, **kwargs):
+    if getattr(instance, "_display_changed", False):
+        bump_versions([PROFILES_KEY])
+
+
+@receiver(post_save, sender=Badge)
+@receiver(post_delete, sender=Badge)
+def bump_profiles_version_on_badge_change(sender, instance: Badge, **kwargs):
+    # icône du badge affiché par les joueurs
+    bump_versions([PROFILES_KEY])
+
+@receiver(post_save, sender=LeagueMember)
+@receiver(post_delete, sender=LeagueMember)
+def bump_league_version(sender, instance: LeagueMember, **kwargs):
+    bump_versions([league_version_key(instance.league_id)])
+
+@receiver(post_save, sender=League)
+def bump_league_version_on_rename(sender, instance: League, **kwargs):
+    bump_versions([league_version_key(instance.id)])
+
+
+# Pages course / étape / classements (GET conditionnels, bets/conditional.py) :
+# fiche de l'unité (nom, départ, profil, traductions) et du tour (titre des pages)
+
+@receiver(post_save, sender=OneDayRace)
+def bump_one_day_page(sender, instance: OneDayRace, created=False, **kwargs):
+    # nouvelle unité : le nombre d'unités de /stats/ change aussi
+    bump_versions([unit_page_version_key(one_day_race_id=instance.id), *([FACTS_KEY] if created else [])])
+
+@receiver(post_save, sender=Stage)
+def bump_stage_page(sender, instance: Stage, created=False, **kwargs):
+    bump_versions([unit_page_version_key(stage_id=instance.id), *([FACTS_KEY] if created else [])])
+
+@receiver(post_delete, sender=OneDayRace)
+@receiver(post_delete, sender=Stage)
+def bump_facts_on_unit_delete(sender, instance, **kwargs):
+    bump_versions([FACTS_KEY])
+
+
+# Type d'étape : décide du classement spécial où comptent ses scores (bets/standings.py)
+
+@receiver(pre_save, sender=Stage)
+def detect_stage_type_change(sender, instance: Stage, update_fields=None, **kwargs):
+    instance._previous_stage_type = None
+    if instance.pk is None or (update_fields is not None and "stage_type" not in update_fields):
+        return
+    previous = Stage.objects.filter(pk=instance.pk).values_list("stage_type", flat=True).first()
+    if previous is not None and previous != instance.stage_type:
+        instance._previous_stage_type = previous
+
+
+@receiver(post_save, sender=Stage)
+def rebuild_categories_on_stage_type_change(sender, instance: Stage, created=False, **kwargs):
+    previous = getattr(instance, "_previous_stage_type", None)
+    if previous is not None and not created:
+        rebuild_tour_category_standings(instance.tour_id, [previous, instance.stage_type])
+
+@receiver(post_save, sender=OneDayRaceTranslation)
+@receiver(post_delete, sender=OneDayRaceTranslation)
+def bump_one_day_page_on_translation(sender, instance: OneDayRaceTranslation, **kwargs):
+    bump_versions([unit_page_version_key(one_day_race_id=instance.race_id)])
+
+@receiver(post_save, sender=StageTranslation)
+@receiver(post_delete, sender=StageTranslation)
+def bump_stage_page_on_translation(sender, instance: StageTranslation, **kwargs):
+    bump_versions([unit_page_version_key(stage_id=instance.stage_id)])
+
+@receiver(post_save, sender=Tour)
+def bump_tour_pages(sender, instance: Tour, **kwargs):
+    # le nom du tour figure aussi sur les pages de ses étapes
+    stage_ids = Stage.objects.filter(tour=instance).values_list("id", flat=True)
+    bump_versions([tour_page_version_key(instance.id)] + [unit_page_version_key(stage_id=i) for i in stage_ids])
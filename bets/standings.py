@@ -0,0 +1,267 @@
+# bets/standings.py
+"""
+Classements matérialisés.
+
+SeasonStanding (saison) et TourStanding (tour, + classements spéciaux par type d'étape)
+sont mis à jour par delta (nouveau score - ancien score) à chaque fois que les BetScore
+d'une unité changent (voir bets/scoring.py), puis les rangs du classement touché sont
+recalculés en une seule requête (ROW_NUMBER()). Les vues lisent ensuite une tranche déjà classée.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from races.models import Stage
+from .models import Bet, BetScore, SeasonStanding, TourStanding
+from .versions import bump_versions, season_version_key, tour_version_key, unit_version_key
+
+SCORE_QUANT = Decimal("0.0001")
+ZERO = Decimal("0")
+
+IN_CHUNK = 5000
+
+# (user_id, ancien score ou None si pas encore de BetScore, nouveau score)
+ScoreChange = Tuple[int, Optional[Decimal], Decimal]
+
+CATEGORY_ALL = "all"
+
+CATEGORY_RULES = {
+    "sprinteur": ("Classement sprinteur", [Stage.StageType.FLAT]),
+    "grimpeur": ("Classement grimpeur", [Stage.StageType.MOUNTAIN]),
+    "baroudeur": ("Classement baroudeur", [Stage.StageType.HILLY]),
+    "rouleur": ("Classement rouleur (CLM)", [Stage.StageType.TT]),
+}
+
+CATEGORY_BY_STAGE_TYPE = {
+    stage_type: category
+    for category, (_title, stage_types) in CATEGORY_RULES.items()
+    for stage_type in stage_types
+}
+
+
+def to_score(value) -> Decimal:
+    """Score au format stocké en base (DecimalField decimal_places=4)."""
+    return Decimal(str(value)).quantize(SCORE_QUANT)
+
+
+def unit_season_id(one_day_race=None, stage=None):
+    if one_day_race is not None:
+        return one_day_race.season_id
+    return stage.tour.season_id
+
+
+def _chunks(ids: List[int], size: int = IN_CHUNK):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+# -------------------------
+# Générique (SeasonStanding / TourStanding / BetScore)
+# -------------------------
+
+def _rerank(model, scope: Dict, *, total_field: str = "total", via_bet: bool = False) -> None:
+    """
+    Recalcule tous les rangs d'un classement en une passe (tie-break : username).
+    via_bet=True : le joueur est atteint via bet.user (BetScore).
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    user_table = qn(SeasonStanding._meta.get_field("user").related_model._meta.db_table)
+    rank_col = qn("rank")
+    total_col = qn(model._meta.get_field(total_field).column)
+
+    if via_bet:
+        bet_table = qn(Bet._meta.db_table)
+        joins = f"INNER JOIN {bet_table} b ON b.id = s.bet_id INNER JOIN {user_table} u ON u.id = b.user_id"
+    else:
+        joins = f"INNER JOIN {user_table} u ON u.id = s.user_id"
+
+    where = " AND ".join(f"s.{qn(model._meta.get_field(name).column)} = %s" for name in scope)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} SET {rank_col} = ranked.new_rank
+            FROM (
+                SELECT s.id AS id,
+                       ROW_NUMBER() OVER (ORDER BY s.{total_col} DESC, u.username ASC) AS new_rank
+                FROM {table} s
+                {joins}
+                WHERE {where}
+            ) AS ranked
+            WHERE {table}.id = ranked.id AND {table}.{rank_col} <> ranked.new_rank
+            """,
+            list(scope.values()),
+        )
+
+
+def _score_deltas(changes: Iterable[ScoreChange]) -> Dict[int, List]:
+    deltas: Dict[int, List] = {}
+    for user_id, old, new in changes:
+        d = deltas.setdefault(user_id, [ZERO, 0])
+        d[0] += new - (old if old is not None else ZERO)
+        if old is None:
+            d[1] += 1
+    return {user_id: d for user_id, d in deltas.items() if d[0] or d[1]}
+
+
+def _apply_deltas(model, scope: Dict, deltas: Dict[int, List]) -> None:
+    """scope : champs qui identifient le classement, ex {"season_id": 3} ou {"tour_id": 1, "category": "all"}."""
+    existing = {}
+    for ids in _chunks(list(deltas)):
+        existing.update({
+            user_id: (total, played)
+            for user_id, total, played in model.objects.select_for_update()
+            .filter(user_id__in=ids, **scope)
+            .values_list("user_id", "total", "units_played")
+        })
+
+    rows = []
+    for user_id, (d_total, d_played) in deltas.items():
+        total, played = existing.get(user_id, (ZERO, 0))
+        rows.append(model(
+            user_id=user_id,
+            total=total + d_total,
+            units_played=max(played + d_played, 0),
+            **scope,
+        ))
+
+    model.objects.bulk_create(
+        rows,
+        batch_size=IN_CHUNK,
+        update_conflicts=True,
+        unique_fields=["user", *(name.removesuffix("_id") for name in scope)],
+        update_fields=["total", "units_played", "updated_at"],
+    )
+    _rerank(model, scope)
+
+
+def _replace_standings(model, scope: Dict, totals: Dict[int, List]) -> int:
+    model.objects.filter(**scope).delete()
+    model.objects.bulk_create(
+        [
+            model(user_id=user_id, total=total, units_played=played, **scope)
+            for user_id, (total, played) in totals.items()
+        ],
+        batch_size=IN_CHUNK,
+    )
+    _rerank(model, scope)
+    return len(totals)
+
+
+def _aggregate_totals(*querysets) -> Dict[int, List]:
+    totals: Dict[int, List] = {}
+    for qs in querysets:
+        for row in qs.values("bet__user_id").annotate(total=Sum("score"), played=Count("id")):
+            t = totals.setdefault(row["bet__user_id"], [ZERO, 0])
+            t[0] += row["total"] or ZERO
+            t[1] += row["played"]
+    return totals
+
+
+# -------------------------
+# API
+# -------------------------
+
+def rerank_season(season_id: int) -> None:
+    _rerank(SeasonStanding, {"season_id": season_id})
+
+
+def rerank_tour(tour_id: int, category: str = CATEGORY_ALL) -> None:
+    _rerank(TourStanding, {"tour_id": tour_id, "category": category})
+
+
+def rerank_unit(one_day_race=None, stage=None) -> None:
+    """Rang de chaque BetScore dans sa course/étape (classement de l'unité)."""
+    if one_day_race is not None:
+        scope = {"one_day_race_id": one_day_race.id}
+    else:
+        scope = {"stage_id": stage.id}
+    _rerank(BetScore, scope, total_field="score", via_bet=True)
+
+
+def apply_score_changes(one_day_race=None, stage=None, changes: Iterable[ScoreChange] = ()) -> bool:
+    """
+    Applique les deltas de score d'une unité aux classements concernés :
+    unité (rangs), saison, et pour une étape : tour (all) + classement spécial du type d'étape.
+    Retourne True si les classements ont changé.
+    """
+    deltas = _score_deltas(changes)
+    if not deltas:
+        return False
+
+    season_id = unit_season_id(one_day_race, stage)
+    touched = [
+        unit_version_key(one_day_race.id if one_day_race else None, stage.id if stage else None),
+        season_version_key(season_id),
+    ]
+
+    with transaction.atomic():
+        rerank_unit(one_day_race, stage)
+        _apply_deltas(SeasonStanding, {"season_id": season_id}, deltas)
+
+        if stage is not None:
+            _apply_deltas(TourStanding, {"tour_id": stage.tour_id, "category": CATEGORY_ALL}, deltas)
+            touched.append(tour_version_key(stage.tour_id, CATEGORY_ALL))
+            category = CATEGORY_BY_STAGE_TYPE.get(stage.stage_type)
+            if category:
+                _apply_deltas(TourStanding, {"tour_id": stage.tour_id, "category": category}, deltas)
+                touched.append(tour_version_key(stage.tour_id, category))
+
+        bump_versions(touched)
+    return True
+
+
+@transaction.atomic
+def rebuild_season_standings(season) -> int:
+    """Recalcul complet depuis les BetScore (backfill / réparation). Retourne le nb de lignes."""
+    totals = _aggregate_totals(
+        BetScore.objects.filter(bet__one_day_race__season=season),
+        BetScore.objects.filter(bet__stage__tour__season=season),
+    )
+    touched = [season_version_key(season.id)]
+    for race in season.one_day_races.all():
+        rerank_unit(one_day_race=race)
+        touched.append(unit_version_key(one_day_race_id=race.id))
+    bump_versions(touched)
+    return _replace_standings(SeasonStanding, {"season_id": season.id}, totals)
+
+
+@transaction.atomic
+def rebuild_tour_standings(tour) -> int:
+    """Recalcul complet du classement d'un tour + classements spéciaux. Retourne le nb de lignes."""
+    scores = BetScore.objects.filter(bet__stage__tour=tour)
+    touched = [tour_version_key(tour.id, category) for category in (CATEGORY_ALL, *CATEGORY_RULES)]
+    for stage in tour.stages.all():
+        rerank_unit(stage=stage)
+        touched.append(unit_version_key(stage_id=stage.id))
+    bump_versions(touched)
+    n = _replace_standings(TourStanding, {"tour_id": tour.id, "category": CATEGORY_ALL}, _aggregate_totals(scores))
+    return n + _replace_category_standings(tour.id, CATEGORY_RULES)
+
+
+def _replace_category_standings(tour_id: int, categories: Iterable[str]) -> int:
+    scores = BetScore.objects.filter(bet__stage__tour_id=tour_id)
+    n = 0
+    for category in categories:
+        _title, stage_types = CATEGORY_RULES[category]
+        totals = _aggregate_totals(scores.filter(bet__stage__stage_type__in=stage_types))
+        n += _replace_standings(TourStanding, {"tour_id": tour_id, "category": category}, totals)
+    return n
+
+
+@transaction.atomic
+def rebuild_tour_category_standings(tour_id: int, stage_types: Iterable[str]) -> int:
+    """
+    Type d'étape modifié (ex. FLAT -> HILLY) : les scores de l'étape changent de classement
+    spécial. Recalcul des catégories de ces types (ancien et nouveau). Retourne le nb de lignes.
+    """
+    categories = sorted({CATEGORY_BY_STAGE_TYPE[t] for t in stage_types if t in CATEGORY_BY_STAGE_TYPE})
+    if not categories:
+        return 0
+    bump_versions(tour_version_key(tour_id, category) for category in categories)
+    return _replace_category_standings(tour_id, categories)
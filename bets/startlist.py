@@ -0,0 +1,114 @@
+# bets/startlist.py
+"""
+Liste des engagés d'une unité (startlist), commune à tous les joueurs.
+
+Lue par le formulaire de prono, les pages course / étape et le scoring (cotes,
+favori), modifiée seulement quand un admin touche aux engagés ou à un coureur :
+elle est mise en cache par unité, sous forme de tuples compacts, avec une clé qui
+porte la version de l'unité ("startlist:unit:stage:12", bets/versions.py).
+bets/signals.py incrémente cette version à chaque save / delete d'Entry ou de Rider :
+une requête (la version) par lecture, quel que soit le nombre de process.
+
+Backend : alias "leaderboards" (cf. settings).
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from races.models import Entry, Rider
+from .versions import bump_versions, get_versions, unit_version_key
+
+CACHE_ALIAS = "leaderboards"
+
+
+class StartlistEntry(NamedTuple):
+    rider_id: int
+    name: str
+    country: str
+    team: str
+    odds: Decimal
+    flag_url: str
+
+    def __str__(self):
+        return self.name
+
+
+def _cache():
+    return caches[CACHE_ALIAS if CACHE_ALIAS in settings.CACHES else "default"]
+
+
+def startlist_version_key(one_day_race_id=None, stage_id=None) -> str:
+    return f"startlist:{unit_version_key(one_day_race_id, stage_id)}"
+
+
+def _build(one_day_race_id, stage_id) -> List[StartlistEntry]:
+    entries = (
+        Entry.objects.filter(one_day_race_id=one_day_race_id, stage_id=stage_id)
+        .select_related("rider")
+        .only("odds", "rider__id", "rider__first_name", "rider__last_name", "rider__country", "rider__team")
+        .order_by("-odds", "rider__last_name")
+    )
+    return [
+        StartlistEntry(e.rider_id, str(e.rider), e.rider.country, e.rider.team, e.odds, e.rider.flag_url)
+        for e in entries
+    ]
+
+
+def startlist_version(one_day_race=None, stage=None) -> int:
+    """Version courante de la startlist de l'unité (une requête) : sert aussi d'ETag (bets/api.py)."""
+    one_day_race_id = getattr(one_day_race, "id", one_day_race)
+    stage_id = getattr(stage, "id", stage)
+    (version,) = get_versions([startlist_version_key(one_day_race_id, stage_id)])
+    return version
+
+
+def unit_startlist(one_day_race=None, stage=None, version: Optional[int] = None) -> List[StartlistEntry]:
+    """
+    Engagés de l'unité, favoris (cote max) en haut : la version en base, puis le cache.
+    `version` : déjà lue par l'appelant (startlist_version), pas de seconde requête.
+    """
+    one_day_race_id = getattr(one_day_race, "id", one_day_race)
+    stage_id = getattr(stage, "id", stage)
+    version_key = startlist_version_key(one_day_race_id, stage_id)
+    if version is None:
+        (version,) = get_versions([version_key])
+
+    cache = _cache()
+    key = f"{version_key}:{version}"
+    startlist = cache.get(key)
+    if startlist is None:
+        startlist = _build(one_day_race_id, stage_id)
+        cache.set(key, startlist)
+    return startlist
+
+
+def startlist_choices(one_day_race=None, stage=None) -> List[Tuple[int, str]]:
+    """(rider_id, libellé) pour les listes déroulantes du formulaire de prono."""
+    return [(e.rider_id, e.name) for e in unit_startlist(one_day_race, stage)]
+
+
+def entry_rider_ids(one_day_race=None, stage=None) -> FrozenSet[int]:
+    return frozenset(e.rider_id for e in unit_startlist(one_day_race, stage))
+
+
+def startlist_odds(one_day_race=None, stage=None, rider_ids: Optional[Iterable[int]] = None) -> Dict[int, float]:
+    """Cotes {rider_id: odds}, éventuellement restreintes à quelques coureurs."""
+    wanted = set(rider_ids) if rider_ids is not None else None
+    return {
+        e.rider_id: float(e.odds)
+        for e in unit_startlist(one_day_race, stage)
+        if wanted is None or e.rider_id in wanted
+    }
+
+
+def bump_startlists(units: Iterable[Tuple[Optional[int], Optional[int]]]) -> None:
+    """units : [(one_day_race_id, stage_id), ...] dont les engagés ont changé."""
+    bump_versions(startlist_version_key(one_day_race_id, stage_id) for one_day_race_id, stage_id in units)
+
+
+def bump_rider_startlists(rider: Rider) -> None:
+    bump_startlists(Entry.objects.filter(rider=rider).values_list("one_day_race_id", "stage_id"))
@@ -0,0 +1,75 @@
+# bets/submission.py
+"""
+Enregistrement d'un prono validé (vues HTML, API JSON bets/api.py).
+
+Budget : 4 requêtes au plus par POST, lecture de l'unité comprise —
+- unité + ses faits (UnitFacts) : une requête (select_related("facts"))
+- engagés : startlist en cache (bets/startlist.py) : une requête pour sa version,
+  une de plus seulement si elle a changé depuis le dernier prono
+- prono : un seul upsert sur (joueur, unité), sans get_or_create préalable
+- score : seulement si l'unité a déjà des résultats (sinon le score serait 0 de toute façon)
+- badges (premier prono, saison) : hors requête, par `award_badges --bets` / run_scheduler
+  (badges/services.py, award_bet_badges_since_watermark)
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
+
+from .models import Bet
+from .scoring import score_unit
+
+PICK_IDS = ["pick1_id", "pick2_id", "pick3_id", "pick4_id", "pick5_id"]
+
+
+def unit_has_results(unit) -> bool:
+    """
+    Depuis unit.facts (déjà chargé). Pas encore de faits = recalcul de l'unité en attente
+    (DirtyUnit) : c'est lui qui scorera tous ses pronos, celui-ci compris.
+    """
+    try:
+        return unit.facts.result_count > 0
+    except ObjectDoesNotExist:
+        return False
+
+
+def unit_locked(unit, at=None, captured_at=None) -> bool:
+    """
+    Pronos verrouillés dès le départ de l'unité.
+
+    `captured_at` : heure de saisie côté client (prono mis en file hors ligne par la PWA,
+    envoyé par Background Sync au retour du réseau). Un prono saisi avant le départ est
+    accepté s'il arrive moins de BET_CAPTURE_TOLERANCE_SECONDS après ; une heure de saisie
+    dans le futur est ignorée (horloge du client en avance).
+    """
+    now = at or timezone.now()
+    if captured_at is None or captured_at > now:
+        return now >= unit.start_datetime
+    tolerance = timedelta(seconds=settings.BET_CAPTURE_TOLERANCE_SECONDS)
+    return captured_at >= unit.start_datetime or now >= unit.start_datetime + tolerance
+
+
+def submit_bet(user, picks: List[int], one_day_race=None, stage=None, idempotency_key: str = "") -> Bet:
+    """Crée ou remplace le prono du joueur sur l'unité (upsert), horodaté maintenant."""
+    bet = Bet(
+        user=user,
+        one_day_race=one_day_race,
+        stage=stage,
+        submitted_at=timezone.now(),
+        idempotency_key=idempotency_key,
+        **dict(zip(PICK_IDS, picks)),
+    )
+    Bet.objects.bulk_create(
+        [bet],
+        update_conflicts=True,
+        unique_fields=["user", "one_day_race" if one_day_race is not None else "stage"],
+        update_fields=["pick1", "pick2", "pick3", "pick4", "pick5", "submitted_at", "idempotency_key", "updated_at"],
+    )
+
+    if unit_has_results(one_day_race or stage):
+        score_unit(one_day_race=one_day_race, stage=stage, bets=[bet])
+    return bet
@@ -1,3 +1,421 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import NotificationPreference, OutboundMessage
+from badges.models import Badge, UserBadge
+from badges.services import award_bet_badges_since_watermark
+from pushes.models import PushSubscription
+from races.models import Entry, OneDayRace, Rider, Season, Stage, Tour
+
+from . import recompute
+from .fanout import notify_unit_results
+from .leaderboard_cache import BOTTOM_ROWS, TOP_ROWS, _cache, cache_key
+from .models import Bet, BetScore, DirtyUnit, SeasonStanding, TourStanding, UnitFacts
+from .ranking import leaderboard_page, leaderboard_window, season_scope
+from .standings import apply_score_changes, rebuild_season_standings, rebuild_tour_standings, to_score
+from .startlist import bump_startlists
+from .views import bet_for_one_day_view
+
+# Budget de requêtes d'un POST de prono (bets/submission.py), lecture de l'unité comprise
+BET_POST_QUERY_BUDGET = 4
+
+
+class BetSubmissionQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        season = Season.objects.create(year=now.year)
+        cls.race = OneDayRace.objects.create(season=season, name="Test", start_datetime=now + timedelta(days=1))
+        cls.riders = [Rider.objects.create(first_name="R", last_name=f"{i}") for i in range(8)]
+        for i, rider in enumerate(cls.riders):
+            Entry.objects.create(one_day_race=cls.race, rider=rider, odds=10 - i)
+        cls.user = get_user_model().objects.create_user(username="joueur", email="joueur@example.com", password="pw")
+        Badge.objects.create(code="FIRST_BET", name="Premier prono")
+
+    def setUp(self):
+        bump_startlists([(self.race.id, None)])
+
+    def _post(self, riders):
+        data = {f"pick{i + 1}": str(rider.id) for i, rider in enumerate(riders)}
+        request = RequestFactory().post(f"/bet/one-day/{self.race.id}/", data)
+        request.user = self.user
+        request._messages = CookieStorage(request)
+        with CaptureQueriesContext(connection) as ctx:
+            response = bet_for_one_day_view(request, race_id=self.race.id)
+        return response, len(ctx.captured_queries)
+
+    def test_post_stays_within_query_budget(self):
+        # premier prono de l'unité : liste des engagés pas encore en cache
+        response, queries = self._post(self.riders[:5])
+        self.assertEqual(response.status_code, 302)
+        self.assertLessEqual(queries, BET_POST_QUERY_BUDGET)
+
+        # modification du prono : même budget, cache chaud
+        response, queries = self._post(self.riders[3:8])
+        self.assertEqual(response.status_code, 302)
+        self.assertLessEqual(queries, BET_POST_QUERY_BUDGET)
+
+        bet = Bet.objects.get(user=self.user, one_day_race=self.race)
+        self.assertEqual(
+            [bet.pick1_id, bet.pick2_id, bet.pick3_id, bet.pick4_id, bet.pick5_id],
+            [rider.id for rider in self.riders[3:8]],
+        )
+        self.assertIsNotNone(bet.submitted_at)
+        # pas de résultats : pas de score calculé pendant la requête
+        self.assertFalse(BetScore.objects.filter(bet=bet).exists())
+
+    def test_rejects_rider_not_entered(self):
+        outsider = Rider.objects.create(first_name="Hors", last_name="Liste")
+        response, queries = self._post(self.riders[:4] + [outsider])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Bet.objects.filter(user=self.user).exists())
+
+    @override_settings(BET_BADGES_WATERMARK_LAG_SECONDS=0)
+    def test_submitted_bet_counts_as_played(self):
+        # pas de résultats : pas de BetScore, le prono compte quand même dans /stats/
+        # (snapshot recompté par le passage des badges de prono)
+        self._post(self.riders[:5])
+        award_bet_badges_since_watermark()
+        self.client.force_login(self.user)
+        response = self.client.get("/stats/", secure=True)
+        self.assertEqual(response.context["played_total"], 1)
+
+    @override_settings(BET_BADGES_WATERMARK_LAG_SECONDS=0)
+    def test_badges_are_awarded_off_request(self):
+        self._post(self.riders[:5])
+        self.assertFalse(UserBadge.objects.filter(user=self.user).exists())
+
+        award_bet_badges_since_watermark()
+        self.assertTrue(UserBadge.objects.filter(user=self.user, badge__code="FIRST_BET").exists())
+
+    @override_settings(BET_BADGES_WATERMARK_LAG_SECONDS=60)
+    def test_badge_watermark_lags_behind_recent_bets(self):
+        # prono horodaté avant le commit : pas encore lu, le curseur ne passe pas devant
+        self._post(self.riders[:5])
+        self.assertEqual(award_bet_badges_since_watermark(), (0, 0))
+
+        Bet.objects.filter(user=self.user).update(updated_at=timezone.now() - timedelta(minutes=2))
+        processed, _created = award_bet_badges_since_watermark()
+        self.assertEqual(processed, 1)
+        self.assertTrue(UserBadge.objects.filter(user=self.user, badge__code="FIRST_BET").exists())
+
+
+class BetApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        season = Season.objects.create(year=now.year)
+        cls.race = OneDayRace.objects.create(season=season, name="Test", start_datetime=now + timedelta(days=1))
+        cls.riders = [Rider.objects.create(first_name="R", last_name=f"{i}") for i in range(8)]
+        for i, rider in enumerate(cls.riders):
+            Entry.objects.create(one_day_race=cls.race, rider=rider, odds=10 - i)
+        cls.user = get_user_model().objects.create_user(username="joueur", email="joueur@example.com", password="pw")
+
+    def setUp(self):
+        bump_startlists([(self.race.id, None)])
+        self.client.force_login(self.user)
+        self.url = f"/api/bets/one-day/{self.race.id}/"
+
+    def _post(self, riders, key=None, **extra):
+        body = {"picks": [rider.id for rider in riders], **extra}
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post(self.url, json.dumps(body), content_type="application/json", secure=True, **headers)
+
+    def _picks(self):
+        bet = Bet.objects.get(user=self.user, one_day_race=self.race)
+        return [bet.pick1_id, bet.pick2_id, bet.pick3_id, bet.pick4_id, bet.pick5_id]
+
+    def test_create_then_update(self):
+        response = self._post(self.riders[:5])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["bet"]["picks"], [r.id for r in self.riders[:5]])
+
+        response = self._post(self.riders[3:8])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["replayed"])
+        self.assertEqual(self._picks(), [r.id for r in self.riders[3:8]])
+
+    def test_idempotency_key_replay_does_not_rewrite(self):
+        self.assertEqual(self._post(self.riders[:5], key="k1").status_code, 201)
+
+        # même clé, autre contenu (retry de la PWA) : état enregistré renvoyé tel quel
+        response = self._post(self.riders[3:8], key="k1")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["replayed"])
+        self.assertEqual(self._picks(), [r.id for r in self.riders[:5]])
+
+        # rejeu après le départ : toujours l'état enregistré, pas un 409
+        OneDayRace.objects.filter(id=self.race.id).update(start_datetime=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self._post(self.riders[:5], key="k1").status_code, 200)
+
+    def test_invalid_payloads(self):
+        self.assertEqual(self._post(self.riders[:4]).status_code, 400)
+        self.assertEqual(self._post(self.riders[:4] + self.riders[:1]).status_code, 400)
+        self.assertEqual(self._post(self.riders[:5], key="x" * 65).status_code, 400)
+        self.assertEqual(self._post(self.riders[:5], captured_at="hier").status_code, 400)
+        response = self.client.post(self.url, "{", content_type="application/json", secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Bet.objects.filter(user=self.user).exists())
+
+    @override_settings(BET_CAPTURE_TOLERANCE_SECONDS=300)
+    def test_lock_uses_capture_time_within_tolerance(self):
+        now = timezone.now()
+        OneDayRace.objects.filter(id=self.race.id).update(start_datetime=now - timedelta(minutes=1))
+        self.assertEqual(self._post(self.riders[:5]).status_code, 409)
+
+        captured = (now - timedelta(minutes=2)).isoformat()
+        self.assertEqual(self._post(self.riders[:5], captured_at=captured).status_code, 201)
+
+        # arrivé après la tolérance : refusé malgré une saisie avant le départ
+        Bet.objects.filter(user=self.user).delete()
+        OneDayRace.objects.filter(id=self.race.id).update(start_datetime=now - timedelta(minutes=10))
+        captured = (now - timedelta(minutes=15)).isoformat()
+        self.assertEqual(self._post(self.riders[3:8], captured_at=captured).status_code, 409)
+
+    def test_stale_queued_replay_does_not_overwrite_newer_bet(self):
+        captured = (timezone.now() - timedelta(minutes=1)).isoformat()
+        self.assertEqual(self._post(self.riders[3:8]).status_code, 201)
+
+        # prono mis en file avant celui enregistré, rejoué ensuite avec une autre clé
+        response = self._post(self.riders[:5], key="queued", captured_at=captured)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["replayed"])
+        self.assertEqual(self._picks(), [r.id for r in self.riders[3:8]])
+
+    def test_anonymous_gets_json_401(self):
+        self.client.logout()
+        response = self._post(self.riders[:5])
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["error"], "authentication required")
+        response = self.client.get(f"/api/startlists/one-day/{self.race.id}/", secure=True)
+        self.assertEqual(response.status_code, 401)
+
+    def test_unknown_kind_is_404(self):
+        response = self.client.post(f"/api/bets/tour/{self.race.id}/", "{}", content_type="application/json", secure=True)
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SCORES_RECOMPUTE_MODE="on_commit")
+class OnCommitRecomputeTests(TestCase):
+    def test_one_recompute_per_unit_and_transaction(self):
+        with mock.patch.object(recompute, "recompute_unit_by_key") as run:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    recompute.mark_unit_dirty(stage_id=1)
+                    recompute.mark_unit_dirty(stage_id=1)
+                    recompute.mark_unit_dirty(one_day_race_id=2)
+
+        self.assertEqual(sorted(c.args for c in run.call_args_list), [("one_day", 2), ("stage", 1)])
+        self.assertFalse(DirtyUnit.objects.exists())
+
+    def test_rolled_back_mark_does_not_swallow_the_next_one(self):
+        with mock.patch.object(recompute, "recompute_unit_by_key") as run:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        recompute.mark_unit_dirty(stage_id=1)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                with transaction.atomic():
+                    recompute.mark_unit_dirty(stage_id=1)
+
+        self.assertEqual([c.args for c in run.call_args_list], [("stage", 1)])
+
+    def test_recompute_error_after_commit_is_left_to_the_worker(self):
+        with mock.patch.object(recompute, "recompute_unit_by_key", side_effect=ValueError("boum")):
+            with self.assertLogs("bets.recompute", "ERROR"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    recompute.mark_unit_dirty(stage_id=1)
+
+        self.assertTrue(DirtyUnit.objects.filter(unit_kind="stage", unit_id=1).exists())
+
+
+class LeaderboardCacheTests(TestCase):
+    PLAYERS = TOP_ROWS + BOTTOM_ROWS + 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.season = Season.objects.create(year=2030)
+        User = get_user_model()
+        cls.users = User.objects.bulk_create(
+            [User(username=f"j{i:04d}", email=f"j{i}@example.com") for i in range(cls.PLAYERS)]
+        )
+        SeasonStanding.objects.bulk_create([
+            SeasonStanding(season=cls.season, user=user, total=cls.PLAYERS - i, rank=i + 1)
+            for i, user in enumerate(cls.users)
+        ])
+
+    def setUp(self):
+        _cache().clear()
+        self.scope = season_scope(self.season)
+
+    def test_cache_holds_only_the_edges(self):
+        leaderboard_window(self.scope, None)
+
+        cached = _cache().get(cache_key(self.scope))
+        self.assertEqual(cached["count"], self.PLAYERS)
+        self.assertEqual([r["rank"] for r in cached["top"]], list(range(1, TOP_ROWS + 1)))
+        self.assertEqual(
+            [r["rank"] for r in cached["bottom"]],
+            list(range(self.PLAYERS - BOTTOM_ROWS + 1, self.PLAYERS + 1)),
+        )
+
+    def test_window_around_a_visitor_outside_the_cached_edges(self):
+        me = self.users[TOP_ROWS + 10]  # rang TOP_ROWS + 11
+        leaderboard_window(self.scope, None)
+
+        # versions, rang du visiteur, ses voisins, profils
+        with self.assertNumQueries(4):
+            podium, rows = leaderboard_window(self.scope, me.id)
+
+        ranks = [r["rank"] for r in rows if not r.get("ellipsis")]
+        self.assertEqual([r["rank"] for r in podium], [1, 2, 3])
+        self.assertIn(TOP_ROWS + 11, ranks)
+        self.assertEqual([r["user_id"] for r in rows if r.get("is_me")], [me.id])
+
+    def test_page_past_the_cached_top(self):
+        page = leaderboard_page(self.scope, None, start=TOP_ROWS + 1, limit=20)
+
+        self.assertEqual(page["count"], self.PLAYERS)
+        self.assertEqual([r["rank"] for r in page["rows"]], list(range(TOP_ROWS + 1, TOP_ROWS + 21)))
+        self.assertEqual(page["next_start"], TOP_ROWS + 21)
+
+
+class StandingsDeltaTests(TestCase):
+    """Le chemin par delta (apply_score_changes) donne les mêmes classements qu'un recalcul complet."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.season = Season.objects.create(year=2031)
+        cls.races = [
+            OneDayRace.objects.create(season=cls.season, name=f"Course {i}", start_datetime=now) for i in range(2)
+        ]
+        cls.tour = Tour.objects.create(season=cls.season, name="Tour", start_datetime=now)
+        cls.stages = [
+            Stage.objects.create(tour=cls.tour, number=i + 1, name=f"Étape {i + 1}", start_datetime=now, stage_type=t)
+            for i, t in enumerate([Stage.StageType.FLAT, Stage.StageType.HILLY, Stage.StageType.FLAT])
+        ]
+        User = get_user_model()
+        cls.users = [User.objects.create(username=f"j{i}", email=f"j{i}@example.com") for i in range(5)]
+
+    def _score(self, user, score, one_day_race=None, stage=None):
+        """Comme bets/scoring.py : écrit le BetScore puis applique le delta aux classements."""
+        bet, _ = Bet.objects.get_or_create(user=user, one_day_race=one_day_race, stage=stage)
+        old = BetScore.objects.filter(bet=bet).values_list("score", flat=True).first()
+        new = to_score(score)
+        BetScore.objects.update_or_create(
+            bet=bet, defaults={"score": new, "one_day_race": one_day_race, "stage": stage},
+        )
+        apply_score_changes(one_day_race=one_day_race, stage=stage, changes=[(user.id, old, new)])
+
+    @staticmethod
+    def _snapshot(qs, *scope_fields):
+        return sorted(qs.values_list(*scope_fields, "user_id", "total", "rank", "units_played"))
+
+    def test_season_deltas_match_a_full_rebuild(self):
+        for i, user in enumerate(self.users):
+            self._score(user, 10 - i, one_day_race=self.races[0])
+            self._score(user, i * 2, stage=self.stages[0])
+        # correction de résultats : scores revus à la hausse et à la baisse, ex aequo compris
+        self._score(self.users[4], 12, one_day_race=self.races[0])
+        self._score(self.users[0], 0, one_day_race=self.races[0])
+        self._score(self.users[2], 3, one_day_race=self.races[1])
+
+        standings = SeasonStanding.objects.filter(season=self.season)
+        by_delta = self._snapshot(standings, "season_id")
+        self.assertEqual(len(by_delta), len(self.users))
+        rebuild_season_standings(self.season)
+        self.assertEqual(by_delta, self._snapshot(standings, "season_id"))
+
+    def _assert_tour_matches_rebuild(self):
+        standings = TourStanding.objects.filter(tour=self.tour)
+        by_delta = self._snapshot(standings, "category")
+        rebuild_tour_standings(self.tour)
+        self.assertEqual(by_delta, self._snapshot(standings, "category"))
+        return by_delta
+
+    def test_tour_and_category_deltas_match_a_full_rebuild(self):
+        for i, user in enumerate(self.users):
+            for j, stage in enumerate(self.stages):
+                self._score(user, (i + j) % 4 * 2, stage=stage)
+        self._score(self.users[1], 9, stage=self.stages[1])
+
+        by_delta = self._assert_tour_matches_rebuild()
+        self.assertEqual({row[0] for row in by_delta}, {"all", "sprinteur", "baroudeur"})
+
+    def test_stage_type_change_then_deltas_match_a_full_rebuild(self):
+        for i, user in enumerate(self.users):
+            for stage in self.stages:
+                self._score(user, i + stage.number, stage=stage)
+
+        # FLAT -> MOUNTAIN : les scores de l'étape passent de sprinteur à grimpeur (signal Stage)
+        stage = self.stages[0]
+        stage.stage_type = Stage.StageType.MOUNTAIN
+        stage.save()
+        self._assert_tour_matches_rebuild()
+
+        # scores revus ensuite : le delta va dans la nouvelle catégorie
+        self._score(self.users[0], 20, stage=Stage.objects.get(id=stage.id))
+        by_delta = self._assert_tour_matches_rebuild()
+        self.assertIn("grimpeur", {row[0] for row in by_delta})
+
+
+class ResultFanoutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        season = Season.objects.create(year=now.year)
+        cls.race = OneDayRace.objects.create(season=season, name="Test", start_datetime=now - timedelta(days=1))
+        User = get_user_model()
+        cls.mail_only = User.objects.create_user(username="mail", email="mail@example.com", password="pw")
+        cls.push_no_email = User.objects.create_user(username="push", email="", password="pw")
+        cls.push_opted_out = User.objects.create_user(username="optout", email="optout@example.com", password="pw")
+        cls.unreachable = User.objects.create_user(username="muet", email="muet@example.com", password="pw")
+        NotificationPreference.objects.filter(user__in=[cls.push_opted_out, cls.unreachable]).update(email_results=False)
+        for rank, user in enumerate([cls.mail_only, cls.push_no_email, cls.push_opted_out, cls.unreachable], 1):
+            bet = Bet.objects.create(user=user, one_day_race=cls.race, submitted_at=now - timedelta(days=2))
+            BetScore.objects.create(bet=bet, one_day_race=cls.race, score=10 - rank, rank=rank)
+        for user in (cls.push_no_email, cls.push_opted_out):
+            PushSubscription.objects.create(
+                user=user, endpoint=f"https://push.example.com/{user.username}", p256dh="k", auth="a",
+            )
+        UnitFacts.objects.create(one_day_race=cls.race, finished=True)
+
+    def _queued(self):
+        return set(OutboundMessage.objects.values_list("user__username", "channel"))
+
+    def test_push_does_not_depend_on_email(self):
+        self.assertEqual(notify_unit_results(one_day_race=self.race), 3)
+        self.assertEqual(self._queued(), {
+            ("mail", OutboundMessage.CHANNEL_EMAIL),
+            ("push", OutboundMessage.CHANNEL_PUSH),
+            ("optout", OutboundMessage.CHANNEL_PUSH),
+        })
+
+    def test_results_are_notified_once(self):
+        notify_unit_results(one_day_race=self.race)
+        notified_at = UnitFacts.objects.get(one_day_race=self.race).results_notified_at
+        self.assertIsNotNone(notified_at)
+
+        # résultats corrigés, ou second worker sur la même unité : le verrou est déjà pris
+        with self.assertNumQueries(1):
+            self.assertEqual(notify_unit_results(one_day_race=self.race), 0)
+        self.assertEqual(OutboundMessage.objects.count(), 3)
+        self.assertEqual(UnitFacts.objects.get(one_day_race=self.race).results_notified_at, notified_at)
+
+    def test_unfinished_unit_is_not_claimed(self):
+        UnitFacts.objects.filter(one_day_race=self.race).update(finished=False)
+
+        self.assertEqual(notify_unit_results(one_day_race=self.race), 0)
+        self.assertIsNone(UnitFacts.objects.get(one_day_race=self.race).results_notified_at)
+        self.assertFalse(OutboundMessage.objects.exists())
@@ -1,5 +1,6 @@
 from django.urls import path
 from .views import bet_for_one_day_view, bet_for_stage_view
+from .api import bet_api, startlist_api, upcoming_startlists_api
 from .leaderboards import (
     global_leaderboard,
     unit_leaderboard_one_day,
@@ -8,12 +9,24 @@ from .leaderboards import (
 )
 from .leaderboards import tour_special_leaderboard
 from .leaderboards import leaderboards_hub
+from .leaderboards import (
+    global_leaderboard_api,
+    unit_leaderboard_one_day_api,
+    unit_leaderboard_stage_api,
+    tour_leaderboard_api,
+    tour_special_leaderboard_api,
+)
 
 urlpatterns = [
     # Bets
     path("bet/one-day/<int:race_id>/", bet_for_one_day_view, name="bet_one_day"),
     path("bet/stage/<int:stage_id>/", bet_for_stage_view, name="bet_stage"),
 
+    # Bets — API JSON (PWA) : kind = one-day | stage
+    path("api/bets/<str:kind>/<int:unit_id>/", bet_api, name="api_bet"),
+    path("api/startlists/upcoming/", upcoming_startlists_api, name="api_startlists_upcoming"),
+    path("api/startlists/<str:kind>/<int:unit_id>/", startlist_api, name="api_startlist"),
+
     # Leaderboards
     path("leaderboards/global/<int:season_year>/", global_leaderboard, name="lb_global"),
     path("leaderboards/one-day/<int:race_id>/", unit_leaderboard_one_day, name="lb_one_day"),
@@ -21,5 +34,12 @@ urlpatterns = [
     path("leaderboards/tour/<int:tour_id>/", tour_leaderboard, name="lb_tour"),
     path("leaderboards/tour/<int:tour_id>/<str:category>/", tour_special_leaderboard, name="lb_tour_special"),
     path("leaderboards/", leaderboards_hub, name="leaderboards_hub"),
+
+    # Leaderboards — API JSON paginée (scroll infini)
+    path("api/leaderboards/global/<int:season_year>/", global_leaderboard_api, name="api_lb_global"),
+    path("api/leaderboards/one-day/<int:race_id>/", unit_leaderboard_one_day_api, name="api_lb_one_day"),
+    path("api/leaderboards/stage/<int:stage_id>/", unit_leaderboard_stage_api, name="api_lb_stage"),
+    path("api/leaderboards/tour/<int:tour_id>/", tour_leaderboard_api, name="api_lb_tour"),
+    path("api/leaderboards/tour/<int:tour_id>/<str:category>/", tour_special_leaderboard_api, name="api_lb_tour_special"),
 ]
 
@@ -0,0 +1,71 @@
+# bets/versions.py
+"""
+Versions des classements.
+
+Chaque classement a une clé ("season:3", "unit:stage:12", "tour:1:grimpeur", "league:5")
+dont la version est incrémentée dans la même transaction que les écritures qui le modifient.
+Un cache indexé par (clé, version) n'a donc besoin d'aucun TTL pour rester juste :
+une nouvelle version = une nouvelle entrée, l'ancienne expire d'elle-même.
+"""
+from __future__ import annotations
+
+from typing import Iterable, Tuple
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ScopeVersion
+
+# profils (avatar, drapeau, badge affiché) : affichés dans les lignes de classement.
+# Pas dans la clé du cache des classements (profils lus pour les seules lignes affichées),
+# seulement dans l'ETag des pages (bets/conditional.py) ; incrémentée uniquement quand un
+# champ affiché change (bets/signals.py).
+PROFILES_KEY = "profiles"
+
+# faits des unités (UnitFacts) et nombre d'unités : chiffres communs de /stats/, mis en
+# cache par version (stats/services.py) ; incrémentée à chaque recalcul des faits
+# (bets/facts.py) et à la création / suppression d'une unité (bets/signals.py).
+FACTS_KEY = "facts"
+
+
+def season_version_key(season_id) -> str:
+    return f"season:{season_id}"
+
+
+def unit_version_key(one_day_race_id=None, stage_id=None) -> str:
+    if one_day_race_id:
+        return f"unit:one_day:{one_day_race_id}"
+    return f"unit:stage:{stage_id}"
+
+
+def unit_page_version_key(one_day_race_id=None, stage_id=None) -> str:
+    """Page course / étape hors classement : fiche de l'unité (nom, horaires, profil) et résultats."""
+    return f"page:{unit_version_key(one_day_race_id, stage_id)}"
+
+
+def tour_page_version_key(tour_id) -> str:
+    return f"page:tour:{tour_id}"
+
+
+def tour_version_key(tour_id, category: str) -> str:
+    return f"tour:{tour_id}:{category}"
+
+
+def league_version_key(league_id) -> str:
+    return f"league:{league_id}"
+
+
+def get_versions(keys: Iterable[str]) -> Tuple[int, ...]:
+    """Versions des clés (0 si jamais incrémentée), dans l'ordre demandé. Une requête."""
+    keys = list(keys)
+    found = dict(ScopeVersion.objects.filter(key__in=keys).values_list("key", "version"))
+    return tuple(found.get(k, 0) for k in keys)
+
+
+def bump_versions(keys: Iterable[str]) -> None:
+    """Incrémente les versions (crée les clés manquantes). Deux requêtes quel que soit le nombre de clés."""
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    ScopeVersion.objects.bulk_create([ScopeVersion(key=k) for k in keys], ignore_conflicts=True)
+    ScopeVersion.objects.filter(key__in=keys).update(version=F("version") + 1, updated_at=timezone.now())
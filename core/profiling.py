@@ -0,0 +1,55 @@
+# core/profiling.py
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+
+from django.db import connections
+
+
+class QueryStats:
+    def __init__(self):
+        self.queries = 0
+        self.elapsed = 0.0
+
+    @property
+    def elapsed_ms(self) -> float:
+        return self.elapsed * 1000
+
+
+@contextmanager
+def count_queries(using: str = "default"):
+    """
+    Compte les requêtes SQL et le temps écoulé (fonctionne aussi avec DEBUG=False).
+
+        with count_queries() as stats:
+            ...
+        print(stats.queries, stats.elapsed_ms)
+    """
+    stats = QueryStats()
+
+    def wrapper(execute, sql, params, many, context):
+        stats.queries += 1
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    with connections[using].execute_wrapper(wrapper):
+        try:
+            yield stats
+        finally:
+            stats.elapsed = time.perf_counter() - start
+
+
+@contextmanager
+def isolated_test_db(using: str = "default"):
+    """
+    Crée une base de test jetable (comme `manage.py test`) le temps d'un benchmark,
+    pour ne jamais écrire de fixtures volumineuses dans la vraie base.
+    """
+    connection = connections[using]
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     "badges",
     "pushes",
     "stats",
+    "scheduler",
     "ads",
     "django_countries",
     "core",
@@ -100,6 +101,36 @@ else:
         }
     }
 
+# Cache des classements (bets/leaderboard_cache.py) : clés versionnées par la chaîne
+# résultats -> scores, donc pas de TTL "métier" ; le TIMEOUT ne sert qu'à purger les
+# anciennes versions. "db" nécessite `python manage.py createcachetable`.
+LEADERBOARD_CACHE_BACKEND = os.getenv("LEADERBOARD_CACHE_BACKEND", "locmem")  # locmem | file | db
+LEADERBOARD_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "leaderboards",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("LEADERBOARD_CACHE_DIR", str(BASE_DIR / ".cache" / "leaderboards")),
+    },
+    "db": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "leaderboard_cache",
+    },
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "leaderboards": {
+        **LEADERBOARD_CACHE_BACKENDS[LEADERBOARD_CACHE_BACKEND],
+        "TIMEOUT": 7 * 24 * 3600,
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -151,6 +182,11 @@ VAPID_PUBLIC_KEY = os.getenv("VAPID_PUBLIC_KEY", "")
 VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY", "")
 VAPID_CLAIMS = {"sub": os.getenv("VAPID_SUB", "mailto:contact@coupdebordure.fr")}
 
+# Recalcul des scores quand un Result change (bets/recompute.py) :
+# - "on_commit" : 1 recalcul par unité à la fin de la requête admin
+# - "deferred"  : uniquement via `manage.py recompute_dirty_units --loop`
+SCORES_RECOMPUTE_MODE = os.getenv("SCORES_RECOMPUTE_MODE", "on_commit")
+
 DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.MediaCloudinaryStorage"
 
 if not DEBUG:
@@ -170,4 +206,49 @@ EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
 DEFAULT_FROM_EMAIL = os.getenv(
     "DEFAULT_FROM_EMAIL",
     "Coup de Bordure <no-reply@coupdebordure.com>"
-)
\ No newline at end of file
+)
+
+# Envois en masse (accounts/mailer.py) : lots sur une connexion SMTP, pool de threads
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "100"))
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", "4"))
+MAIL_RATE_PER_SECOND = float(os.getenv("MAIL_RATE_PER_SECOND", "0"))  # 0 = sans limite
+MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", "3"))
+MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", "2"))
+
+# File d'envoi (accounts/outbox.py, `manage.py run_notification_worker`)
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))  # puis statut "dead"
+OUTBOX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_BACKOFF_SECONDS", "60"))  # x2 à chaque essai
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+
+# Adresse publique du site, pour les liens des emails envoyés hors requête (ex: "https://coupdebordure.fr")
+SITE_URL = os.getenv("SITE_URL", "").rstrip("/")
+
+# Pronos hors ligne (PWA, bets/api.py) : un prono saisi avant le départ et mis en file
+# est encore accepté s'il arrive au plus tard N secondes après ; startlists préchargées
+# par le service worker pour les unités qui partent dans les N prochaines heures
+BET_CAPTURE_TOLERANCE_SECONDS = int(os.getenv("BET_CAPTURE_TOLERANCE_SECONDS", "300"))
+BET_PRECACHE_HOURS = int(os.getenv("BET_PRECACHE_HOURS", "48"))
+
+# GET conditionnels (bets/conditional.py) : change à chaque déploiement (templates modifiés)
+PAGE_ETAG_SALT = os.getenv("PAGE_ETAG_SALT", os.getenv("RAILWAY_DEPLOYMENT_ID", ""))
+
+# Web push (pushes/sender.py)
+PUSH_WORKERS = int(os.getenv("PUSH_WORKERS", "16"))  # requêtes HTTP en parallèle
+PUSH_TIMEOUT = float(os.getenv("PUSH_TIMEOUT", "10"))  # secondes, par endpoint
+PUSH_TTL = int(os.getenv("PUSH_TTL", "0"))
+
+# Planificateur (`manage.py run_scheduler`, scheduler/jobs.py) : intervalles en secondes
+SCHEDULER_INTERVALS = {
+    "send_reminders": int(os.getenv("SCHEDULER_REMINDERS_INTERVAL", "900")),
+    "award_badges": int(os.getenv("SCHEDULER_BADGES_INTERVAL", "60")),
+    "bet_badges": int(os.getenv("SCHEDULER_BET_BADGES_INTERVAL", "60")),
+    "top10_global": int(os.getenv("SCHEDULER_TOP10_INTERVAL", "3600")),
+}
+# badges de prono : pronos plus vieux que N secondes seulement (updated_at posé avant le commit)
+BET_BADGES_WATERMARK_LAG_SECONDS = int(os.getenv("BET_BADGES_WATERMARK_LAG_SECONDS", "30"))
+# badges d'unité : faits plus vieux que N secondes (updated_at posé au début du recalcul)
+UNIT_BADGES_WATERMARK_LAG_SECONDS = int(os.getenv("UNIT_BADGES_WATERMARK_LAG_SECONDS", "300"))
+SCHEDULER_REMINDER_HOURS = int(os.getenv("SCHEDULER_REMINDER_HOURS", "24"))
+SCHEDULER_REMINDER_CHANNEL = os.getenv("SCHEDULER_REMINDER_CHANNEL", "email")  # email | push | both
+SCHEDULER_LOCK_TTL = int(os.getenv("SCHEDULER_LOCK_TTL", "120"))
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import leagues_home, league_create, league_join, league_detail
-from .leaderboards import league_leaderboard_global
+from .leaderboards import league_leaderboard_global, league_leaderboard_global_api
 
 urlpatterns = [
     path("leagues/", leagues_home, name="leagues_home"),
@@ -8,4 +8,5 @@ urlpatterns = [
     path("leagues/join/", league_join, name="league_join"),
     path("leagues/<int:league_id>/", league_detail, name="league_detail"),
     path("leagues/<int:league_id>/leaderboard/<int:season_year>/", league_leaderboard_global, name="league_lb_global"),
+    path("api/leagues/<int:league_id>/leaderboard/<int:season_year>/", league_leaderboard_global_api, name="api_league_lb_global"),
 ]
\ No newline at end of file
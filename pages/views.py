@@ -1,6 +1,7 @@
+from django.contrib.staticfiles import finders
 from django.shortcuts import render
 from django.utils.translation import get_language
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 
 def home_view(request):
     return render(request, "pages/home.html")
@@ -12,6 +13,20 @@ def cgu_view(request):
     lang = (get_language() or "fr")[:2]
     return render(request, f"legal/cgu_{lang}.html")
 
+def service_worker_view(request):
+    """
+    static/pwa/sw.js servi depuis la racine : sa portée est alors "/" (pages, formulaires
+    de prono, API), et non plus /static/pwa/ seulement.
+    """
+    path = finders.find("pwa/sw.js")
+    if not path:
+        raise Http404("sw.js introuvable")
+    with open(path, "rb") as f:
+        response = HttpResponse(f.read(), content_type="application/javascript")
+    # le navigateur revalide le service worker à chaque visite
+    response["Cache-Control"] = "no-cache"
+    return response
+
 def healthz_view(request):
     return HttpResponse("ok", content_type="text/plain")
 
@@ -1,17 +1,126 @@
-from pywebpush import webpush, WebPushException
+# pushes/sender.py
+"""
+Envoi de notifications web push (pywebpush).
+
+- send_push(subscription, payload) : un abonnement, synchrone (ex: manage.py push_test)
+- send_pushes([(clé, subscription, payload), ...]) : envoi concurrent (pool de threads borné,
+  une session HTTP par thread pour réutiliser les connexions vers le service push,
+  timeout par endpoint). Les abonnements expirés (404 / 410) sont supprimés, et
+  last_seen_at des abonnements joignables est mis à jour en masse (UPDATE par lots d'ids).
+- send_push_bulk(subscriptions, payload) : même payload pour tout un queryset
+
+Réglages : PUSH_WORKERS, PUSH_TIMEOUT (secondes), PUSH_TTL (settings.py).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import requests
 from django.conf import settings
+from django.utils import timezone
+from pywebpush import WebPushException, webpush
+
+from .models import PushSubscription
+
+logger = logging.getLogger(__name__)
+
+GONE_STATUSES = (404, 410)  # abonnement expiré / révoqué côté navigateur
+IN_CHUNK = 5000
+
+# (clé de l'appelant, abonnement, payload)
+PushItem = Tuple[Hashable, PushSubscription, Dict]
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def _webpush(subscription, payload: dict, timeout: Optional[float] = None, session=None):
+    return webpush(
+        subscription_info={
+            "endpoint": subscription.endpoint,
+            "keys": {"p256dh": subscription.p256dh, "auth": subscription.auth},
+        },
+        data=json.dumps(payload),
+        vapid_private_key=settings.VAPID_PRIVATE_KEY,
+        # copie : pywebpush complète les claims ("aud", "exp") selon l'endpoint
+        vapid_claims=dict(settings.VAPID_CLAIMS),
+        timeout=timeout,
+        ttl=getattr(settings, "PUSH_TTL", 0),
+        requests_session=session,
+    )
+
 
 def send_push(subscription, payload: dict):
     try:
-        webpush(
-            subscription_info={
-                "endpoint": subscription.endpoint,
-                "keys": {"p256dh": subscription.p256dh, "auth": subscription.auth},
-            },
-            data=json.dumps(payload),
-            vapid_private_key=settings.VAPID_PRIVATE_KEY,
-            vapid_claims=settings.VAPID_CLAIMS,
-        )
+        _webpush(subscription, payload, timeout=getattr(settings, "PUSH_TIMEOUT", 10))
         return True
     except WebPushException:
-        return False
\ No newline at end of file
+        return False
+
+
+@dataclass
+class PushReport:
+    sent: List[Hashable] = field(default_factory=list)    # clés des pushs acceptés
+    failed: List[Hashable] = field(default_factory=list)  # erreurs temporaires (à réessayer)
+    pruned: int = 0                                       # abonnements supprimés (404 / 410)
+
+
+def _deliver(item: PushItem, timeout: float) -> Tuple[Hashable, int, str]:
+    """(clé, id abonnement, "sent" | "gone" | "failed") — exécuté dans un thread du pool."""
+    key, subscription, payload = item
+    try:
+        _webpush(subscription, payload, timeout=timeout, session=_session())
+        return key, subscription.id, "sent"
+    except WebPushException as exc:
+        status = getattr(exc.response, "status_code", None)
+        if status in GONE_STATUSES:
+            return key, subscription.id, "gone"
+        logger.warning("Push refusé (%s) pour l'abonnement %s", status, subscription.id)
+    except requests.RequestException:
+        logger.warning("Push injoignable pour l'abonnement %s", subscription.id, exc_info=True)
+    except Exception:
+        # ex: clés d'abonnement invalides ; ne doit pas interrompre le reste de l'envoi
+        logger.exception("Push impossible pour l'abonnement %s", subscription.id)
+    return key, subscription.id, "failed"
+
+
+def send_pushes(items: Iterable[PushItem], *, workers: Optional[int] = None, timeout: Optional[float] = None) -> PushReport:
+    """Envoie en parallèle (au plus `workers` requêtes HTTP en vol), puis nettoie / date les abonnements."""
+    workers = workers or getattr(settings, "PUSH_WORKERS", 16)
+    timeout = timeout or getattr(settings, "PUSH_TIMEOUT", 10)
+
+    report = PushReport()
+    seen_ids: List[int] = []
+    gone_ids: List[int] = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="push") as pool:
+        for key, subscription_id, status in pool.map(lambda item: _deliver(item, timeout), items):
+            if status == "sent":
+                report.sent.append(key)
+                seen_ids.append(subscription_id)
+            elif status == "gone":
+                gone_ids.append(subscription_id)
+            else:
+                report.failed.append(key)
+
+    now = timezone.now()
+    for i in range(0, len(gone_ids), IN_CHUNK):
+        report.pruned += PushSubscription.objects.filter(id__in=gone_ids[i:i + IN_CHUNK]).delete()[0]
+    for i in range(0, len(seen_ids), IN_CHUNK):
+        PushSubscription.objects.filter(id__in=seen_ids[i:i + IN_CHUNK]).update(last_seen_at=now)
+    return report
+
+
+def send_push_bulk(subscriptions, payload: dict, **kwargs) -> PushReport:
+    """Même payload pour tous les abonnements (queryset ou liste) ; clés = ids d'abonnement."""
+    return send_pushes(((sub.id, sub, payload) for sub in subscriptions), **kwargs)
@@ -1,3 +1,118 @@
-from django.test import TestCase
+import base64
+import os
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import PushSubscription
+from .sender import send_pushes
+
+SLOW_SECONDS = 2.0
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _vapid_private_key() -> str:
+    key = ec.generate_private_key(ec.SECP256R1())
+    return _b64(key.private_numbers().private_value.to_bytes(32, "big"))
+
+
+def _browser_keys():
+    """Clés d'un abonnement navigateur (p256dh, auth), pour que pywebpush chiffre le payload."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    p256dh = key.public_key().public_bytes(Encoding.X962, PublicFormat.UncompressedPoint)
+    return _b64(p256dh), _b64(os.urandom(16))
+
+
+class _StubPushService(BaseHTTPRequestHandler):
+    """Service push local : le statut de la réponse est choisi par le chemin de l'endpoint."""
+
+    statuses = {"/ok": 201, "/gone": 410, "/missing": 404, "/error": 503}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        path = self.path.split("?")[0]
+        self.server.received.append(path)
+        if path == "/slow":
+            time.sleep(SLOW_SECONDS)
+        self.send_response(self.statuses.get(path, 201))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(VAPID_PRIVATE_KEY=_vapid_private_key(), PUSH_TTL=60)
+class SendPushesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubPushService)
+        cls.server.daemon_threads = True
+        cls.server.received = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="joueur", email="joueur@example.com", password="pw")
+
+    def setUp(self):
+        self.server.received.clear()
+
+    def _subscription(self, path):
+        p256dh, auth = _browser_keys()
+        sub = PushSubscription.objects.create(
+            user=self.user, endpoint=f"{self.base_url}{path}?sub={auth}", p256dh=p256dh, auth=auth,
+        )
+        # date ancienne : last_seen_at n'avance que pour les abonnements joignables
+        PushSubscription.objects.filter(id=sub.id).update(last_seen_at=timezone.now() - timedelta(days=30))
+        return sub
+
+    def test_statuses_are_classified(self):
+        subs = {path: self._subscription(path) for path in ("/ok", "/gone", "/missing", "/error", "/slow")}
+        items = [(path, sub, {"title": "Résultat"}) for path, sub in subs.items()]
+
+        with self.assertLogs("pushes.sender", "WARNING"):
+            report = send_pushes(items, workers=4, timeout=SLOW_SECONDS / 4)
+
+        self.assertEqual(report.sent, ["/ok"])
+        # 5xx et timeout : temporaires, à réessayer par l'appelant ; abonnements conservés
+        self.assertEqual(sorted(report.failed), ["/error", "/slow"])
+        self.assertEqual(report.pruned, 2)
+        self.assertEqual(
+            set(PushSubscription.objects.values_list("endpoint", flat=True)),
+            {subs[path].endpoint for path in ("/ok", "/error", "/slow")},
+        )
+        self.assertEqual(sorted(set(self.server.received)), sorted(subs))
+
+    def test_last_seen_at_is_updated_in_bulk_for_delivered_pushes_only(self):
+        delivered = [self._subscription("/ok") for _ in range(3)]
+        failed = self._subscription("/error")
+        before = timezone.now()
+
+        # aucun abonnement expiré : pas de DELETE, un seul UPDATE pour les 3 pushs envoyés
+        with self.assertNumQueries(1), self.assertLogs("pushes.sender", "WARNING"):
+            report = send_pushes([(sub.id, sub, {"title": "Rappel"}) for sub in [*delivered, failed]])
+
+        self.assertEqual(sorted(report.sent), sorted(sub.id for sub in delivered))
+        self.assertEqual(report.failed, [failed.id])
+        seen = dict(PushSubscription.objects.values_list("id", "last_seen_at"))
+        self.assertTrue(all(seen[sub.id] >= before for sub in delivered))
+        self.assertLess(seen[failed.id], before)
@@ -1,10 +1,15 @@
 from django.contrib.auth.decorators import login_required
+from django.db.models import OuterRef, Subquery
+from django.http import Http404
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 from django.utils.translation import get_language
 
-from .models import OneDayRace, Tour, Stage, Entry, Result
+from .models import OneDayRace, Tour, Stage, Result
+from bets.conditional import conditional_page, page_state
 from bets.models import Bet, BetScore
+from bets.startlist import startlist_version_key, unit_startlist
+from bets.versions import unit_page_version_key, unit_version_key
 
 
 def _lang2():
@@ -28,8 +33,47 @@ def races_list_view(request):
     return render(request, "races/races_list.html", {"one_days": one_days, "tours": tours})
 
 
+def _unit_page(request, queryset, bet_filter, build, one_day_race_id=None, stage_id=None):
+    """
+    Page course / étape en GET conditionnel (bets/conditional.py). Versions : fiche et
+    résultats, engagés, scores ; plus le prono du visiteur et le verrou au départ.
+    Une requête pour un client à jour.
+    """
+    state = page_state(
+        queryset,
+        [
+            unit_page_version_key(one_day_race_id, stage_id),
+            startlist_version_key(one_day_race_id, stage_id),
+            unit_version_key(one_day_race_id, stage_id),
+        ],
+        fields=["start_datetime"],
+        bet_updated_at=Subquery(
+            Bet.objects.filter(user_id=request.user.id, **bet_filter).values("updated_at")[:1]
+        ),
+    )
+    if state is None:
+        raise Http404
+    start = state.values["start_datetime"]
+    is_locked = timezone.now() >= start
+    return conditional_page(
+        request, state, build,
+        extra=[is_locked, state.values["bet_updated_at"]],
+        last_modified=start if is_locked else None,
+    )
+
+
 @login_required
 def one_day_detail_view(request, race_id):
+    return _unit_page(
+        request,
+        OneDayRace.objects.filter(id=race_id),
+        {"one_day_race_id": OuterRef("pk")},
+        lambda: _one_day_detail(request, race_id),
+        one_day_race_id=race_id,
+    )
+
+
+def _one_day_detail(request, race_id):
     lang = _lang2()
 
     race = get_object_or_404(
@@ -40,7 +84,7 @@ def one_day_detail_view(request, race_id):
     tr = next((t for t in race.translations.all() if t.language == lang), None)
     profile_text_display = (tr.profile_text if tr and tr.profile_text else race.profile_text)
 
-    entries = Entry.objects.filter(one_day_race=race).select_related("rider").order_by("-odds", "rider__last_name")
+    entries = unit_startlist(one_day_race=race)
     results = Result.objects.filter(one_day_race=race).select_related("rider").order_by("position")
     is_locked = timezone.now() >= race.start_datetime
 
@@ -65,6 +109,16 @@ def one_day_detail_view(request, race_id):
 
 @login_required
 def stage_detail_view(request, stage_id):
+    return _unit_page(
+        request,
+        Stage.objects.filter(id=stage_id),
+        {"stage_id": OuterRef("pk")},
+        lambda: _stage_detail(request, stage_id),
+        stage_id=stage_id,
+    )
+
+
+def _stage_detail(request, stage_id):
     lang = _lang2()
 
     stage = get_object_or_404(
@@ -75,7 +129,7 @@ def stage_detail_view(request, stage_id):
     tr = next((t for t in stage.translations.all() if t.language == lang), None)
     profile_text_display = (tr.profile_text if tr and tr.profile_text else stage.profile_text)
 
-    entries = Entry.objects.filter(stage=stage).select_related("rider").order_by("-odds", "rider__last_name")
+    entries = unit_startlist(stage=stage)
     results = Result.objects.filter(stage=stage).select_related("rider").order_by("position")
     is_locked = timezone.now() >= stage.start_datetime
 
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import JobState, SchedulerLock
+
+
+@admin.register(JobState)
+class JobStateAdmin(admin.ModelAdmin):
+    list_display = ("name", "next_run_at", "last_run_at", "last_duration_ms", "last_result")
+    readonly_fields = ("last_run_at", "last_duration_ms", "last_result", "last_error")
+
+
+@admin.register(SchedulerLock)
+class SchedulerLockAdmin(admin.ModelAdmin):
+    list_display = ("name", "owner", "expires_at")
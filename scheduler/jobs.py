@@ -0,0 +1,202 @@
+# scheduler/jobs.py
+"""
+Tâches de `manage.py run_scheduler` (remplacent les commandes lancées par cron).
+
+Chaque tâche a un intervalle (SCHEDULER_INTERVALS) et un état en base (JobState) :
+- send_reminders : toutes les N minutes, et aussi pile quand une unité entre dans
+  la fenêtre de rappel (départ - SCHEDULER_REMINDER_HOURS)
+- award_badges : seulement les unités terminées dont les faits ont changé depuis le
+  dernier passage (curseur (updated_at, id) sur UnitFacts), au lieu de --all-finished
+- bet_badges : badges déclenchés par les pronos validés depuis le dernier passage
+  (premier prono, saison), retirés de la requête de prono
+- top10_global : saison en cours, seulement si son classement a changé (ScopeVersion)
+
+Les commandes existantes sont appelées via call_command (les badges directement via
+badges/services.py) : Django reste chargé entre deux passages.
+"""
+from __future__ import annotations
+
+import io
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Min
+from django.utils import timezone
+
+from badges.services import (
+    BET_BADGES_WATERMARK,
+    UNIT_BADGES_WATERMARK,
+    award_bet_badges_since_watermark,
+    award_unit_badges_since_watermark,
+)
+from bets.versions import get_versions, season_version_key
+from races.models import OneDayRace, Season, Stage
+from .models import JobState
+
+BADGE_BATCH_SIZE = 200
+
+DEFAULT_INTERVALS = {
+    "send_reminders": 15 * 60,
+    "award_badges": 60,
+    "bet_badges": 60,
+    "top10_global": 60 * 60,
+}
+
+# (résumé affiché, encore du travail en attente -> relancer tout de suite)
+JobResult = Tuple[str, bool]
+
+
+@dataclass
+class Job:
+    name: str
+    run: Callable[[JobState, datetime], JobResult]
+    # échéance "événement" en plus de l'intervalle (ex: une unité entre dans la fenêtre de rappel)
+    next_event: Optional[Callable[[datetime], Optional[datetime]]] = None
+
+    @property
+    def interval(self) -> int:
+        intervals = {**DEFAULT_INTERVALS, **getattr(settings, "SCHEDULER_INTERVALS", {})}
+        return int(intervals[self.name])
+
+
+def _last_line(out: io.StringIO) -> str:
+    lines = [line for line in out.getvalue().splitlines() if line.strip()]
+    return lines[-1][:255] if lines else ""
+
+
+# -------------------------
+# Rappels
+# -------------------------
+
+def _reminder_hours() -> int:
+    return getattr(settings, "SCHEDULER_REMINDER_HOURS", 24)
+
+
+def run_reminders(state: JobState, now: datetime) -> JobResult:
+    out = io.StringIO()
+    call_command(
+        "send_reminders",
+        hours=_reminder_hours(),
+        channel=getattr(settings, "SCHEDULER_REMINDER_CHANNEL", "email"),
+        stdout=out,
+        stderr=out,
+    )
+    return _last_line(out), False
+
+
+def next_reminder_event(now: datetime) -> Optional[datetime]:
+    """Moment où la prochaine unité entre dans la fenêtre de rappel."""
+    horizon = now + timedelta(hours=_reminder_hours())
+    starts = [
+        model.objects.filter(start_datetime__gt=horizon).aggregate(m=Min("start_datetime"))["m"]
+        for model in (OneDayRace, Stage)
+    ]
+    starts = [start for start in starts if start is not None]
+    if not starts:
+        return None
+    return min(starts) - timedelta(hours=_reminder_hours()) + timedelta(seconds=1)
+
+
+# -------------------------
+# Badges d'unité (incrémental)
+# -------------------------
+
+def run_unit_badges(state: JobState, now: datetime) -> JobResult:
+    # curseur (updated_at, id) tenu par le service dans ce même JobState, avancé lot par lot
+    units, created = award_unit_badges_since_watermark(batch_size=BADGE_BATCH_SIZE)
+    return f"unités traitées : {units} | badges créés : {created}", False
+
+
+def run_bet_badges(state: JobState, now: datetime) -> JobResult:
+    bets, created = award_bet_badges_since_watermark()
+    return f"pronos traités : {bets} | badges créés : {created}", False
+
+
+# -------------------------
+# TOP10_GLOBAL
+# -------------------------
+
+def run_top10_global(state: JobState, now: datetime) -> JobResult:
+    season = Season.objects.order_by("-year").first()
+    if season is None:
+        return "aucune saison", False
+
+    (version,) = get_versions([season_version_key(season.id)])
+    if state.cursor == {"season": season.id, "version": version}:
+        return f"saison {season.year} : classement inchangé", False
+
+    out = io.StringIO()
+    call_command("recompute_top10_global", year=season.year, stdout=out)
+    state.cursor = {"season": season.id, "version": version}
+    state.save(update_fields=["cursor"])
+    return _last_line(out), False
+
+
+JOBS: List[Job] = [
+    Job("send_reminders", run_reminders, next_event=next_reminder_event),
+    Job(UNIT_BADGES_WATERMARK, run_unit_badges),
+    Job(BET_BADGES_WATERMARK, run_bet_badges),
+    Job("top10_global", run_top10_global),
+]
+
+
+# -------------------------
+# Boucle
+# -------------------------
+
+def _states(jobs: List[Job], now: datetime) -> Dict[str, JobState]:
+    # nouvelle tâche : due tout de suite
+    JobState.objects.bulk_create([JobState(name=job.name, next_run_at=now) for job in jobs], ignore_conflicts=True)
+    return {state.name: state for state in JobState.objects.filter(name__in=[job.name for job in jobs])}
+
+
+def run_due_jobs(
+    jobs: List[Job] = JOBS,
+    now: Optional[datetime] = None,
+    log=None,
+    keep_lock: Optional[Callable[[], bool]] = None,
+) -> datetime:
+    """
+    Lance les tâches arrivées à échéance. Retourne la prochaine échéance.
+    `keep_lock` : appelé avant chaque tâche (renouvelle le bail du verrou) ; s'il retourne
+    False, le verrou est perdu et les tâches restantes sont laissées à l'autre instance.
+    """
+    now = now or timezone.now()
+    states = _states(jobs, now)
+
+    for job in jobs:
+        state = states[job.name]
+        if state.next_run_at > now:
+            continue
+        if keep_lock is not None and not keep_lock():
+            if log:
+                log(f"{job.name}: verrou perdu, tâche laissée à l'autre instance")
+            break
+
+        start = time.perf_counter()
+        again = False
+        try:
+            summary, again = job.run(state, now)
+            state.last_error = ""
+        except Exception:
+            summary = "erreur"
+            state.last_error = traceback.format_exc()
+        state.last_run_at = now
+        state.last_duration_ms = int((time.perf_counter() - start) * 1000)
+        state.last_result = summary[:255]
+
+        finished = timezone.now()
+        next_run = finished if again else finished + timedelta(seconds=job.interval)
+        event = job.next_event(finished) if job.next_event else None
+        state.next_run_at = min(next_run, event) if event else next_run
+        state.save(update_fields=["last_run_at", "last_duration_ms", "last_result", "last_error", "next_run_at"])
+
+        if log:
+            log(f"{job.name}: {summary} ({state.last_duration_ms} ms)" + (" ❌" if state.last_error else ""))
+
+    return min(state.next_run_at for state in states.values())
@@ -0,0 +1,73 @@
+# scheduler/lock.py
+"""
+Verrou "une seule instance de run_scheduler active".
+
+- Postgres : advisory lock de session (pg_try_advisory_lock), libéré automatiquement
+  si le process meurt (la connexion se ferme)
+- autres bases (SQLite) : ligne SchedulerLock avec bail (expires_at), renouvelée à chaque
+  tour et avant chaque tâche (run_due_jobs, keep_lock) ; si l'instance meurt, une autre la
+  reprend après expiration. Le TTL doit donc dépasser la plus longue tâche, pas le tour entier.
+"""
+from __future__ import annotations
+
+import os
+import socket
+import uuid
+import zlib
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SchedulerLock
+
+
+class InstanceLock:
+    def __init__(self, name: str = "run_scheduler", ttl: int = 120):
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[:64]
+        self.held = False
+
+    @property
+    def _advisory(self) -> bool:
+        return connection.vendor == "postgresql"
+
+    def _advisory_key(self) -> int:
+        return zlib.crc32(self.name.encode())  # clé stable entre process
+
+    def acquire(self) -> bool:
+        if self._advisory:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", [self._advisory_key()])
+                self.held = bool(cursor.fetchone()[0])
+            return self.held
+
+        now = timezone.now()
+        SchedulerLock.objects.bulk_create([SchedulerLock(name=self.name)], ignore_conflicts=True)
+        self.held = SchedulerLock.objects.filter(
+            Q(owner=self.owner) | Q(owner="") | Q(expires_at__lt=now), name=self.name,
+        ).update(owner=self.owner, expires_at=now + timedelta(seconds=self.ttl)) == 1
+        return self.held
+
+    def refresh(self) -> bool:
+        """À appeler à chaque tour et avant chaque tâche. Retourne False si le verrou a été perdu (et n'a pas pu être repris)."""
+        if self._advisory:
+            # le verrou vit avec la connexion : fermée ou tombée, il est perdu
+            if connection.connection is None or not connection.is_usable():
+                connection.close()
+                self.held = False
+            # instance en attente : elle le prend dès que l'autre l'a libéré (ou est morte)
+            return self.held or self.acquire()
+        return self.acquire()
+
+    def release(self) -> None:
+        if not self.held:
+            return
+        if self._advisory:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [self._advisory_key()])
+        else:
+            SchedulerLock.objects.filter(name=self.name, owner=self.owner).update(owner="", expires_at=timezone.now())
+        self.held = False
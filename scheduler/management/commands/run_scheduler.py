@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from scheduler.jobs import JOBS, run_due_jobs
+from scheduler.lock import InstanceLock
+
+
+class Command(BaseCommand):
+    help = (
+        "Planificateur longue durée : rappels, badges d'unité (incrémental) et TOP10_GLOBAL, "
+        "sans relancer Django à chaque tâche. Une seule instance active (verrou en base)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Lance les tâches dues puis s'arrête.")
+        parser.add_argument("--jobs", nargs="+", choices=[job.name for job in JOBS], help="Restreint à ces tâches.")
+        parser.add_argument("--max-sleep", type=float, default=30.0, help="Pause max entre deux tours (secondes). Défaut=30")
+
+    def handle(self, *args, **opts):
+        jobs = [job for job in JOBS if not opts["jobs"] or job.name in opts["jobs"]]
+        ttl = getattr(settings, "SCHEDULER_LOCK_TTL", 120)
+        lock = InstanceLock(ttl=ttl)
+        # le bail doit être renouvelé bien avant d'expirer
+        max_sleep = min(opts["max_sleep"], ttl / 3)
+
+        if opts["once"]:
+            if not lock.acquire():
+                raise CommandError("run_scheduler: une autre instance est active.")
+            try:
+                run_due_jobs(jobs, log=self.stdout.write, keep_lock=lock.refresh)
+            finally:
+                lock.release()
+            return
+
+        self.stdout.write(f"run_scheduler: démarré ({', '.join(job.name for job in jobs)}) — Ctrl+C pour arrêter")
+        waiting = False
+        try:
+            while True:
+                if not lock.refresh():
+                    if not waiting:
+                        self.stdout.write("run_scheduler: une autre instance est active, en attente du verrou")
+                        waiting = True
+                    time.sleep(max_sleep)
+                    continue
+                if waiting:
+                    self.stdout.write("run_scheduler: verrou obtenu")
+                    waiting = False
+
+                # bail renouvelé entre deux tâches : un tour plus long que le TTL garde le verrou
+                next_at = run_due_jobs(jobs, log=self.stdout.write, keep_lock=lock.refresh)
+                delay = (next_at - timezone.now()).total_seconds()
+                time.sleep(min(max(delay, 1.0), max_sleep))
+        except KeyboardInterrupt:
+            self.stdout.write("run_scheduler: arrêt")
+        finally:
+            lock.release()
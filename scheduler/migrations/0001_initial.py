@@ -0,0 +1,55 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="JobState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64, unique=True)),
+                ("cursor", models.JSONField(blank=True, default=dict)),
+                (
+                    "next_run_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("last_run_at", models.DateTimeField(blank=True, null=True)),
+                ("last_duration_ms", models.PositiveIntegerField(default=0)),
+                ("last_result", models.CharField(blank=True, max_length=255)),
+                ("last_error", models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SchedulerLock",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64, unique=True)),
+                ("owner", models.CharField(blank=True, max_length=64)),
+                ("expires_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
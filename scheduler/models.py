@@ -0,0 +1,32 @@
+from django.db import models
+from django.utils import timezone
+
+
+class JobState(models.Model):
+    """
+    État persistant d'une tâche de `manage.py run_scheduler` : prochain passage,
+    et curseur du travail incrémental (ex: dernière unité traitée), conservés entre redémarrages.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    cursor = models.JSONField(default=dict, blank=True)
+    next_run_at = models.DateTimeField(default=timezone.now)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_duration_ms = models.PositiveIntegerField(default=0)
+    last_result = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"JobState({self.name})"
+
+
+class SchedulerLock(models.Model):
+    """
+    Verrou "une seule instance active" (bases sans advisory lock, ex: SQLite) :
+    le propriétaire le renouvelle à chaque tour ; passé expires_at, une autre instance peut le prendre.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    owner = models.CharField(max_length=64, blank=True)
+    expires_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"SchedulerLock({self.name} -> {self.owner or '-'})"
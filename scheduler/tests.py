@@ -0,0 +1,129 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .jobs import Job, run_due_jobs
+from .lock import InstanceLock
+from .models import JobState, SchedulerLock
+
+
+class RunDueJobsTests(TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def _job(self, name, again=False, fail=False):
+        def run(state, now):
+            self.calls.append(name)
+            if fail:
+                raise RuntimeError("boum")
+            return f"{name} ok", again
+
+        return Job(name, run)
+
+    def test_runs_only_due_jobs_and_schedules_next_run(self):
+        now = timezone.now()
+        JobState.objects.create(name="award_badges", next_run_at=now + timedelta(minutes=5))
+
+        with self.settings(SCHEDULER_INTERVALS={"bet_badges": 60}):
+            next_at = run_due_jobs([self._job("award_badges"), self._job("bet_badges")], now=now)
+
+        self.assertEqual(self.calls, ["bet_badges"])
+        state = JobState.objects.get(name="bet_badges")
+        self.assertEqual(state.last_result, "bet_badges ok")
+        self.assertGreaterEqual(state.next_run_at, now + timedelta(seconds=60))
+        self.assertEqual(next_at, state.next_run_at)
+
+    def test_failing_job_is_recorded_and_does_not_stop_the_others(self):
+        run_due_jobs([self._job("award_badges", fail=True), self._job("bet_badges")])
+
+        self.assertEqual(self.calls, ["award_badges", "bet_badges"])
+        failed = JobState.objects.get(name="award_badges")
+        self.assertEqual(failed.last_result, "erreur")
+        self.assertIn("RuntimeError", failed.last_error)
+        self.assertEqual(JobState.objects.get(name="bet_badges").last_error, "")
+
+    def test_job_with_pending_work_runs_again_right_away(self):
+        run_due_jobs([self._job("award_badges", again=True)])
+
+        state = JobState.objects.get(name="award_badges")
+        self.assertLessEqual(state.next_run_at, timezone.now())
+
+    def test_keep_lock_is_checked_before_each_job(self):
+        checks = []
+
+        def keep_lock():
+            checks.append(len(self.calls))
+            return len(checks) < 2  # verrou perdu pendant la première tâche
+
+        run_due_jobs([self._job("award_badges"), self._job("bet_badges")], keep_lock=keep_lock)
+
+        self.assertEqual(checks, [0, 1])
+        self.assertEqual(self.calls, ["award_badges"])
+        self.assertIsNone(JobState.objects.get(name="bet_badges").last_run_at)
+
+
+class InstanceLockTests(TestCase):
+    def test_single_owner_until_release(self):
+        first, second = InstanceLock(), InstanceLock()
+
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertTrue(first.refresh())
+
+        first.release()
+        self.assertTrue(second.acquire())
+
+    def test_expired_lease_is_taken_over(self):
+        first, second = InstanceLock(ttl=60), InstanceLock(ttl=60)
+        self.assertTrue(first.acquire())
+
+        SchedulerLock.objects.filter(name=first.name).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertTrue(second.acquire())
+        self.assertFalse(first.refresh())
+
+    def test_refresh_extends_the_lease(self):
+        lock = InstanceLock(ttl=60)
+        lock.acquire()
+        SchedulerLock.objects.filter(name=lock.name).update(expires_at=timezone.now() + timedelta(seconds=5))
+
+        self.assertTrue(lock.refresh())
+
+        expires_at = SchedulerLock.objects.get(name=lock.name).expires_at
+        self.assertGreater(expires_at, timezone.now() + timedelta(seconds=50))
+
+
+@mock.patch.object(InstanceLock, "_advisory", new_callable=mock.PropertyMock, return_value=True)
+class AdvisoryLockRefreshTests(TestCase):
+    def _lock(self, held):
+        lock = InstanceLock()
+        lock.held = held
+        return lock
+
+    def test_standby_takes_over_once_the_lock_is_free(self, _advisory):
+        lock = self._lock(held=False)
+        with mock.patch("scheduler.lock.connection") as conn, \
+                mock.patch.object(InstanceLock, "acquire", side_effect=[False, True]) as acquire:
+            conn.is_usable.return_value = True
+            self.assertFalse(lock.refresh())
+            self.assertTrue(lock.refresh())
+        self.assertEqual(acquire.call_count, 2)
+
+    def test_holder_with_a_live_connection_keeps_the_lock(self, _advisory):
+        lock = self._lock(held=True)
+        with mock.patch("scheduler.lock.connection") as conn, mock.patch.object(InstanceLock, "acquire") as acquire:
+            conn.is_usable.return_value = True
+            self.assertTrue(lock.refresh())
+        acquire.assert_not_called()
+
+    def test_dropped_connection_loses_the_lock_and_tries_again(self, _advisory):
+        lock = self._lock(held=True)
+        with mock.patch("scheduler.lock.connection") as conn, \
+                mock.patch.object(InstanceLock, "acquire", return_value=False) as acquire:
+            conn.is_usable.return_value = False
+            self.assertFalse(lock.refresh())
+        conn.close.assert_called_once()
+        acquire.assert_called_once()
+        self.assertFalse(lock.held)
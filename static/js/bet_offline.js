@@ -0,0 +1,80 @@
+// Formulaire de prono : brouillon du Top 5 gardé en local (IndexedDB, static/pwa/bets-db.js)
+// et état des pronos validés hors ligne, envoyés par le service worker (static/pwa/sw.js).
+(function () {
+  const form = document.querySelector("form[data-bet-kind]");
+  if (!form || !self.CDBBets || !("indexedDB" in self)) return;
+
+  const key = CDBBets.unitKey(form.dataset.betKind, form.dataset.unitId);
+  const selects = ["pick1", "pick2", "pick3", "pick4", "pick5"].map((name) => form.elements[name]);
+  const status = document.getElementById("bet-offline-status");
+  // prono enregistré côté serveur (secondes epoch), 0 si aucun
+  const submittedAt = Number(form.dataset.submittedAt || 0) * 1000;
+
+  function show(text) {
+    if (!status) return;
+    status.textContent = text;
+    status.hidden = !text;
+  }
+
+  function apply(picks) {
+    picks.forEach((riderId, i) => {
+      // coureur retiré de la startlist depuis : champ laissé vide
+      if (riderId && selects[i].querySelector(`option[value="${riderId}"]`)) {
+        selects[i].value = String(riderId);
+      }
+    });
+  }
+
+  function refreshQueued() {
+    return CDBBets.getQueued(key).then((item) => {
+      const token = form.elements.csrfmiddlewaretoken && form.elements.csrfmiddlewaretoken.value;
+      if (item && token && item.csrf_token !== token) {
+        // page servie par le réseau : jeton à jour pour le prochain envoi (refusé en 403 sinon)
+        item.csrf_token = token;
+        CDBBets.enqueue(item).catch(() => {});
+      }
+      if (item) {
+        apply(item.picks);
+        show("Prono en attente d'envoi : il partira dès le retour du réseau.");
+      }
+      return item;
+    });
+  }
+
+  // Formulaire renvoyé avec erreurs : on garde la saisie affichée par le serveur
+  if (form.dataset.bound !== "1") {
+    refreshQueued().then((item) => {
+      if (item) return;
+      return CDBBets.getDraft(key).then((draft) => {
+        if (draft && draft.updated_at > submittedAt) {
+          apply(draft.picks);
+          show("Brouillon restauré (non validé).");
+        }
+      });
+    }).catch(() => {});
+  }
+
+  form.addEventListener("change", () => {
+    CDBBets.saveDraft({
+      key,
+      picks: selects.map((s) => (s.value ? Number(s.value) : null)),
+      updated_at: Date.now(),
+    }).catch(() => {});
+  });
+
+  if ("serviceWorker" in navigator) {
+    navigator.serviceWorker.addEventListener("message", (event) => {
+      const data = event.data || {};
+      if (data.type !== "bets-synced") return;
+      const result = (data.results || []).find((r) => r.key === key);
+      if (!result) return;
+      show(result.ok
+        ? "Prono envoyé ✅"
+        : result.kept
+          ? "Session expirée : reconnecte-toi, ton prono partira ensuite."
+          : result.status === 409
+          ? "Prono refusé : l'unité est partie."
+          : "Prono refusé : vérifie ton Top 5 et valide à nouveau.");
+    });
+  }
+})();
@@ -0,0 +1,77 @@
+// Pronos hors ligne : IndexedDB partagée entre les pages et le service worker (sw.js).
+// - drafts : Top 5 en cours de saisie, par unité ("one-day:12", "stage:34")
+// - outbox : pronos validés sans réseau, envoyés à /api/bets/<kind>/<id>/ par Background Sync
+(function (scope) {
+  const DB_NAME = "cdb-bets";
+  const DB_VERSION = 1;
+  const DRAFTS = "drafts";
+  const OUTBOX = "outbox";
+
+  function openDb() {
+    return new Promise((resolve, reject) => {
+      const req = indexedDB.open(DB_NAME, DB_VERSION);
+      req.onupgradeneeded = () => {
+        const db = req.result;
+        if (!db.objectStoreNames.contains(DRAFTS)) db.createObjectStore(DRAFTS, { keyPath: "key" });
+        if (!db.objectStoreNames.contains(OUTBOX)) db.createObjectStore(OUTBOX, { keyPath: "key" });
+      };
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    });
+  }
+
+  function run(store, mode, fn) {
+    return openDb().then((db) => new Promise((resolve, reject) => {
+      const tx = db.transaction(store, mode);
+      const req = fn(tx.objectStore(store));
+      tx.oncomplete = () => { db.close(); resolve(req.result); };
+      tx.onerror = () => { db.close(); reject(tx.error); };
+    }));
+  }
+
+  // Un envoi : 2xx = enregistré (brouillon supprimé) ; 401 / 403 / redirection = session
+  // ou jeton CSRF expirés : gardé en file, renvoyé après reconnexion (le formulaire remet
+  // son jeton à jour) ; autre 4xx = refusé (verrouillé, coureur retiré : le brouillon
+  // reste) ; réseau / 5xx = gardé pour le prochain essai.
+  function send(item) {
+    return fetch(item.url, {
+      method: "POST",
+      credentials: "same-origin",
+      redirect: "manual",
+      headers: {
+        "Content-Type": "application/json",
+        "X-CSRFToken": item.csrf_token,
+        "Idempotency-Key": item.idempotency_key,
+      },
+      body: JSON.stringify({ picks: item.picks, captured_at: item.captured_at }),
+    }).then((resp) => {
+      if (resp.status >= 500) throw new Error(`HTTP ${resp.status}`);
+      if (resp.type === "opaqueredirect" || resp.status === 401 || resp.status === 403) {
+        return { key: item.key, ok: false, status: resp.status || 401, kept: true };
+      }
+      const done = resp.ok ? api.deleteDraft(item.key) : Promise.resolve();
+      return done
+        .then(() => api.dequeue(item.key))
+        .then(() => ({ key: item.key, ok: resp.ok, status: resp.status }));
+    });
+  }
+
+  const api = {
+    unitKey: (kind, unitId) => `${kind}:${unitId}`,
+
+    getDraft: (key) => run(DRAFTS, "readonly", (store) => store.get(key)),
+    saveDraft: (draft) => run(DRAFTS, "readwrite", (store) => store.put(draft)),
+    deleteDraft: (key) => run(DRAFTS, "readwrite", (store) => store.delete(key)),
+
+    // un seul prono en attente par unité : le dernier validé remplace le précédent
+    getQueued: (key) => run(OUTBOX, "readonly", (store) => store.get(key)),
+    queued: () => run(OUTBOX, "readonly", (store) => store.getAll()),
+    enqueue: (item) => run(OUTBOX, "readwrite", (store) => store.put(item)),
+    dequeue: (key) => run(OUTBOX, "readwrite", (store) => store.delete(key)),
+
+    // Rejette si un envoi a échoué sur le réseau : le navigateur relance alors le sync.
+    flush: () => api.queued().then((items) => Promise.all(items.map(send))),
+  };
+
+  scope.CDBBets = api;
+})(self);
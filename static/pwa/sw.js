@@ -1,5 +1,18 @@
-const CACHE_NAME = "cdb-pwa-v1";
+// Servi depuis la racine (/sw.js, pages/views.py) : portée "/".
+importScripts("/static/pwa/bets-db.js");
+
+const CACHE_NAME = "cdb-pwa-v2";
+const STARTLISTS_CACHE = "cdb-startlists-v1";
 const OFFLINE_URL = "/offline/";
+const UPCOMING_URL = "/api/startlists/upcoming/";
+const SYNC_TAG = "cdb-bets";
+const PRECACHE_INTERVAL_MS = 10 * 60 * 1000;
+const BET_POST_TIMEOUT_MS = 15000;
+
+// formulaire de prono : /bet/<one-day|stage>/<id>/
+const BET_FORM_RE = /^\/bet\/(one-day|stage)\/(\d+)\/$/;
+
+let lastPrecache = 0;
 
 self.addEventListener("install", (event) => {
   event.waitUntil(
@@ -9,18 +22,158 @@ self.addEventListener("install", (event) => {
 });
 
 self.addEventListener("activate", (event) => {
-  event.waitUntil(self.clients.claim());
+  const keep = [CACHE_NAME, STARTLISTS_CACHE];
+  event.waitUntil(
+    caches.keys()
+      .then((names) => Promise.all(names.filter((n) => !keep.includes(n)).map((n) => caches.delete(n))))
+      .then(() => self.clients.claim())
+  );
 });
 
-// Navigation requests only: if network fails, show offline page
+// Startlists (JSON, revalidées par ETag) et formulaires de prono des unités qui partent
+// bientôt : le Top 5 reste consultable et modifiable hors ligne.
+async function precacheStartlists() {
+  if (Date.now() - lastPrecache < PRECACHE_INTERVAL_MS) return;
+  lastPrecache = Date.now();
+
+  const resp = await fetch(UPCOMING_URL, { credentials: "same-origin", redirect: "manual" });
+  if (!resp.ok) return;
+  const { units } = await resp.json();
+
+  const cache = await caches.open(STARTLISTS_CACHE);
+  const keep = new Set();
+  await Promise.all(units.map(async (unit) => {
+    for (const url of [unit.startlist_url, unit.form_url]) {
+      keep.add(new URL(url, self.location.origin).href);
+      await revalidate(cache, url).catch(() => {});
+    }
+  }));
+  // unités parties : plus rien à saisir
+  for (const request of await cache.keys()) {
+    if (!keep.has(request.url)) await cache.delete(request);
+  }
+}
+
+async function revalidate(cache, url) {
+  const cached = await cache.match(url);
+  const etag = cached && cached.headers.get("ETag");
+  const resp = await fetch(url, {
+    credentials: "same-origin",
+    redirect: "manual",
+    cache: "no-store",
+    headers: etag ? { "If-None-Match": etag } : {},
+  });
+  if (resp.ok) await cache.put(url, resp);
+}
+
+async function notifyClients(message) {
+  const windows = await self.clients.matchAll({ type: "window" });
+  windows.forEach((client) => client.postMessage(message));
+}
+
+async function flushBets() {
+  const results = await CDBBets.flush();
+  if (results.length) await notifyClients({ type: "bets-synced", results });
+}
+
+async function registerSync() {
+  if (self.registration.sync) {
+    await self.registration.sync.register(SYNC_TAG);
+  }
+  // sans Background Sync : les pages envoient "flush-bets" au retour du réseau (base.html)
+}
+
+function withTimeout(promise, ms) {
+  return Promise.race([
+    promise,
+    new Promise((_, reject) => setTimeout(() => reject(new Error("timeout")), ms)),
+  ]);
+}
+
+// POST du formulaire de prono sans réseau : mis en file (heure de saisie, clé d'idempotence),
+// envoyé par Background Sync à /api/bets/... ; retour sur le formulaire (en cache).
+// captured_at = heure de l'envoi initial : si ce POST a fini par aboutir, ou si un prono plus
+// récent est enregistré entre-temps, le serveur ignore le rejeu (bets/api.py).
+async function queueBetPost(request, match, capturedAt) {
+  const [, kind, unitId] = match;
+  const data = await request.formData();
+  await CDBBets.enqueue({
+    key: CDBBets.unitKey(kind, unitId),
+    url: `/api/bets/${kind}/${unitId}/`,
+    picks: ["pick1", "pick2", "pick3", "pick4", "pick5"].map((name) => Number(data.get(name)) || null),
+    captured_at: capturedAt,
+    idempotency_key: self.crypto.randomUUID(),
+    csrf_token: data.get("csrfmiddlewaretoken") || "",
+  });
+  await registerSync();
+  return Response.redirect(`${new URL(request.url).pathname}?queued=1`, 303);
+}
+
+async function navigate(request) {
+  try {
+    return await fetch(request);
+  } catch (err) {
+    const cached = await caches.match(new URL(request.url).pathname, { cacheName: STARTLISTS_CACHE });
+    return cached || caches.match(OFFLINE_URL);
+  }
+}
+
 self.addEventListener("fetch", (event) => {
-  if (event.request.mode === "navigate") {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return;
+
+  const betForm = url.pathname.match(BET_FORM_RE);
+  if (betForm && request.method === "POST" && request.mode === "navigate") {
+    const copy = request.clone();
+    const capturedAt = new Date().toISOString();
+    const key = CDBBets.unitKey(betForm[1], betForm[2]);
+    event.respondWith(
+      withTimeout(fetch(request), BET_POST_TIMEOUT_MS)
+        .then((resp) => {
+          // prono accepté en ligne (redirection vers l'unité) : un ancien prono resté en
+          // file pour l'unité est périmé
+          if (resp.redirected) {
+            CDBBets.dequeue(key).catch(() => {});
+          }
+          return resp;
+        })
+        .catch(() => queueBetPost(copy, betForm, capturedAt))
+    );
+    return;
+  }
+
+  if (request.method !== "GET") return;
+
+  // Navigations : réseau, puis formulaire de prono préchargé, puis page hors ligne
+  if (request.mode === "navigate") {
+    event.respondWith(navigate(request));
+    return;
+  }
+
+  // Startlists JSON : réseau (revalidation ETag par le cache HTTP), sinon copie préchargée
+  if (url.pathname.startsWith("/api/startlists/")) {
     event.respondWith(
-      fetch(event.request).catch(() => caches.match(OFFLINE_URL))
+      fetch(request).catch(() => caches.match(request, { cacheName: STARTLISTS_CACHE }))
     );
   }
 });
 
+self.addEventListener("sync", (event) => {
+  if (event.tag === SYNC_TAG) {
+    event.waitUntil(flushBets());
+  }
+});
+
+self.addEventListener("message", (event) => {
+  const type = event.data && event.data.type;
+  if (type === "precache-startlists") {
+    event.waitUntil(precacheStartlists().catch(() => {}));
+  } else if (type === "flush-bets") {
+    event.waitUntil(flushBets().catch(() => {}));
+  }
+});
+
 self.addEventListener("push", function (event) {
   const data = event.data ? event.data.json() : {};
   const title = data.title || "Coup de Bordure";
@@ -37,4 +190,4 @@ self.addEventListener("notificationclick", function (event) {
   event.notification.close();
   const url = (event.notification.data && event.notification.data.url) || "/dashboard/";
   event.waitUntil(clients.openWindow(url));
-});
\ No newline at end of file
+});
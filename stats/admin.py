@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import UserStatsSnapshot
+
+
+@admin.register(UserStatsSnapshot)
+class UserStatsSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("user", "played", "score_total", "units_with_results", "win_exact", "updated_at")
+    search_fields = ("user__username",)
+    readonly_fields = ("updated_at",)
@@ -0,0 +1,64 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from races.models import OneDayRace, Stage
+from bets.scoring import score_unit
+from stats.services import compute_user_stats, rebuild_user_stats, write_user_stats
+
+User = get_user_model()
+
+
+def _compute_chunk(user_ids):
+    # process fils : lecture seule, connexion propre (celle du parent est fermée avant le fork)
+    try:
+        return compute_user_stats(user_ids)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit les UserStatsSnapshot depuis les BetScore (backfill). "
+        "--rescore recalcule d'abord les BetScore (et leur outcome) de toutes les unités : "
+        "à lancer une fois après la migration qui ajoute BetScore.outcome."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Reconstruit uniquement ce joueur (id).")
+        parser.add_argument("--rescore", action="store_true", help="Recalcule d'abord les scores de toutes les unités.")
+        parser.add_argument("--workers", type=int, default=0, help="Process parallèles (0 = dans ce process). Défaut=0")
+        parser.add_argument("--chunk", type=int, default=500, help="Joueurs par lot (mode --workers). Défaut=500")
+
+    def handle(self, *args, **opts):
+        if opts["rescore"]:
+            n = 0
+            for race in OneDayRace.objects.all():
+                n += score_unit(one_day_race=race)
+            for stage in Stage.objects.select_related("tour", "tour__season"):
+                n += score_unit(stage=stage)
+            self.stdout.write(f"BetScore réécrits : {n}")
+
+        if opts.get("user"):
+            n = rebuild_user_stats([opts["user"]])
+        elif opts["workers"] > 0:
+            n = self._rebuild_parallel(opts["workers"], opts["chunk"])
+        else:
+            n = rebuild_user_stats()
+
+        self.stdout.write(self.style.SUCCESS(f"✅ rebuild_user_stats terminé | snapshots : {n}"))
+
+    def _rebuild_parallel(self, workers: int, chunk: int) -> int:
+        """Les agrégations sont réparties sur le pool ; l'écriture reste dans ce process (une transaction)."""
+        user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+        chunks = [user_ids[i:i + chunk] for i in range(0, len(user_ids), chunk)]
+
+        connections.close_all()
+        totals = {}
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+            for part in pool.map(_compute_chunk, chunks):
+                totals.update(part)
+        return write_user_stats(totals)
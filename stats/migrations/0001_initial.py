@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStatsSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("played", models.PositiveIntegerField(default=0)),
+                ("scored", models.PositiveIntegerField(default=0)),
+                (
+                    "score_total",
+                    models.DecimalField(decimal_places=4, default=0, max_digits=12),
+                ),
+                ("units_with_results", models.PositiveIntegerField(default=0)),
+                ("win_exact", models.PositiveIntegerField(default=0)),
+                ("win_in_top5", models.PositiveIntegerField(default=0)),
+                ("pick1_in_top3", models.PositiveIntegerField(default=0)),
+                ("any_pick_in_top3", models.PositiveIntegerField(default=0)),
+                ("had_favourite", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stats_snapshot",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
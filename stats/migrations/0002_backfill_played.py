@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:35
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_played(apps, schema_editor):
+    """played = pronos validés, scorés ou non (stats/services.py, refresh_played)."""
+    Bet = apps.get_model("bets", "Bet")
+    UserStatsSnapshot = apps.get_model("stats", "UserStatsSnapshot")
+
+    counts = (
+        Bet.objects.filter(submitted_at__isnull=False)
+        .values("user_id")
+        .annotate(n=Count("id"))
+        .values_list("user_id", "n")
+    )
+    UserStatsSnapshot.objects.bulk_create(
+        [UserStatsSnapshot(user_id=user_id, played=n) for user_id, n in counts],
+        batch_size=2000,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["played"],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stats", "0001_initial"),
+        ("bets", "0011_bet_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_played, migrations.RunPython.noop),
+    ]
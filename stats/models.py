@@ -1,3 +1,27 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class UserStatsSnapshot(models.Model):
+    """
+    Stats d'un joueur pour /stats/, maintenues par delta quand les BetScore d'une unité
+    changent (bets/scoring.py -> stats/services.py). La page lit une seule ligne.
+    Backfill / réparation : `python manage.py rebuild_user_stats`.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="stats_snapshot")
+
+    played = models.PositiveIntegerField(default=0)           # pronos validés, scorés ou non (refresh_played)
+    scored = models.PositiveIntegerField(default=0)           # BetScore (dénominateur du score moyen)
+    score_total = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+
+    units_with_results = models.PositiveIntegerField(default=0)
+    win_exact = models.PositiveIntegerField(default=0)
+    win_in_top5 = models.PositiveIntegerField(default=0)
+    pick1_in_top3 = models.PositiveIntegerField(default=0)
+    any_pick_in_top3 = models.PositiveIntegerField(default=0)
+    had_favourite = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"UserStatsSnapshot({self.user} played={self.played} total={self.score_total})"
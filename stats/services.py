@@ -0,0 +1,180 @@
+# stats/services.py
+"""
+Maintenance de stats.UserStatsSnapshot.
+
+bets/scoring.py transmet, pour chaque BetScore réécrit, (user, ancien/nouveau score,
+ancien/nouveau outcome) : on en déduit des deltas par joueur (compteurs + total),
+appliqués en une lecture + un upsert. Un résultat corrigé retire donc les anciens
+compteurs avant d'ajouter les nouveaux.
+
+`played` (pronos validés, scorés ou non) est recompté pour les joueurs des pronos validés
+depuis le dernier passage de award_bet_badges_since_watermark (badges/services.py) : la page
+/stats/ ne lit que le snapshot, et les chiffres communs sont en cache par version (FACTS_KEY).
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from bets.models import OUTCOME_FLAGS, Bet, BetScore, UnitFacts
+from races.models import OneDayRace, Stage
+from .models import UserStatsSnapshot
+
+ZERO = Decimal("0")
+IN_CHUNK = 5000
+
+COUNTER_FIELDS = ("scored", *OUTCOME_FLAGS)
+
+# (user_id, ancien score ou None, nouveau score, ancien outcome, nouvel outcome)
+StatChange = Tuple[int, Optional[Decimal], Decimal, int, int]
+
+
+def _new_totals() -> Dict:
+    return {"score_total": ZERO, **{name: 0 for name in COUNTER_FIELDS}}
+
+
+def _add_outcome(totals: Dict, outcome: int, sign: int = 1) -> None:
+    for name, bit in OUTCOME_FLAGS.items():
+        if outcome & bit:
+            totals[name] += sign
+
+
+def _stat_deltas(changes: Iterable[StatChange]) -> Dict[int, Dict]:
+    deltas: Dict[int, Dict] = {}
+    for user_id, old_score, new_score, old_outcome, new_outcome in changes:
+        d = deltas.setdefault(user_id, _new_totals())
+        d["score_total"] += new_score - (old_score if old_score is not None else ZERO)
+        if old_score is None:
+            d["scored"] += 1
+        _add_outcome(d, old_outcome, -1)
+        _add_outcome(d, new_outcome, +1)
+    return {user_id: d for user_id, d in deltas.items() if any(d.values())}
+
+
+def apply_stat_changes(changes: Iterable[StatChange]) -> int:
+    """Applique les deltas aux snapshots concernés. Retourne le nombre de joueurs touchés."""
+    deltas = _stat_deltas(changes)
+    if not deltas:
+        return 0
+
+    fields = ["score_total", *COUNTER_FIELDS]
+    with transaction.atomic():
+        existing: Dict[int, Dict] = {}
+        user_ids = list(deltas)
+        for i in range(0, len(user_ids), IN_CHUNK):
+            for row in (
+                UserStatsSnapshot.objects.select_for_update()
+                .filter(user_id__in=user_ids[i:i + IN_CHUNK])
+                .values("user_id", *fields)
+            ):
+                existing[row.pop("user_id")] = row
+
+        rows = []
+        for user_id, d in deltas.items():
+            current = existing.get(user_id) or _new_totals()
+            values = {name: current[name] + d[name] for name in fields}
+            for name in COUNTER_FIELDS:
+                values[name] = max(values[name], 0)
+            rows.append(UserStatsSnapshot(user_id=user_id, **values))
+
+        UserStatsSnapshot.objects.bulk_create(
+            rows,
+            batch_size=IN_CHUNK,
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=[*fields, "updated_at"],
+        )
+    return len(rows)
+
+
+def compute_user_stats(user_ids: Optional[List[int]] = None) -> Dict[int, Dict]:
+    """Totaux par joueur depuis les BetScore (lecture seule : parallélisable)."""
+    scores = BetScore.objects.all()
+    if user_ids is not None:
+        scores = scores.filter(bet__user_id__in=user_ids)
+
+    totals: Dict[int, Dict] = {}
+    for user_id, score, outcome in scores.values_list("bet__user_id", "score", "outcome").iterator(chunk_size=IN_CHUNK):
+        t = totals.setdefault(user_id, _new_totals())
+        t["score_total"] += score or ZERO
+        t["scored"] += 1
+        _add_outcome(t, outcome)
+    for user_id, played in _played_counts(user_ids).items():
+        totals.setdefault(user_id, _new_totals())["played"] = played
+    return totals
+
+
+def _played_counts(user_ids: Optional[List[int]] = None) -> Dict[int, int]:
+    bets = Bet.objects.filter(submitted_at__isnull=False)
+    if user_ids is not None:
+        bets = bets.filter(user_id__in=user_ids)
+    return dict(bets.values("user_id").annotate(n=Count("id")).values_list("user_id", "n"))
+
+
+def refresh_played(user_ids: Iterable[int]) -> int:
+    """Recompte les pronos validés de ces joueurs (un COUNT groupé + un upsert). Retourne le nb de joueurs."""
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return 0
+    counts = _played_counts(user_ids)
+    UserStatsSnapshot.objects.bulk_create(
+        [UserStatsSnapshot(user_id=user_id, played=counts.get(user_id, 0)) for user_id in user_ids],
+        batch_size=IN_CHUNK,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["played", "updated_at"],
+    )
+    return len(user_ids)
+
+
+@transaction.atomic
+def write_user_stats(totals: Dict[int, Dict], user_ids: Optional[List[int]] = None) -> int:
+    """Remplace les snapshots (de user_ids, ou tous) par ces totaux."""
+    snapshots = UserStatsSnapshot.objects.all()
+    if user_ids is not None:
+        snapshots = snapshots.filter(user_id__in=user_ids)
+    snapshots.delete()
+    UserStatsSnapshot.objects.bulk_create(
+        [UserStatsSnapshot(user_id=user_id, **t) for user_id, t in totals.items()],
+        batch_size=IN_CHUNK,
+    )
+    return len(totals)
+
+
+def rebuild_user_stats(user_ids: Optional[List[int]] = None) -> int:
+    """
+    Recalcul complet depuis les BetScore (backfill / réparation).
+    user_ids=None : tous les joueurs. Retourne le nombre de snapshots écrits.
+    """
+    return write_user_stats(compute_user_stats(user_ids), user_ids)
+
+
+# -------------------------
+# Chiffres communs à tous les joueurs
+# -------------------------
+
+def global_unit_stats_cached(version: int) -> Dict:
+    """global_unit_stats() en cache pour cette version de FACTS_KEY (aucune requête si présent)."""
+    key = f"stats:global:{version}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = global_unit_stats()
+        cache.set(key, stats)
+    return stats
+
+
+def global_unit_stats() -> Dict:
+    """Nb d'unités, et sur les unités avec vainqueur : nb de victoires du favori (cote max), lus dans UnitFacts."""
+    fav = (
+        UnitFacts.objects.filter(winner__isnull=False, favourite__isnull=False)
+        .aggregate(total=Count("id"), wins=Count("id", filter=Q(winner=F("favourite"))))
+    )
+    return {
+        "total_units": OneDayRace.objects.count() + Stage.objects.count(),
+        "fav_total": fav["total"],
+        "fav_wins": fav["wins"],
+    }
@@ -1,3 +1,49 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from bets.models import UnitFacts
+from races.models import OneDayRace, Rider, Season
+
+from .models import UserStatsSnapshot
+from .views import my_stats_view
+
+
+class MyStatsViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        season = Season.objects.create(year=now.year)
+        cls.race = OneDayRace.objects.create(season=season, name="Test", start_datetime=now - timedelta(days=1))
+        cls.favourite = Rider.objects.create(first_name="F", last_name="Favori")
+        UnitFacts.objects.create(one_day_race=cls.race, winner=cls.favourite, favourite=cls.favourite, finished=True)
+        cls.user = get_user_model().objects.create_user(username="joueur", email="joueur@example.com", password="pw")
+        UserStatsSnapshot.objects.create(user=cls.user, played=1, scored=1, score_total=12)
+
+    def setUp(self):
+        cache.clear()
+
+    def _get(self):
+        request = RequestFactory().get("/stats/", secure=True)
+        request.user = self.user
+        return my_stats_view(request)
+
+    def test_single_query_once_the_global_numbers_are_cached(self):
+        self._get()
+        # snapshot + version des faits communs en une requête ; + encarts pub de base.html
+        with self.assertNumQueries(2):
+            response = self._get()
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_unit_refreshes_the_cached_global_numbers(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/stats/", secure=True)
+        self.assertEqual((response.context["total_units"], response.context["fav_wins"]), (1, 1))
+
+        OneDayRace.objects.create(season=self.race.season, name="Autre", start_datetime=timezone.now())
+        response = self.client.get("/stats/", secure=True)
+        self.assertEqual(response.context["total_units"], 2)
+        self.assertEqual(response.context["played_total"], 1)